@@ -0,0 +1,505 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program steps thousands of Focus games at once with NumPy arrays.
+
+import argparse
+import sys
+
+import numpy as np
+
+from domination_game import DEFAULT_RULES, HEIGHT_BITS, HEIGHT_MASK, FocusGame, Rules, build_ray_tables
+
+# The players of the games made from a batch. The first player moves first.
+PLAYER_TUPLES = (('Player1', 'R'), ('Player2', 'G'))
+
+
+def build_action_tables(size, max_stack):
+    """
+    Builds the actions a board of the given side length can take, as arrays of start squares, end squares and
+    numbers of pieces. Action (square * 4 + direction) * max_stack + pieces - 1 moves that many pieces from
+    the square in the direction and has an end square of -1 when it leaves the board. The last size * size
+    actions are reserve moves onto each square and have a start square of -1.
+    """
+
+    starts, ends, pieces = [], [], []
+    for index, square_rays in enumerate(build_ray_tables(size)):
+        for ray in square_rays:
+            for count in range(1, max_stack + 1):
+                starts.append(index)
+                ends.append(ray[count - 1] if len(ray) >= count else -1)
+                pieces.append(count)
+    for index in range(size * size):
+        starts.append(-1)
+        ends.append(index)
+        pieces.append(1)
+    return np.array(starts, np.int64), np.array(ends, np.int64), np.array(pieces, np.int64)
+
+
+class ActionTables:
+    """
+    The ActionTables class holds the actions of the boards of one Rules instance, as built by
+    build_action_tables, along with which stack actions stay on the board and the action of every move tuple.
+    """
+    __slots__ = ('_starts', '_ends', '_pieces', '_on_board', '_of_move')
+
+    def __init__(self, rules):
+        """
+        Initializes the tables of the rules.
+        """
+
+        size, max_stack = rules.get_board_size(), rules.get_max_stack()
+        self._starts, self._ends, self._pieces = build_action_tables(size, max_stack)
+        stack_actions = size * size * 4 * max_stack
+        self._on_board = (self._ends[:stack_actions] >= 0).reshape(size * size, 4, max_stack)
+
+        # The action of every move tuple returned by FocusGame.legal_moves.
+        coordinates = rules.get_coordinates()
+        self._of_move = {}
+        for action in range(len(self._starts)):
+            if self._ends[action] >= 0:
+                start = coordinates[self._starts[action]] if self._starts[action] >= 0 else None
+                self._of_move[(start, coordinates[self._ends[action]], int(self._pieces[action]))] = action
+
+    def get_starts(self):
+        """
+        Returns the start square of every action, or -1 for reserve moves.
+        """
+
+        return self._starts
+
+    def get_ends(self):
+        """
+        Returns the end square of every action, or -1 for stack actions that leave the board.
+        """
+
+        return self._ends
+
+    def get_pieces(self):
+        """
+        Returns the number of pieces every action moves.
+        """
+
+        return self._pieces
+
+    def get_on_board(self):
+        """
+        Returns a (squares, directions, pieces) array that is True for the stack actions that stay on the board.
+        """
+
+        return self._on_board
+
+    def get_action_of_move(self):
+        """
+        Returns the dictionary of the action of every move tuple that stays on the board.
+        """
+
+        return self._of_move
+
+
+# The action tables of every Rules instance a batch has been made for.
+ACTION_TABLES = {}
+
+
+def get_action_tables(rules=DEFAULT_RULES):
+    """
+    Returns the ActionTables of the rules, building them the first time they are asked for.
+    """
+
+    if rules not in ACTION_TABLES:
+        ACTION_TABLES[rules] = ActionTables(rules)
+    return ACTION_TABLES[rules]
+
+
+# The action tables of the default rules.
+ACTION_STARTS = get_action_tables().get_starts()
+ACTION_ENDS = get_action_tables().get_ends()
+ACTION_PIECES = get_action_tables().get_pieces()
+ON_BOARD = get_action_tables().get_on_board()
+ACTION_OF_MOVE = get_action_tables().get_action_of_move()
+
+
+def action_to_move(action, rules=DEFAULT_RULES):
+    """
+    Returns the move tuple of an action of the rules, in the form used by FocusGame.legal_moves and
+    FocusGame.make_move.
+    """
+
+    tables = get_action_tables(rules)
+    coordinates = rules.get_coordinates()
+    start = tables.get_starts()[action]
+    return ((coordinates[start] if start >= 0 else None), coordinates[tables.get_ends()[action]],
+            int(tables.get_pieces()[action]))
+
+
+def move_to_action(move, rules=DEFAULT_RULES):
+    """
+    Returns the action of a move tuple of the rules.
+    """
+
+    return get_action_tables(rules).get_action_of_move()[tuple(move)]
+
+
+class FocusBatch:
+    """
+    The FocusBatch class holds many Focus boards of one Rules instance in NumPy arrays and makes one move on
+    every board at once. Every square holds a stack of up to the stack limit of pieces, stored bottom piece
+    first as 1 for the first player's pieces, 2 for the second player's pieces and 0 for no piece. The batch
+    also holds the reserve and capture counts of both players, the player to move and the winner of each
+    board. Moves are actions from build_action_tables and follow the same rules as Board.apply_move and
+    Board.check_win.
+    """
+    __slots__ = ('_rules', '_tables', '_pieces', '_heights', '_reserves', '_captures', '_turn', '_winner')
+
+    def __init__(self, size, rules=None):
+        """
+        Initializes a batch of the given number of boards set up for the start of a game with the rules, or
+        the default rules if none are given.
+        """
+
+        self._rules = DEFAULT_RULES if rules is None else rules
+        self._tables = get_action_tables(self._rules)
+        squares = self._rules.get_square_count()
+        pieces, heights = self.decode_codes(self._rules.get_start_codes())
+        self._pieces = np.repeat(pieces[None], size, 0)
+        self._heights = np.repeat(heights[None], size, 0)
+        self._reserves = np.zeros((size, 2), np.int16)
+        self._captures = np.zeros((size, 2), np.int16)
+        self._turn = np.zeros(size, np.int8)
+        self._winner = np.full(size, -1, np.int8)
+
+    def get_size(self):
+        """
+        Returns the number of boards in the batch.
+        """
+
+        return len(self._turn)
+
+    def get_rules(self):
+        """
+        Returns the Rules instance of the boards.
+        """
+
+        return self._rules
+
+    def get_stacks(self):
+        """
+        Returns a (boards, rows, columns, stack height) view of the pieces on the boards.
+        """
+
+        size = self._rules.get_board_size()
+        return self._pieces.reshape(-1, size, size, self._rules.get_max_stack())
+
+    def get_heights(self):
+        """
+        Returns a (boards, squares) array of the stack heights.
+        """
+
+        return self._heights
+
+    def get_reserves(self):
+        """
+        Returns a (boards, players) array of the reserve counts.
+        """
+
+        return self._reserves
+
+    def get_captures(self):
+        """
+        Returns a (boards, players) array of the capture counts.
+        """
+
+        return self._captures
+
+    def get_turn(self):
+        """
+        Returns the index of the player to move on each board.
+        """
+
+        return self._turn
+
+    def get_winner(self):
+        """
+        Returns the index of the winner of each board, or -1 for boards that are still being played.
+        """
+
+        return self._winner
+
+    def legal_mask(self):
+        """
+        Returns a (boards, actions) array that is True for the legal actions of the player to move. Boards
+        that have a winner have no legal actions.
+        """
+
+        heights = self._heights
+        tops = np.take_along_axis(self._pieces, np.maximum(heights - 1, 0)[:, :, None], 2)[:, :, 0]
+        owned = (heights > 0) & (tops == (self._turn[:, None] + 1))
+
+        # A stack move needs the player's piece on top, enough pieces and an end square on the board. The
+        # stack actions are laid out by square, direction and number of pieces, so the checks broadcast.
+        counts = np.arange(1, self._rules.get_max_stack() + 1, dtype=np.int8)
+        stack = owned[:, :, None, None] & (heights[:, :, None, None] >= counts) & self._tables.get_on_board()
+        rows = np.arange(self.get_size())
+        reserve = np.repeat((self._reserves[rows, self._turn] > 0)[:, None], self._rules.get_square_count(), 1)
+        mask = np.concatenate([stack.reshape(len(rows), -1), reserve], 1)
+        mask &= (self._winner < 0)[:, None]
+        return mask
+
+    def random_actions(self, rng):
+        """
+        Returns one legal action picked at random for each board, or -1 for boards with no legal actions.
+        """
+
+        mask = self.legal_mask()
+        counts = mask.sum(1)
+        picks = (rng.random(len(counts)) * counts).astype(np.int64)
+
+        # The action picked on each board is the legal action that has the picked number of legal actions
+        # before it.
+        ranks = np.cumsum(mask, 1, dtype=np.int16)
+        actions = (ranks <= picks[:, None]).sum(1)
+        return np.where(counts > 0, actions, -1)
+
+    def step(self, actions):
+        """
+        Makes the action of each board for the player to move and passes the turn. Boards with an action of -1
+        and boards that have a winner do not change. The actions are not checked, so they must be legal.
+        """
+
+        rows = np.nonzero((np.asarray(actions) >= 0) & (self._winner < 0))[0]
+        actions = np.asarray(actions)[rows]
+        side = self._turn[rows].astype(np.int64)
+        starts = self._tables.get_starts()[actions]
+        moving, counts = self.lift(rows, starts, self._tables.get_pieces()[actions], side)
+        self.drop(rows, self._tables.get_ends()[actions], moving, counts, side)
+        self._reserves[rows, side] -= (starts < 0)
+
+        # Checks the win conditions and passes the turn.
+        won = self._captures[rows, side] >= self._rules.get_capture_target()
+        self._winner[rows[won]] = side[won]
+        self._turn[rows] = 1 - side
+
+    def lift(self, rows, starts, counts, side):
+        """
+        Takes the moving pieces off the top of the start stacks of the rows, or a reserve piece of the player
+        to move for reserve moves. Returns a (rows, stack limit) array of the moving pieces, bottom piece
+        first, and the number of pieces moving.
+        """
+
+        max_stack = self._rules.get_max_stack()
+        levels = np.arange(max_stack)
+        reserve = starts < 0
+        squares = np.where(reserve, 0, starts)
+        heights = np.where(reserve, counts, self._heights[rows, squares].astype(np.int64))
+        first = heights - counts
+        stacks = self._pieces[rows, squares]
+
+        # Gathers the top pieces of the stacks, and uses the player's own piece for reserve moves.
+        taken = (levels[None, :] < counts[:, None])
+        source = np.minimum(first[:, None] + levels[None, :], max_stack - 1)
+        moving = np.where(taken, np.take_along_axis(stacks, source, 1), 0)
+        moving = np.where(reserve[:, None], np.where(levels[None, :] == 0, side[:, None] + 1, 0), moving)
+
+        # Clears the moved pieces from the start stacks.
+        cleared = ~reserve[:, None] & (levels[None, :] >= first[:, None])
+        self._pieces[rows, squares] = np.where(cleared, 0, stacks)
+        self._heights[rows, squares] = np.where(reserve, self._heights[rows, squares], first)
+        return moving.astype(np.int8), counts
+
+    def drop(self, rows, ends, moving, counts, side):
+        """
+        Puts the moving pieces on top of the end stacks of the rows, and takes the pieces over the stack limit
+        from the bottom of the end stacks into the reserves or captures of the player to move.
+        """
+
+        max_stack = self._rules.get_max_stack()
+        heights = self._heights[rows, ends].astype(np.int64)
+        levels = np.arange(2 * max_stack)
+        combined = np.zeros((len(rows), 2 * max_stack), np.int8)
+        combined[:, :max_stack] = self._pieces[rows, ends]
+        spots = heights[:, None] + np.arange(max_stack)[None, :]
+        np.put_along_axis(combined, spots, np.take_along_axis(combined, spots, 1) + moving, 1)
+
+        # The pieces under the top pieces that fit the stack limit are confiscated.
+        total = heights + counts
+        over = np.maximum(total - max_stack, 0)
+        confiscated = levels[None, :] < over[:, None]
+        self._reserves[rows, side] += (confiscated & (combined == side[:, None] + 1)).sum(1).astype(np.int16)
+        self._captures[rows, side] += (confiscated & (combined == 2 - side[:, None])).sum(1).astype(np.int16)
+
+        # Moves the remaining pieces down to the bottom of the stack.
+        kept = np.take_along_axis(combined, over[:, None] + np.arange(max_stack)[None, :], 1)
+        self._pieces[rows, ends] = kept
+        self._heights[rows, ends] = np.minimum(total, max_stack)
+
+    def play_random(self, rng, max_steps=500):
+        """
+        Plays random legal moves on every board until every board has a winner or the number of steps runs
+        out. A player with no legal moves loses. Returns the number of steps taken.
+        """
+
+        for steps in range(max_steps):
+            if (self._winner >= 0).all():
+                return steps
+            actions = self.random_actions(rng)
+            stuck = (actions < 0) & (self._winner < 0)
+            self._winner[stuck] = 1 - self._turn[stuck]
+            self.step(actions)
+        return max_steps
+
+    def set_board(self, row, codes, holdings, turn):
+        """
+        Sets up one board of the batch from the bytes of Board.get_codes, a pair of (reserves, captures)
+        tuples for the players, and the index of the player to move.
+        """
+
+        self._pieces[row], self._heights[row] = self.decode_codes(codes)
+        self._reserves[row] = [holding[0] for holding in holdings]
+        self._captures[row] = [holding[1] for holding in holdings]
+        self._turn[row] = turn
+        self._winner[row] = -1
+
+    def decode_codes(self, codes):
+        """
+        Returns the (squares, stack limit) pieces and the stack heights of a board of the rules from its square
+        codes, given as the bytes of Board.get_codes or a sequence of codes.
+        """
+
+        dtype = np.uint8 if self._rules.get_typecode() == 'B' else np.uint16
+        if isinstance(codes, (bytes, bytearray)):
+            codes = np.frombuffer(codes, dtype)
+        codes = np.asarray(codes).astype(np.int64)
+        heights = codes & HEIGHT_MASK
+        levels = np.arange(self._rules.get_max_stack())
+        owners = (codes[:, None] >> (HEIGHT_BITS + levels[None, :])) & 1
+        pieces = np.where(levels[None, :] < heights[:, None], owners + 1, 0).astype(np.int8)
+        return pieces, heights.astype(np.int8)
+
+    def get_codes(self, row):
+        """
+        Returns the board bytes of one board of the batch, in the form of Board.get_codes.
+        """
+
+        levels = np.arange(self._rules.get_max_stack())
+        owners = ((self._pieces[row].astype(np.int64) == 2) << (HEIGHT_BITS + levels[None, :])).sum(1)
+        dtype = np.uint8 if self._rules.get_typecode() == 'B' else np.uint16
+        return (owners | self._heights[row]).astype(dtype).tobytes()
+
+    def to_game(self, row, players=PLAYER_TUPLES):
+        """
+        Returns a FocusGame with the rules of the batch set up in the position of one board of the batch.
+        """
+
+        game = FocusGame(*players, rules=self._rules)
+        holdings = [(int(self._reserves[row, index]), int(self._captures[row, index])) for index in range(2)]
+        game.load_position(self.get_codes(row), holdings, players[int(self._turn[row])][0])
+        return game
+
+
+def from_games(games):
+    """
+    Returns a FocusBatch with one board for each game, set up in the game's position. The boards of a batch
+    share one Rules instance, so a ValueError is raised if the games have different rules.
+    """
+
+    rules = games[0].get_rules() if games else DEFAULT_RULES
+    batch = FocusBatch(len(games), rules)
+    for row, game in enumerate(games):
+        if game.get_rules() != rules:
+            raise ValueError('the games of a batch must have the same rules')
+        board = game.get_board()
+        players = game.get_players()
+        holdings = [(player.get_reserves(), player.get_captures()) for player in players]
+        turn = 0 if board.check_turn().lower() == players[0].get_player_name().lower() else 1
+        batch.set_board(row, board.get_codes(), holdings, turn)
+    return batch
+
+
+def game_state(game):
+    """
+    Returns the board bytes, holdings and player to move of a FocusGame, for comparing with a batch board.
+    """
+
+    board = game.get_board()
+    players = game.get_players()
+    turn = 0 if board.check_turn().lower() == players[0].get_player_name().lower() else 1
+    return board.get_codes(), [(player.get_reserves(), player.get_captures()) for player in players], turn
+
+
+def batch_state(batch, row):
+    """
+    Returns the board bytes, holdings and player to move of one board of a batch, for comparing with a game.
+    """
+
+    holdings = [(int(batch.get_reserves()[row, index]), int(batch.get_captures()[row, index])) for index in range(2)]
+    return batch.get_codes(row), holdings, int(batch.get_turn()[row])
+
+
+def check_parity(games=64, steps=300, seed=0, rules=None):
+    """
+    Plays random games with the rules, or the default rules, on a batch and on FocusGame instances side by
+    side and raises an AssertionError at the first difference in the legal moves, the boards, the holdings,
+    the player to move or the winner. Returns the number of moves compared.
+    """
+
+    rng = np.random.default_rng(seed)
+    scalar = [FocusGame(*PLAYER_TUPLES, rules=rules) for index in range(games)]
+    batch = from_games(scalar)
+    compared = 0
+    for step in range(steps):
+        mask = batch.legal_mask()
+        actions = batch.random_actions(rng)
+        winners = {}
+        for row, game in enumerate(scalar):
+            if batch.get_winner()[row] < 0:
+                winner = check_move(game, batch, row, mask[row], actions[row], step)
+                if winner is not None:
+                    winners[row] = winner
+                    compared += 1
+        batch.step(actions)
+        for row, game in enumerate(scalar):
+            assert game_state(game) == batch_state(batch, row), 'state differs on board %d at step %d' % (row, step)
+        for row, winner in winners.items():
+            assert batch.get_winner()[row] == winner, 'winner differs on board %d at step %d' % (row, step)
+    return compared
+
+
+def check_move(game, batch, row, mask, action, step):
+    """
+    Compares the legal moves of a game with one board of a batch and makes the batch's action in the game.
+    Returns the index of the player the game says won with the move, or -1 if the move did not win, or None if
+    no move was made.
+    """
+
+    rules = batch.get_rules()
+    name = game.get_board().check_turn()
+    legal = set(move_to_action(move, rules) for move in game.legal_moves(name))
+    assert legal == set(np.nonzero(mask)[0].tolist()), 'legal moves differ on board %d at step %d' % (row, step)
+    if action < 0:
+        return None
+    message = game.make_move(name, action_to_move(action, rules))
+    if not message.endswith('wins!'):
+        return -1
+    return 0 if name.lower() == PLAYER_TUPLES[0][0].lower() else 1
+
+
+def main(argv=None):
+    """
+    Runs the parity check against FocusGame from the command line.
+    """
+
+    parser = argparse.ArgumentParser(description='Checks the batched Focus engine against FocusGame.')
+    parser.add_argument('--games', type=int, default=64)
+    parser.add_argument('--steps', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--board-size', type=int, default=DEFAULT_RULES.get_board_size())
+    parser.add_argument('--max-stack', type=int, default=DEFAULT_RULES.get_max_stack())
+    parser.add_argument('--capture-target', type=int, default=DEFAULT_RULES.get_capture_target())
+    args = parser.parse_args(argv)
+    rules = Rules(args.board_size, args.max_stack, args.capture_target)
+    compared = check_parity(args.games, args.steps, args.seed, rules)
+    print('parity ok: %d moves compared' % compared)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,415 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program times the hot paths of the Focus rules and saves the results for comparing runs.
+
+import argparse
+import functools
+import json
+import platform
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from domination_game import DEFAULT_RULES, FocusGame, InvalidLocation, MoveStatus, PlayerPieceError, PlayerTurnError, \
+    Rules
+from domination_events import EventFeed
+from domination_perft import perft
+from domination_selfplay import play_game
+from domination_sessions import SessionStore, decode_game, encode_game
+
+# The players of every benchmark game.
+PLAYER_TUPLES = (('PlayerA', 'R'), ('PlayerB', 'G'))
+
+# Moves that are not allowed at the start of a game, one for each kind of rejection, followed by one move
+# that is allowed. The invalid move benchmarks try them in order, so most tries are rejected.
+INVALID_MOVE_WORKLOAD = (
+    ('PlayerB', (0, 1), (0, 2), 1),
+    ('PlayerA', (0, 0), (1, 1), 1),
+    ('PlayerA', (0, 1), (0, 2), 1),
+    ('PlayerA', (0, 0), (0, 2), 2),
+    ('PlayerA', (0, 0), (0, 0), 1),
+    ('PlayerA', (0, 0), (0, 6), 6),
+    ('PlayerA', (0, 0), (0, 1), 1),
+)
+
+# The number of spectators subscribed to the game of the event feed benchmark.
+SPECTATORS = 1000
+
+# The number of games the session store benchmark cycles through a store that keeps SESSION_CAPACITY games in
+# memory, so most of the games it asks for are parked.
+SESSION_GAMES = 64
+SESSION_CAPACITY = 16
+
+# The rules of the board sizes that the sized benchmarks compare. The time of a move should not grow with the
+# size of the board, while the time to list the legal moves grows with the number of stacks.
+SIZED_RULES = {6: DEFAULT_RULES, 12: Rules(12), 20: Rules(20)}
+
+
+def bench_move_piece(count):
+    """
+    Makes a single-piece move with FocusGame.move_piece and takes it back, the given number of times.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES)
+    for index in range(count):
+        game.move_piece('PlayerA', (0, 0), (0, 1), 1)
+        game.undo_move()
+
+
+def bench_reserved_move(count):
+    """
+    Makes a reserve move with FocusGame.reserved_move and takes it back, the given number of times.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES)
+    game.load_position(game.get_board().get_codes(), ((3, 0), (0, 0)), 'PlayerA')
+    for index in range(count):
+        game.reserved_move('PlayerA', (2, 2))
+        game.undo_move()
+
+
+def bench_move_piece_feed(count):
+    """
+    Makes a single-piece move with FocusGame.move_piece and takes it back, the given number of times, with
+    SPECTATORS subscribers to the game's event feed reading their events after every pair of moves.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES)
+    feed = EventFeed(game)
+    subscriptions = [feed.subscribe() for index in range(SPECTATORS)]
+    for index in range(count):
+        game.move_piece('PlayerA', (0, 0), (0, 1), 1)
+        game.undo_move()
+        for subscription in subscriptions:
+            subscription.poll()
+    feed.close()
+
+
+def bench_start_validation(count):
+    """
+    Validates and makes a two-piece move with Board.start_validation and takes it back, the given number of
+    times.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES)
+    game.move_piece('PlayerA', (0, 0), (0, 1), 1)
+    game.move_piece('PlayerB', (0, 2), (0, 3), 1)
+    board = game.get_board()
+    player = game.get_player_from_name('PlayerA')
+    for index in range(count):
+        board.start_validation(player, (0, 1), (2, 1), 2)
+        board.undo_move()
+
+
+def bench_invalid_move_raise(count):
+    """
+    Tries the moves of the invalid move workload with FocusGame.move_piece, catching the errors of the
+    rejected moves, the given number of times. The allowed move is taken back after it is made.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES)
+    workload = INVALID_MOVE_WORKLOAD
+    for index in range(count):
+        name, start, end, pieces = workload[index % len(workload)]
+        try:
+            game.move_piece(name, start, end, pieces)
+            game.undo_move()
+        except (InvalidLocation, PlayerPieceError, PlayerTurnError):
+            pass
+
+
+def bench_invalid_move_try(count):
+    """
+    Tries the moves of the invalid move workload with FocusGame.try_move, which returns a status instead of
+    raising, the given number of times. The allowed move is taken back after it is made.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES)
+    workload = INVALID_MOVE_WORKLOAD
+    for index in range(count):
+        name, start, end, pieces = workload[index % len(workload)]
+        if game.try_move(name, start, end, pieces) in (MoveStatus.SUCCESS, MoveStatus.WIN):
+            game.undo_move()
+
+
+def bench_sized_move(size, count):
+    """
+    Makes a single-piece move with FocusGame.move_piece on a board of the size and takes it back, the given
+    number of times.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES, rules=SIZED_RULES[size])
+    for index in range(count):
+        game.move_piece('PlayerA', (0, 0), (0, 1), 1)
+        game.undo_move()
+
+
+def bench_sized_invalid_move(size, count):
+    """
+    Tries the moves of the invalid move workload with FocusGame.try_move on a board of the size, the given
+    number of times.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES, rules=SIZED_RULES[size])
+    workload = INVALID_MOVE_WORKLOAD
+    for index in range(count):
+        name, start, end, pieces = workload[index % len(workload)]
+        if game.try_move(name, start, end, pieces) in (MoveStatus.SUCCESS, MoveStatus.WIN):
+            game.undo_move()
+
+
+def bench_sized_legal_moves(size, count):
+    """
+    Lists the legal moves of the first player on a board of the size, the given number of times.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES, rules=SIZED_RULES[size])
+    for index in range(count):
+        game.legal_moves('PlayerA')
+
+
+def record_game(seed, length):
+    """
+    Returns the moves of a game between random players as (player index, move) pairs, as they are read from a
+    game archive.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES)
+    rng = random.Random(seed)
+    moves = []
+    for index in range(length):
+        name = game.get_board().check_turn()
+        legal = game.legal_moves(name)
+        if not legal:
+            break
+        move = rng.choice(legal)
+        moves.append((0 if name == PLAYER_TUPLES[0][0] else 1, move))
+        game.make_move(name, move)
+    return moves
+
+
+# A recorded game that the replay benchmarks play back.
+REPLAY_GAME = record_game(1, 60)
+
+
+def bench_replay_make_move(count):
+    """
+    Replays the recorded game one move at a time with FocusGame.make_move, the given number of times.
+    """
+
+    names = [player[0] for player in PLAYER_TUPLES]
+    for index in range(count):
+        game = FocusGame(*PLAYER_TUPLES)
+        for player_index, move in REPLAY_GAME:
+            game.make_move(names[player_index], move)
+
+
+def bench_replay_apply_moves(count):
+    """
+    Replays the recorded game with FocusGame.apply_moves, the given number of times.
+    """
+
+    for index in range(count):
+        FocusGame(*PLAYER_TUPLES).apply_moves(REPLAY_GAME)
+
+
+def bench_session_encode(count):
+    """
+    Encodes the game after the recorded moves with domination_sessions.encode_game, the given number of times.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES)
+    game.apply_moves(REPLAY_GAME)
+    for index in range(count):
+        encode_game(game)
+
+
+def bench_session_decode(count):
+    """
+    Decodes the encoded game after the recorded moves with domination_sessions.decode_game, the given number
+    of times.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES)
+    game.apply_moves(REPLAY_GAME)
+    data = encode_game(game)
+    rules_cache = {}
+    for index in range(count):
+        decode_game(data, rules_cache)
+
+
+def bench_session_store(count):
+    """
+    Asks a SessionStore with a temporary SQLite file for SESSION_GAMES games in turn, the given number of times.
+    Every game asked for was parked, so each time one game is decoded and another is parked.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES)
+    game.apply_moves(REPLAY_GAME)
+    with tempfile.TemporaryDirectory() as directory:
+        with SessionStore(os.path.join(directory, 'sessions.db'), SESSION_CAPACITY) as store:
+            for index in range(SESSION_GAMES):
+                store.put(str(index), game.fork())
+            for index in range(count):
+                store.get(str(index % SESSION_GAMES))
+
+
+def bench_check_turn(count):
+    """
+    Calls Board.check_turn the given number of times.
+    """
+
+    board = FocusGame(*PLAYER_TUPLES).get_board()
+    for index in range(count):
+        board.check_turn()
+
+
+def bench_perft(count):
+    """
+    Counts the move sequences of depth 3 from the starting position, the given number of times.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES)
+    for index in range(count):
+        perft(game, 3)
+
+
+def bench_random_game(count):
+    """
+    Plays the given number of complete games between random players.
+    """
+
+    for index in range(count):
+        play_game(index, ('random', 'random'), seed=1)
+
+
+# The benchmarks and the number of operations each one runs per timing.
+BENCHMARKS = {
+    'move_piece': (bench_move_piece, 20000),
+    'reserved_move': (bench_reserved_move, 20000),
+    'move_piece_feed': (bench_move_piece_feed, 200),
+    'start_validation': (bench_start_validation, 20000),
+    'invalid_move_raise': (bench_invalid_move_raise, 20000),
+    'invalid_move_try': (bench_invalid_move_try, 20000),
+    'check_turn': (bench_check_turn, 200000),
+    'perft': (bench_perft, 2),
+    'random_game': (bench_random_game, 20),
+    'replay_make_move': (bench_replay_make_move, 200),
+    'replay_apply_moves': (bench_replay_apply_moves, 200),
+    'session_encode': (bench_session_encode, 20000),
+    'session_decode': (bench_session_decode, 5000),
+    'session_store': (bench_session_store, 2000),
+}
+for _size in SIZED_RULES:
+    BENCHMARKS['move_piece_%d' % _size] = (functools.partial(bench_sized_move, _size), 20000)
+    BENCHMARKS['invalid_move_try_%d' % _size] = (functools.partial(bench_sized_invalid_move, _size), 20000)
+    BENCHMARKS['legal_moves_%d' % _size] = (functools.partial(bench_sized_legal_moves, _size), 2000)
+
+
+def time_benchmark(function, count, repeats):
+    """
+    Runs the benchmark function repeatedly and returns the operations per second of the fastest run.
+    """
+
+    best = float('inf')
+    for repeat in range(repeats):
+        started = time.perf_counter()
+        function(count)
+        best = min(best, time.perf_counter() - started)
+    return count / best
+
+
+def trace_benchmark(function, count):
+    """
+    Runs the benchmark function once under tracemalloc and returns the number of memory blocks and bytes it
+    left allocated per operation, and the highest memory use above the starting point during the run. For
+    the game benchmark that is the peak memory of a game.
+    """
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+        function(count)
+        peak = tracemalloc.get_traced_memory()[1] - start_memory
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    changes = after.compare_to(before, 'filename')
+    blocks = sum(change.count_diff for change in changes)
+    size = sum(change.size_diff for change in changes)
+    return blocks / count, size / count, peak
+
+
+def run_benchmarks(names, scale=1.0, repeats=3):
+    """
+    Runs the named benchmarks and returns a dictionary of results. The number of operations of every
+    benchmark is multiplied by the scale.
+    """
+
+    results = {}
+    for name in names:
+        function, count = BENCHMARKS[name]
+        count = max(1, int(count * scale))
+        ops = time_benchmark(function, count, repeats)
+        blocks, size, peak = trace_benchmark(function, max(1, count // 10))
+        results[name] = {'ops_per_sec': ops, 'retained_blocks_per_op': blocks, 'retained_bytes_per_op': size,
+                         'peak_bytes': peak}
+        print('%-20s %14.1f ops/sec  %10d peak bytes  %8.2f retained blocks/op' % (name, ops, peak, blocks))
+    return results
+
+
+def compare_results(current, baseline, threshold):
+    """
+    Returns a list of messages for the benchmarks whose operations per second dropped by more than the
+    threshold fraction from the baseline results.
+    """
+
+    regressions = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]['ops_per_sec']
+        change = (result['ops_per_sec'] - old) / old
+        if change < -threshold:
+            regressions.append('%s: %.1f ops/sec, was %.1f (%+.1f%%)' % (name, result['ops_per_sec'], old,
+                                                                       change * 100))
+    return regressions
+
+
+def main(argv=None):
+    """
+    Runs the benchmarks from the command line. The results can be saved as JSON and compared with a saved
+    run, in which case the exit status is 1 if a benchmark got slower than the threshold allows.
+    """
+
+    parser = argparse.ArgumentParser(description='Times the Focus rule engine.')
+    parser.add_argument('names', nargs='*', default=sorted(BENCHMARKS), help='benchmarks to run')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplies the operations per benchmark')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', help='file to save the results to as JSON')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=0.10, help='slowdown that counts as a regression')
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.names, args.scale, args.repeats)
+    report = {'python': platform.python_version(), 'platform': platform.platform(), 'time': time.time(),
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare_results(results, json.load(baseline)['results'], args.threshold)
+        for message in regressions:
+            print('REGRESSION ' + message)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
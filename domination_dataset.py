@@ -0,0 +1,504 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program turns self-play and archived Focus games into training samples and writes them to
+# shards of NumPy arrays that other programs can read without loading them into memory.
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from domination_game import FocusGame, MoveStatus, Rules
+from domination_records import GameArchive
+from domination_replay import run_batches
+from domination_selfplay import POLICIES, play_game
+
+# The version of the dataset index format.
+DATASET_VERSION = 1
+
+# The name of the index file in a dataset directory.
+INDEX_NAME = 'index.json'
+
+# The number of samples in a full shard.
+SHARD_SIZE = 65536
+
+# The arrays of every shard. The board codes of a sample have the shape of the board and the reserves and
+# captures have one value per player; the other arrays have one value per sample. The outcome is 1 if the
+# player to move went on to win the game, -1 if they lost and 0 if nobody won.
+FIELDS = ('codes', 'side', 'reserves', 'captures', 'outcome', 'ply', 'key')
+
+
+def get_codes_type(rules):
+    """
+    Returns the NumPy type of the board codes of the rules, which is one or two bytes like the board squares.
+    """
+
+    return np.uint8 if rules.get_typecode() == 'B' else np.uint16
+
+
+class SampleRecorder:
+    """
+    The SampleRecorder class collects a sample of every position of the games it is given, before each move,
+    and fills in their outcomes when each game is over. The samples are kept as lists until get_batch turns
+    them into arrays, so recording a position costs a few appends.
+    """
+    __slots__ = ('_rules', '_codes', '_sides', '_holdings', '_plies', '_keys', '_outcomes')
+
+    def __init__(self, rules):
+        """
+        Initializes an empty recorder for games of the rules.
+        """
+
+        self._rules = rules
+        self._codes = []
+        self._sides = []
+        self._holdings = []
+        self._plies = []
+        self._keys = []
+        self._outcomes = []
+
+    def record(self, game, side, ply):
+        """
+        Records the position of the game, with the player with the index side to move after the number of
+        moves given as the ply.
+        """
+
+        board = game.get_board()
+        if board.get_rules() != self._rules:
+            raise ValueError('the games of a dataset must have the same rules')
+        self._codes.append(board.get_codes())
+        self._sides.append(side)
+        for player in game.get_players():
+            self._holdings.append((player.get_reserves(), player.get_captures()))
+        self._plies.append(ply)
+        self._keys.append(board.get_hash())
+
+    def finish_game(self, winner):
+        """
+        Fills in the outcomes of the positions recorded since the last game finished, from the index of the
+        player who won, or None if nobody won.
+        """
+
+        for side in self._sides[len(self._outcomes):]:
+            self._outcomes.append(0 if winner is None else 1 if side == winner else -1)
+
+    def discard_game(self):
+        """
+        Removes the positions recorded since the last game finished.
+        """
+
+        count = len(self._outcomes)
+        del self._codes[count:], self._sides[count:], self._holdings[count * 2:], self._plies[count:], \
+            self._keys[count:]
+
+    def get_batch(self):
+        """
+        Returns the samples of the finished games as a dictionary of arrays keyed by field name.
+        """
+
+        count = len(self._outcomes)
+        size = self._rules.get_board_size()
+        holdings = np.array(self._holdings[:count * 2], dtype=np.uint16).reshape(count, 2, 2)
+        codes = np.frombuffer(b''.join(self._codes[:count]), dtype=get_codes_type(self._rules))
+        return {'codes': codes.reshape(count, size, size),
+                'side': np.array(self._sides[:count], dtype=np.uint8),
+                'reserves': holdings[:, :, 0].copy(),
+                'captures': holdings[:, :, 1].copy(),
+                'outcome': np.array(self._outcomes, dtype=np.int8),
+                'ply': np.array(self._plies[:count], dtype=np.uint16),
+                'key': np.array(self._keys[:count], dtype=np.uint64)}
+
+
+def selfplay_samples(first, last, policy_names, seed, max_moves):
+    """
+    Plays the self-play games with indexes from first up to last and returns a list with the dictionary of
+    arrays of their samples. This is the unit of work sent to a worker process.
+    """
+
+    recorder = SampleRecorder(Rules())
+    for index in range(first, last):
+        summary = play_game(index, policy_names, seed, max_moves, recorder=recorder)
+        recorder.finish_game(summary.get_winner())
+    return [recorder.get_batch()]
+
+
+def archive_samples(path, offset, count):
+    """
+    Replays up to count games of the archive at the path, starting with the game at the offset, and returns a
+    list with the dictionary of arrays of their samples. A game with a move that is not allowed is left out,
+    since its outcome is not known. The winner is the first player to reach the capture target, or the player
+    who made the last move if the other player has no legal moves left. This is the unit of work sent to a
+    worker process.
+    """
+
+    recorder = None
+    with GameArchive(path) as archive:
+        for record in archive.read_games(offset, count):
+            if recorder is None:
+                recorder = SampleRecorder(record.get_rules())
+            game = FocusGame(*record.get_players(), rules=record.get_rules())
+            names = [player[0] for player in record.get_players()]
+            first_name = names[0].lower()
+            target = record.get_rules().get_capture_target()
+            winner = None
+            side = 0
+            for ply, (player_index, move) in enumerate(record.iter_moves()):
+                turn = 0 if game.get_board().check_turn().lower() == first_name else 1
+                recorder.record(game, turn, ply)
+                start, end, pieces = move
+                if start is None:
+                    status = game.try_reserved_move(names[player_index], end)
+                else:
+                    status = game.try_move(names[player_index], start, end, pieces)
+                if status not in (MoveStatus.SUCCESS, MoveStatus.WIN):
+                    recorder.discard_game()
+                    break
+                side = 1 - player_index
+                if winner is None and game.get_players()[player_index].get_captures() >= target:
+                    winner = player_index
+            else:
+                if winner is None and not game.legal_moves(game.get_board().check_turn()):
+                    winner = 1 - side
+                recorder.finish_game(winner)
+    return [recorder.get_batch()] if recorder is not None else []
+
+
+class KeySet:
+    """
+    The KeySet class holds the 64-bit keys of the positions already written, to leave out positions that
+    were seen before. The keys are kept in a few sorted arrays, each at most half as long as the one before
+    it, so a key costs 8 bytes and a batch of keys is looked up with a binary search of each array.
+    """
+    __slots__ = ('_levels',)
+
+    def __init__(self):
+        """
+        Initializes an empty set.
+        """
+
+        self._levels = []
+
+    def __len__(self):
+        """
+        Returns the number of keys in the set.
+        """
+
+        return sum(len(level) for level in self._levels)
+
+    def contains(self, keys):
+        """
+        Returns an array of booleans that are True for the keys in the set.
+        """
+
+        found = np.zeros(len(keys), dtype=bool)
+        for level in self._levels:
+            places = np.minimum(np.searchsorted(level, keys), len(level) - 1)
+            found |= level[places] == keys
+        return found
+
+    def add_new(self, keys):
+        """
+        Adds the keys to the set and returns the sorted indexes of the first time each key that was not in the
+        set appears in the keys.
+        """
+
+        unique, first = np.unique(keys, return_index=True)
+        fresh = ~self.contains(unique)
+        level = unique[fresh]
+        while self._levels and len(self._levels[-1]) <= len(level) * 2:
+            level = np.union1d(self._levels.pop(), level)
+        if len(level):
+            self._levels.append(level)
+        return np.sort(first[fresh])
+
+
+def write_shard(path, name, arrays):
+    """
+    Writes each array of a shard to a .npy file in the dataset directory at the path. Each file is written
+    under another name and renamed when it is done, so a file with a shard's name is always complete.
+    """
+
+    for field in FIELDS:
+        array = arrays[field]
+        target = os.path.join(path, '%s.%s.npy' % (name, field))
+        output = np.lib.format.open_memmap(target + '.tmp', mode='w+', dtype=array.dtype, shape=array.shape)
+        output[...] = array
+        output.flush()
+        del output
+        os.replace(target + '.tmp', target)
+
+
+class DatasetWriter:
+    """
+    The DatasetWriter class writes samples to the shards of a dataset directory. Samples that repeat a
+    position already written are left out. Full shards are written by a pool of writer threads while more
+    samples come in, and the index file is written again after each shard, so the dataset can be read while
+    it grows. Only one shard of samples and the shards being written are held in memory.
+    """
+    __slots__ = ('_path', '_shard_size', '_writers', '_executor', '_pending', '_buffer', '_buffered', '_keys',
+                 '_shards', '_count', '_duplicates', '_fields', '_rules')
+
+    def __init__(self, path, shard_size=SHARD_SIZE, writers=2):
+        """
+        Initializes a writer of a new dataset in the directory at the path, which is made if it does not exist,
+        with the number of samples in a full shard and the number of shards that may be written at once.
+        """
+
+        os.makedirs(path, exist_ok=True)
+        self._path = path
+        self._shard_size = shard_size
+        self._writers = writers
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=writers)
+        self._pending = collections.deque()
+        self._buffer = []
+        self._buffered = 0
+        self._keys = KeySet()
+        self._shards = []
+        self._count = 0
+        self._duplicates = 0
+        self._fields = None
+        self._rules = None
+
+    def __enter__(self):
+        """
+        Returns the writer for a with statement.
+        """
+
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Writes the last shard and the index at the end of a with statement.
+        """
+
+        self.close()
+
+    def get_count(self):
+        """
+        Returns the number of samples written or waiting to be written.
+        """
+
+        return self._count
+
+    def get_duplicates(self):
+        """
+        Returns the number of samples left out because their position was already written.
+        """
+
+        return self._duplicates
+
+    def set_rules(self, rules):
+        """
+        Records the rules of the games the samples come from in the index.
+        """
+
+        self._rules = rules
+
+    def write(self, arrays):
+        """
+        Adds a dictionary of sample arrays keyed by field name, leaving out the positions already written.
+        """
+
+        keep = self._keys.add_new(arrays['key'])
+        self._duplicates += len(arrays['key']) - len(keep)
+        if not len(keep):
+            return
+        if self._fields is None:
+            self._fields = {field: (arrays[field].dtype.str, arrays[field].shape[1:]) for field in FIELDS}
+        elif any(arrays[field].shape[1:] != self._fields[field][1] for field in FIELDS):
+            raise ValueError('the samples of a dataset must have the same shape')
+        self._buffer.append({field: arrays[field][keep] for field in FIELDS})
+        self._buffered += len(keep)
+        self._count += len(keep)
+        while self._buffered >= self._shard_size:
+            self.flush(self._shard_size)
+
+    def flush(self, count):
+        """
+        Starts writing a shard of the first number of buffered samples, after waiting for the oldest shard
+        being written if the writer threads are busy.
+        """
+
+        arrays = {field: np.concatenate([chunk[field] for chunk in self._buffer]) for field in FIELDS}
+        shard = {field: arrays[field][:count] for field in FIELDS}
+        rest = {field: arrays[field][count:] for field in FIELDS}
+        self._buffer = [rest] if len(rest['key']) else []
+        self._buffered -= count
+
+        name = 'shard-%05d' % (len(self._shards) + len(self._pending))
+        self._pending.append((name, count, self._executor.submit(write_shard, self._path, name, shard)))
+        if len(self._pending) > self._writers:
+            self.finish_shard()
+
+    def finish_shard(self):
+        """
+        Waits for the oldest shard being written and adds it to the index.
+        """
+
+        name, count, future = self._pending.popleft()
+        future.result()
+        self._shards.append({'name': name, 'count': count})
+        self.write_index()
+
+    def write_index(self):
+        """
+        Writes the index file of the shards written so far, under another name and then renamed.
+        """
+
+        fields = {field: {'dtype': dtype, 'shape': list(shape)} for field, (dtype, shape) in
+                  (self._fields or {}).items()}
+        index = {'version': DATASET_VERSION, 'rules': list(self._rules.get_settings()) if self._rules else None,
+                 'count': sum(shard['count'] for shard in self._shards), 'fields': fields, 'shards': self._shards}
+        target = os.path.join(self._path, INDEX_NAME)
+        with open(target + '.tmp', 'w') as output:
+            json.dump(index, output, indent=1)
+        os.replace(target + '.tmp', target)
+
+    def close(self):
+        """
+        Writes the samples still buffered as a last shard, waits for every shard and writes the index.
+        """
+
+        if self._buffered:
+            self.flush(self._buffered)
+        while self._pending:
+            self.finish_shard()
+        self._executor.shutdown()
+        self.write_index()
+
+
+class Dataset:
+    """
+    The Dataset class reads the shards of a dataset directory. The arrays of a shard are memory-mapped from
+    their .npy files, so reading a shard does not copy it and only the parts that are used are read from the
+    disk.
+    """
+    __slots__ = ('_path', '_index')
+
+    def __init__(self, path):
+        """
+        Opens the dataset in the directory at the path. Raises a ValueError if its index is of another version.
+        """
+
+        self._path = path
+        with open(os.path.join(path, INDEX_NAME)) as source:
+            self._index = json.load(source)
+        if self._index.get('version') != DATASET_VERSION:
+            raise ValueError('%s is not a dataset of version %d' % (path, DATASET_VERSION))
+
+    def __len__(self):
+        """
+        Returns the number of samples in the dataset.
+        """
+
+        return self._index['count']
+
+    def get_rules(self):
+        """
+        Returns the Rules of the games of the dataset, or None if it has no samples.
+        """
+
+        settings = self._index['rules']
+        return Rules(*settings[:3], tuple(settings[3])) if settings else None
+
+    def get_shard_count(self):
+        """
+        Returns the number of shards in the dataset.
+        """
+
+        return len(self._index['shards'])
+
+    def get_shard(self, index):
+        """
+        Returns the arrays of the shard with the index as a dictionary keyed by field name. The arrays are
+        read-only memory maps of the shard files.
+        """
+
+        name = self._index['shards'][index]['name']
+        return {field: np.load(os.path.join(self._path, '%s.%s.npy' % (name, field)), mmap_mode='r')
+                for field in FIELDS}
+
+    def __iter__(self):
+        """
+        Yields the arrays of every shard in order.
+        """
+
+        for index in range(self.get_shard_count()):
+            yield self.get_shard(index)
+
+
+def export_selfplay(path, games, policy_names=('random', 'random'), seed=0, workers=None, max_moves=500,
+                    batch=64, shard_size=SHARD_SIZE, writers=2):
+    """
+    Plays the number of self-play games between the two named policies and writes the samples of their
+    positions to a new dataset at the path. Returns the closed DatasetWriter.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    jobs = ((first, min(first + batch, games), policy_names, seed, max_moves) for first in range(0, games, batch))
+    with DatasetWriter(path, shard_size, writers) as writer:
+        writer.set_rules(Rules())
+        for arrays in run_batches(selfplay_samples, jobs, workers):
+            writer.write(arrays)
+    return writer
+
+
+def export_archive(path, archive_path, workers=None, batch=256, shard_size=SHARD_SIZE, writers=2):
+    """
+    Replays every game of the archive at archive_path and writes the samples of their positions to a new
+    dataset at the path. The worker processes read the games from the archive themselves. Returns the closed
+    DatasetWriter.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with GameArchive(archive_path) as archive:
+        offsets = archive.get_offsets()
+        rules = archive.get_game(0).get_rules() if offsets else None
+    jobs = ((archive_path, offsets[first], batch) for first in range(0, len(offsets), batch))
+    with DatasetWriter(path, shard_size, writers) as writer:
+        writer.set_rules(rules)
+        for arrays in run_batches(archive_samples, jobs, workers):
+            writer.write(arrays)
+    return writer
+
+
+def main(argv=None):
+    """
+    Writes a dataset from the command line, from self-play games or the games of an archive, and prints the
+    number of samples written and left out as duplicates.
+    """
+
+    parser = argparse.ArgumentParser(description='Writes Focus positions to a dataset of NumPy shards.')
+    parser.add_argument('path', help='directory to write the dataset to')
+    parser.add_argument('--archive', help='game archive to take the games from instead of self-play')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--players', nargs=2, default=['random', 'random'], choices=sorted(POLICIES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-moves', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--writers', type=int, default=2, help='shards that may be written at once')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.archive:
+        writer = export_archive(args.path, args.archive, args.workers, shard_size=args.shard_size,
+                                writers=args.writers)
+    else:
+        writer = export_selfplay(args.path, args.games, args.players, args.seed, args.workers, args.max_moves,
+                                 shard_size=args.shard_size, writers=args.writers)
+    elapsed = time.perf_counter() - started
+    print('samples: %d  duplicates: %d  samples/sec: %.1f' % (writer.get_count(), writer.get_duplicates(),
+                                                             writer.get_count() / elapsed if elapsed else 0.0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
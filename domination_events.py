@@ -0,0 +1,215 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program sends the changes of a Focus game to its spectators as a stream of events, one per
+# move, instead of having every spectator read the whole board after every move.
+
+import asyncio
+import collections
+
+# The number of events a subscriber may fall behind by before it is sent the whole position instead.
+BUFFER_SIZE = 64
+
+
+class Subscription:
+    """
+    The Subscription class holds the events of one subscriber to an EventFeed that the subscriber has not read
+    yet. The events can be read with a for loop, which stops when there are none waiting, or with an async
+    for loop, which waits for the next event until the subscription is closed. A subscriber that falls more
+    than its buffer size behind loses the events it has not read and is sent a sync event of the whole
+    position in their place, so a slow subscriber never holds more than its buffer.
+    """
+    __slots__ = ('_feed', '_events', '_size', '_lagged', '_closed', '_waiter')
+
+    def __init__(self, feed, size):
+        """
+        Initializes the subscription to the feed with room for the given number of events. The first event
+        is a sync event of the position when the subscription is read.
+        """
+
+        self._feed = feed
+        self._events = collections.deque()
+        self._size = size
+        self._lagged = True
+        self._closed = False
+        self._waiter = None
+
+    def push(self, event):
+        """
+        Adds an event for the subscriber. The events waiting are dropped if the buffer is full, and nothing is
+        added until the subscriber reads the sync event that takes their place.
+        """
+
+        if self._lagged or self._closed:
+            return
+        if len(self._events) >= self._size:
+            self._events.clear()
+            self._lagged = True
+        else:
+            self._events.append(event)
+        if self._waiter is not None:
+            self._waiter.set()
+
+    def get_next(self):
+        """
+        Returns the next event for the subscriber, or None if there are no events waiting.
+        """
+
+        if self._lagged and not self._closed:
+            self._lagged = False
+            return self._feed.get_game().make_sync_event()
+        if self._events:
+            return self._events.popleft()
+        return None
+
+    def poll(self):
+        """
+        Returns a list of every event waiting for the subscriber.
+        """
+
+        return list(self)
+
+    def get_pending(self):
+        """
+        Returns the number of events waiting for the subscriber.
+        """
+
+        return len(self._events)
+
+    def is_closed(self):
+        """
+        Returns True if the subscription or its feed was closed.
+        """
+
+        return self._closed
+
+    def close(self):
+        """
+        Ends the subscription. The events already waiting can still be read.
+        """
+
+        if not self._closed:
+            self._closed = True
+            self._feed.remove(self)
+            if self._waiter is not None:
+                self._waiter.set()
+
+    def __iter__(self):
+        """
+        Yields the events waiting for the subscriber, and stops when there are none left.
+        """
+
+        event = self.get_next()
+        while event is not None:
+            yield event
+            event = self.get_next()
+
+    def __aiter__(self):
+        """
+        Returns the subscription for an async for loop.
+        """
+
+        return self
+
+    async def __anext__(self):
+        """
+        Returns the next event for the subscriber, waiting for one if there are none. The async for loop ends
+        when the subscription is closed and its events are read.
+        """
+
+        while True:
+            event = self.get_next()
+            if event is not None:
+                return event
+            if self._closed:
+                raise StopAsyncIteration
+            if self._waiter is None:
+                self._waiter = asyncio.Event()
+            self._waiter.clear()
+            await self._waiter.wait()
+
+
+class EventFeed:
+    """
+    The EventFeed class sends the GameEvents of a FocusGame to its subscribers. The game makes each event once
+    and the feed adds the same event to every subscription, so the cost of a move does not depend on the board
+    and a spectator costs one append per move. The feed, the game and the subscriptions are used from one
+    thread, or from the one event loop of the async readers.
+    """
+    __slots__ = ('_game', '_subscriptions', '_buffer_size', '_published')
+
+    def __init__(self, game, buffer_size=BUFFER_SIZE):
+        """
+        Initializes a feed of the game's events with no subscribers and makes the game publish to it. Each
+        subscription holds up to the buffer size of events unless it is given its own size.
+        """
+
+        self._game = game
+        self._subscriptions = []
+        self._buffer_size = buffer_size
+        self._published = 0
+        game.set_feed(self)
+
+    def get_game(self):
+        """
+        Returns the FocusGame of the feed.
+        """
+
+        return self._game
+
+    def get_subscriber_count(self):
+        """
+        Returns the number of open subscriptions.
+        """
+
+        return len(self._subscriptions)
+
+    def get_published(self):
+        """
+        Returns the number of events published.
+        """
+
+        return self._published
+
+    def subscribe(self, buffer_size=None):
+        """
+        Returns a new Subscription to the feed. Its first event is a sync event of the position.
+        """
+
+        subscription = Subscription(self, buffer_size or self._buffer_size)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def add(self, subscriber):
+        """
+        Adds a subscriber of another kind to the feed: any object with a push method, which is called with
+        every event, such as a PonderWorker from domination_ponder.
+        """
+
+        self._subscriptions.append(subscriber)
+
+    def remove(self, subscription):
+        """
+        Removes a subscription from the feed.
+        """
+
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    def publish(self, event):
+        """
+        Adds the event to every subscription.
+        """
+
+        self._published += 1
+        for subscription in self._subscriptions:
+            subscription.push(event)
+
+    def close(self):
+        """
+        Closes every subscriber and stops the game publishing to the feed.
+        """
+
+        for subscription in list(self._subscriptions):
+            subscription.close()
+        if self._game.get_feed() is self:
+            self._game.set_feed(None)
@@ -0,0 +1,571 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program plays random and broken Focus moves on several implementations of the rules at once
+# and reports the first move where they disagree, cut down to the fewest moves that still show it.
+
+import argparse
+import array
+import collections
+import concurrent.futures
+import json
+import os
+import sys
+import time
+
+from domination_game import DEFAULT_RULES, HEIGHT_BITS, STATUS_ERRORS, FocusGame, InvalidLocation, MoveStatus, \
+    PlayerNameError, PlayerPieceError, PlayerTurnError, Rules
+from domination_selfplay import game_seed
+
+# The players of every fuzzed game. The first player moves first.
+PLAYER_TUPLES = (('Player1', 'R'), ('Player2', 'G'))
+
+# The ways a legal move is broken, and how often each is picked against making the legal move as it is.
+MUTATIONS = ('legal', 'legal', 'legal', 'legal', 'out_of_turn', 'bad_name', 'off_board', 'diagonal', 'pieces',
+             'no_move', 'any_start', 'malformed', 'reserve', 'reserve_off_board')
+
+
+class ReferenceGame:
+    """
+    The ReferenceGame class plays Focus by the rules in the plainest way, with the board as a list of rows of
+    piece lists, so that the faster implementations can be checked against it. It raises the same errors with
+    the same messages, in the same order, as FocusGame.
+    """
+    __slots__ = ('_names', '_colors', '_board', '_reserves', '_captures', '_last', '_rules')
+
+    def __init__(self, player1, player2, rules=DEFAULT_RULES):
+        """
+        Initializes the game for the two (name, color) player tuples with the starting layout of the rules.
+        """
+
+        self._names = [player1[0], player2[0]]
+        self._colors = [player1[1], player2[1]]
+        self._rules = rules
+
+        # The layout of the starting pieces repeats in flat board order, as in Board.
+        size = rules.get_board_size()
+        layout = rules.get_layout()
+        self._board = []
+        for x_coord in range(size):
+            row = []
+            for y_coord in range(size):
+                owner = layout[(x_coord * size + y_coord) % len(layout)]
+                row.append([] if owner is None else [self._colors[owner]])
+            self._board.append(row)
+        self._reserves = [0, 0]
+        self._captures = [0, 0]
+        self._last = None
+
+    def find_player(self, name):
+        """
+        Returns the index of the named player, raising an error if there is no such player.
+        """
+
+        for index, player_name in enumerate(self._names):
+            if player_name.lower() == name.lower():
+                return index
+        raise PlayerNameError('invalid player name')
+
+    def on_board(self, position):
+        """
+        Returns True if the position is a pair of coordinates on the board.
+        """
+
+        size = self._rules.get_board_size()
+        return 0 <= position[0] < size and 0 <= position[1] < size
+
+    def move_piece(self, name, start, end, pieces):
+        """
+        Moves the number of pieces from the top of the stack at the start to the end for the named player.
+        """
+
+        index = self.find_player(name)
+        if index != (0 if self._last is None else 1 - self._last):
+            raise PlayerTurnError('not your turn')
+        if len(start) != 2 or len(end) != 2 or not self.on_board(start) or not self.on_board(end):
+            raise InvalidLocation('invalid location')
+        stack = self._board[start[0]][start[1]]
+        if not stack:
+            raise InvalidLocation('no piece on start location')
+        if stack[-1] != self._colors[index]:
+            raise PlayerPieceError('not your piece')
+        if start[0] != end[0] and start[1] != end[1]:
+            raise InvalidLocation('diagonal moves not allowed')
+        if start == end:
+            raise InvalidLocation('piece does not move')
+        if pieces != abs(end[0] - start[0]) + abs(end[1] - start[1]) or pieces > len(stack):
+            raise PlayerPieceError('invalid number of pieces')
+        moving = stack[len(stack) - pieces:]
+        del stack[len(stack) - pieces:]
+        return self.place(index, name, end, moving)
+
+    def reserved_move(self, name, position):
+        """
+        Places one of the named player's reserve pieces at the position.
+        """
+
+        index = self.find_player(name)
+        if len(position) != 2:
+            raise InvalidLocation('invalid location')
+        if self._reserves[index] == 0:
+            raise PlayerPieceError('no pieces in reserve')
+        if not self.on_board(position):
+            raise InvalidLocation('invalid location')
+        if index != (0 if self._last is None else 1 - self._last):
+            raise PlayerTurnError('not your turn')
+        self._reserves[index] -= 1
+        return self.place(index, name, position, [self._colors[index]])
+
+    def place(self, index, name, end, moving):
+        """
+        Puts the moving pieces on the stack at the end, takes the pieces over the stack limit off the bottom into
+        the player's reserves or captures, and passes the turn. Returns the message of the move.
+        """
+
+        stack = self._board[end[0]][end[1]]
+        stack.extend(moving)
+        while len(stack) > self._rules.get_max_stack():
+            if stack.pop(0) == self._colors[index]:
+                self._reserves[index] += 1
+            else:
+                self._captures[index] += 1
+        self._last = index
+        return name + 'wins!' if self._captures[index] >= self._rules.get_capture_target() else 'successfully moved'
+
+    def get_state(self):
+        """
+        Returns the board bytes in the form of Board.get_codes, the (reserves, captures) pair of each player and
+        the index of the player to move.
+        """
+
+        codes = array.array(self._rules.get_typecode())
+        for row in self._board:
+            for stack in row:
+                owners = sum(1 << level for level, piece in enumerate(stack) if piece == self._colors[1])
+                codes.append(len(stack) | (owners << HEIGHT_BITS))
+        holdings = ((self._reserves[0], self._captures[0]), (self._reserves[1], self._captures[1]))
+        return codes.tobytes(), holdings, 0 if self._last is None else 1 - self._last
+
+
+class ReferenceEngine:
+    """
+    The ReferenceEngine class runs fuzzed moves on a ReferenceGame.
+    """
+    __slots__ = ('_game',)
+
+    def __init__(self, rules=DEFAULT_RULES):
+        """
+        Initializes the engine with a new game of the rules.
+        """
+
+        self._game = ReferenceGame(*PLAYER_TUPLES, rules=rules)
+
+    def attempt(self, op):
+        """
+        Makes a fuzzed move and returns its outcome: ('ok', message) or ('error', error name and message).
+        """
+
+        try:
+            if op[0] == 'reserve':
+                return 'ok', self._game.reserved_move(op[1], op[2])
+            return 'ok', self._game.move_piece(op[1], op[2], op[3], op[4])
+        except Exception as error:
+            return 'error', '%s: %s' % (type(error).__name__, error)
+
+    def get_state(self):
+        """
+        Returns the board bytes, holdings and player to move.
+        """
+
+        return self._game.get_state()
+
+
+class RaisingEngine:
+    """
+    The RaisingEngine class runs fuzzed moves through FocusGame.move_piece and FocusGame.reserved_move.
+    """
+    __slots__ = ('_game',)
+
+    def __init__(self, rules=DEFAULT_RULES):
+        """
+        Initializes the engine with a new game of the rules.
+        """
+
+        self._game = FocusGame(*PLAYER_TUPLES, rules=rules)
+
+    def get_game(self):
+        """
+        Returns the FocusGame of the engine.
+        """
+
+        return self._game
+
+    def attempt(self, op):
+        """
+        Makes a fuzzed move and returns its outcome: ('ok', message) or ('error', error name and message).
+        """
+
+        try:
+            if op[0] == 'reserve':
+                return 'ok', self._game.reserved_move(op[1], op[2])
+            return 'ok', self._game.move_piece(op[1], op[2], op[3], op[4])
+        except Exception as error:
+            return 'error', '%s: %s' % (type(error).__name__, error)
+
+    def get_state(self):
+        """
+        Returns the board bytes, holdings and player to move.
+        """
+
+        return game_state(self._game)
+
+
+class TryEngine(RaisingEngine):
+    """
+    The TryEngine class runs fuzzed moves through FocusGame.try_move and FocusGame.try_reserved_move, and turns
+    their statuses into the outcomes the raising methods would have had.
+    """
+    __slots__ = ()
+
+    def attempt(self, op):
+        """
+        Makes a fuzzed move and returns its outcome: ('ok', message) or ('error', error name and message).
+        """
+
+        try:
+            if op[0] == 'reserve':
+                status = self._game.try_reserved_move(op[1], op[2])
+            else:
+                status = self._game.try_move(op[1], op[2], op[3], op[4])
+        except Exception as error:
+            return 'error', '%s: %s' % (type(error).__name__, error)
+        if status == MoveStatus.WIN:
+            return 'ok', op[1] + 'wins!'
+        if status == MoveStatus.SUCCESS:
+            return 'ok', 'successfully moved'
+        error, message = STATUS_ERRORS[status]
+        return 'error', '%s: %s' % (error.__name__, message)
+
+
+class BatchEngine:
+    """
+    The BatchEngine class runs fuzzed moves on a one-board FocusBatch. The batch does not check moves, so a
+    move is made when it is one of the batch's legal actions for the player to move and is otherwise counted
+    as an error, without a name or message. The batch stops at a win while FocusGame goes on, so the engine
+    drops out of the comparison once its board has a winner.
+    """
+    __slots__ = ('_batch', '_names', '_tools', '_actions')
+
+    def __init__(self, rules=DEFAULT_RULES):
+        """
+        Initializes the engine with a new one-board batch of the rules. NumPy is only needed when this engine is
+        used.
+        """
+
+        import domination_batch
+        self._tools = domination_batch
+        self._batch = domination_batch.from_games([FocusGame(*PLAYER_TUPLES, rules=rules)])
+        self._actions = domination_batch.get_action_tables(rules).get_action_of_move()
+        self._names = [player[0].lower() for player in PLAYER_TUPLES]
+
+    def is_finished(self):
+        """
+        Returns True once the batch board has a winner.
+        """
+
+        return self._batch.get_winner()[0] >= 0
+
+    def attempt(self, op):
+        """
+        Makes a fuzzed move and returns its outcome: ('ok', None) or ('error', None), or ('error', error name
+        and message) if the batch raised an error.
+        """
+
+        move = (None, op[2], 1) if op[0] == 'reserve' else tuple(op[2:])
+        action = self._actions.get(move, -1)
+        name = op[1].lower()
+        try:
+            turn = int(self._batch.get_turn()[0])
+            if action < 0 or name not in self._names or self._names.index(name) != turn or \
+                    not self._batch.legal_mask()[0, action]:
+                return 'error', None
+            self._batch.step([action])
+        except Exception as error:
+            return 'error', '%s: %s' % (type(error).__name__, error)
+        return 'ok', None
+
+    def get_state(self):
+        """
+        Returns the board bytes, holdings and player to move.
+        """
+
+        codes, holdings, turn = self._tools.batch_state(self._batch, 0)
+        return codes, tuple(tuple(holding) for holding in holdings), turn
+
+
+# The implementations that can be compared by name. The first one named is the one the others must match.
+ENGINES = {
+    'reference': ReferenceEngine,
+    'raising': RaisingEngine,
+    'try': TryEngine,
+    'batch': BatchEngine,
+}
+
+
+def game_state(game):
+    """
+    Returns the board bytes, holdings and player to move of a FocusGame.
+    """
+
+    board = game.get_board()
+    players = game.get_players()
+    turn = 0 if board.check_turn().lower() == players[0].get_player_name().lower() else 1
+    return board.get_codes(), tuple((player.get_reserves(), player.get_captures()) for player in players), turn
+
+
+def vary_case(rng, name):
+    """
+    Returns the name with the case of its letters changed at random, which the rules must ignore.
+    """
+
+    return ''.join(letter.upper() if rng.random() < 0.5 else letter.lower() for letter in name)
+
+
+def generate_op(rng, game):
+    """
+    Returns a fuzzed move for the game position: a ('move', name, start, end, pieces) or ('reserve', name,
+    position) tuple. Most are legal moves of the player to move, and the others break a legal move in one of
+    the ways of MUTATIONS.
+    """
+
+    rules = game.get_rules()
+    coordinates = rules.get_coordinates()
+    size = rules.get_board_size()
+    turn = game.get_board().check_turn()
+    other = [player[0] for player in PLAYER_TUPLES if player[0].lower() != turn.lower()][0]
+    moves = game.legal_moves(turn)
+    start, end, pieces = moves[rng.randrange(len(moves))] if moves else (coordinates[0], coordinates[1], 1)
+    if start is None:
+        return 'reserve', vary_case(rng, turn), end
+    mutation = rng.choice(MUTATIONS)
+    name = vary_case(rng, turn)
+    if mutation == 'out_of_turn':
+        name = vary_case(rng, other)
+    elif mutation == 'bad_name':
+        name = 'Nobody'
+    elif mutation == 'off_board':
+        end = (end[0], rng.choice((-1, size, size + 1)))
+    elif mutation == 'diagonal':
+        end = (end[0] + 1, end[1] + 1)
+    elif mutation == 'pieces':
+        pieces += rng.choice((-1, 1, 2, rules.get_max_stack()))
+    elif mutation == 'no_move':
+        end = start
+    elif mutation == 'any_start':
+        start = rng.choice(coordinates)
+    elif mutation == 'malformed':
+        start = rng.choice(((start[0],), start + (0,)))
+    elif mutation == 'reserve':
+        return 'reserve', name, rng.choice(coordinates)
+    elif mutation == 'reserve_off_board':
+        return 'reserve', rng.choice((name, vary_case(rng, other))), (rng.choice((-1, size)), 0)
+    return 'move', name, start, end, pieces
+
+
+def start_engines(engine_names, rules=DEFAULT_RULES):
+    """
+    Returns new engines of the named implementations for the rules and the FocusGame to fuzz moves for, which is
+    the game of the first FocusGame engine named or else a game of an extra engine that is returned last.
+    """
+
+    engines = [ENGINES[name](rules) for name in engine_names]
+    for engine in engines:
+        if isinstance(engine, RaisingEngine):
+            return engines, engine.get_game()
+    engines.append(RaisingEngine(rules))
+    return engines, engines[-1].get_game()
+
+
+def compare_op(engines, engine_names, op, number):
+    """
+    Makes a fuzzed move on every engine and compares the outcome and the state after it with the first
+    engine. Returns None if they agree, or a dictionary that describes the difference.
+    """
+
+    expected = engines[0].attempt(op)
+    expected_state = engines[0].get_state()
+    for name, engine in zip(engine_names[1:], engines[1:]):
+        if isinstance(engine, BatchEngine) and engine.is_finished():
+            continue
+        outcome = engine.attempt(op)
+        if outcome[0] != expected[0] or (outcome[1] is not None and outcome[1] != expected[1]):
+            return {'move': number, 'engine': name, 'expected': expected, 'found': outcome}
+        state = engine.get_state()
+        if state != expected_state:
+            return {'move': number, 'engine': name, 'expected': describe_state(expected_state),
+                    'found': describe_state(state)}
+
+    # The extra engine that only drives the fuzzing follows along.
+    for engine in engines[len(engine_names):]:
+        engine.attempt(op)
+    return None
+
+
+def fuzz_game(seed, index, count, engine_names, rules=DEFAULT_RULES):
+    """
+    Plays the number of fuzzed moves of the game with the index, which only depend on the seed, on every named
+    implementation with the rules. Returns the moves made and the first difference, or None.
+    """
+
+    rng = game_seed(seed, index)
+    engines, game = start_engines(engine_names, rules)
+    ops = []
+    for number in range(count):
+        op = generate_op(rng, game)
+        ops.append(op)
+        failure = compare_op(engines, engine_names, op, number)
+        if failure is not None:
+            return ops, failure
+    return ops, None
+
+
+def replay(ops, engine_names, rules=DEFAULT_RULES):
+    """
+    Makes the fuzzed moves on new engines of every named implementation with the rules. Returns None if they all
+    agree, or a dictionary that describes the first difference.
+    """
+
+    engines = [ENGINES[name](rules) for name in engine_names]
+    for number, op in enumerate(ops):
+        failure = compare_op(engines, engine_names, op, number)
+        if failure is not None:
+            return failure
+    return None
+
+
+def describe_state(state):
+    """
+    Returns a state in a form that can be written as JSON.
+    """
+
+    codes, holdings, turn = state
+    return {'codes': list(codes), 'holdings': [list(holding) for holding in holdings], 'turn': turn}
+
+
+def shrink(ops, engine_names, rules=DEFAULT_RULES):
+    """
+    Returns a shorter list of fuzzed moves that still makes the implementations disagree, by cutting the moves
+    after the first difference and then removing parts of the list for as long as a difference remains. The
+    difference found may not be the first one, only one that still shows a disagreement.
+    """
+
+    failure = replay(ops, engine_names, rules)
+    ops = list(ops[:failure['move'] + 1])
+    parts = 2
+    while len(ops) > 1:
+        size = -(-len(ops) // parts)
+        for first in range(0, len(ops), size):
+            candidate = ops[:first] + ops[first + size:]
+            if candidate and replay(candidate, engine_names, rules) is not None:
+                ops = candidate
+                parts = max(parts - 1, 2)
+                break
+        else:
+            if parts >= len(ops):
+                break
+            parts = min(parts * 2, len(ops))
+    return ops
+
+
+def fuzz_games(first, last, seed, count, engine_names, rules=DEFAULT_RULES):
+    """
+    Fuzzes the games with indexes from first up to last and returns the number of moves made and the first
+    failure, shrunk, or None. This is the unit of work sent to a worker process.
+    """
+
+    moves = 0
+    for index in range(first, last):
+        ops, failure = fuzz_game(seed, index, count, engine_names, rules)
+        moves += len(ops)
+        if failure is not None:
+            ops = shrink(ops, engine_names, rules)
+            failure = replay(ops, engine_names, rules)
+            failure.update({'game': index, 'seed': seed, 'ops': ops})
+            return moves, failure
+    return moves, None
+
+
+def run_fuzz(games, count=200, seed=0, engine_names=('reference', 'raising', 'try'), workers=None, batch=32,
+             rules=DEFAULT_RULES):
+    """
+    Fuzzes the number of games of the number of moves each, played with the rules, across a pool of worker
+    processes, one per core unless the number of workers is given. Returns the number of moves made and the
+    first failure found, or None.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        total = 0
+        for first in range(0, games, batch):
+            moves, failure = fuzz_games(first, min(first + batch, games), seed, count, engine_names, rules)
+            total += moves
+            if failure is not None:
+                return total, failure
+        return total, None
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        total = 0
+        for first in range(0, games, batch):
+            pending.append(executor.submit(fuzz_games, first, min(first + batch, games), seed, count, engine_names,
+                                           rules))
+            if len(pending) >= workers * 4:
+                moves, failure = pending.popleft().result()
+                total += moves
+                if failure is not None:
+                    executor.shutdown(cancel_futures=True)
+                    return total, failure
+        while pending:
+            moves, failure = pending.popleft().result()
+            total += moves
+            if failure is not None:
+                executor.shutdown(cancel_futures=True)
+                return total, failure
+    return total, None
+
+
+def main(argv=None):
+    """
+    Runs the fuzzer from the command line and prints the moves per second, or the shrunk failure. The exit
+    status is 1 if the implementations disagree.
+    """
+
+    parser = argparse.ArgumentParser(description='Compares Focus rule implementations on fuzzed moves.')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--moves', type=int, default=200, help='moves per game')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--engines', nargs='+', default=['reference', 'raising', 'try'], choices=sorted(ENGINES))
+    parser.add_argument('--output', help='file to write a failure to as JSON')
+    parser.add_argument('--size', type=int, default=6, help='squares on each side of the board')
+    parser.add_argument('--stack', type=int, default=5, help='most pieces a stack may hold')
+    parser.add_argument('--target', type=int, default=6, help='captured pieces that win')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    rules = Rules(args.size, args.stack, args.target)
+    moves, failure = run_fuzz(args.games, args.moves, args.seed, args.engines, args.workers, rules=rules)
+    elapsed = time.perf_counter() - started
+    print('moves: %d  moves/sec: %.1f  moves/min: %.0f' % (moves, moves / elapsed, moves / elapsed * 60))
+    if failure is None:
+        print('no differences found')
+        return 0
+    print(json.dumps(failure, default=str))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(failure, output, default=str, indent=2)
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,9 +2,326 @@
 # Date: 11.22.20
 # Description: This program allows the user to begin a two-player game of Focus.
 
+import array
+import enum
+import random
+
+# The number of squares on each side of the board and the number of pieces a stack may hold.
+BOARD_SIZE = 6
+MAX_STACK = 5
+
+# Each board square is stored in one byte: the stack height in the low bits and the piece owners above it.
+# Rules with stacks of more than 5 pieces store every square in two bytes instead.
+HEIGHT_BITS = 3
+HEIGHT_MASK = (1 << HEIGHT_BITS) - 1
+
+# The largest board side a Rules instance may have.
+MAX_BOARD_SIZE = 20
+
+# The number of moves played with the FocusGame move methods that a board keeps to take back with undo_move.
+# Older moves are dropped so the undo stack of a long live game does not grow without bound. The moves made
+# with Board.apply_move by search and analysis, which take back every move they make, are not limited.
+HISTORY_LIMIT = 256
+
+
+def build_ray_tables(size):
+    """
+    Builds the orthogonal rays for every square of a board with the given side length. Each square (in flat
+    board order) gets four tuples, one per direction, that list the flat positions reached by moving 1, 2, 3...
+    spaces in that direction before the edge of the board.
+    """
+
+    rays = []
+    for x_coord in range(size):
+        for y_coord in range(size):
+            square_rays = []
+            for step_x, step_y in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                ray = []
+                ray_x, ray_y = x_coord + step_x, y_coord + step_y
+                while 0 <= ray_x < size and 0 <= ray_y < size:
+                    ray.append(ray_x * size + ray_y)
+                    ray_x, ray_y = ray_x + step_x, ray_y + step_y
+                square_rays.append(tuple(ray))
+            rays.append(tuple(square_rays))
+    return tuple(rays)
+
+
+def build_move_tables(size, max_stack):
+    """
+    Builds the stack moves that can start from each square, indexed by square and then by the height of the
+    stack on it. A stack move is a (start, end, pieces) tuple of coordinates where the number of pieces moved
+    is also the number of spaces moved, so a stack of height h can make every move of up to h spaces.
+    """
+
+    coordinates = tuple((x_coord, y_coord) for x_coord in range(size) for y_coord in range(size))
+    tables = []
+    for index, square_rays in enumerate(build_ray_tables(size)):
+        by_height = [()]
+        for height in range(1, max_stack + 1):
+            moves = [(coordinates[index], coordinates[ray[height - 1]], height)
+                     for ray in square_rays if len(ray) >= height]
+            by_height.append(by_height[-1] + tuple(moves))
+        tables.append(tuple(by_height))
+    return coordinates, tuple(tables)
+
+
+def build_top_owners(max_stack):
+    """
+    Builds the owner of the top piece of every square code for stacks of up to max_stack pieces, or -1 for an
+    empty square.
+    """
+
+    return (-1,) + tuple((code >> (HEIGHT_BITS + (code & HEIGHT_MASK) - 1)) & 1 if code & HEIGHT_MASK else -1
+                         for code in range(1, 1 << (HEIGHT_BITS + max_stack)))
+
+
+def build_zobrist_keys(squares, codes, holdings, seed=0x5EED):
+    """
+    Builds the random 64-bit keys for Zobrist hashing: one key per square and square byte, one key per
+    player and number of reserve pieces, one key per player and number of captured pieces, and one key for
+    the second player being the side to move. The keys for an empty square and for holding no pieces are 0,
+    so they do not have to be hashed.
+    """
+
+    rng = random.Random(seed)
+    square_keys = tuple((0,) + tuple(rng.getrandbits(64) for code in range(1, codes)) for index in range(squares))
+    reserve_keys = tuple((0,) + tuple(rng.getrandbits(64) for count in range(holdings)) for player in range(2))
+    capture_keys = tuple((0,) + tuple(rng.getrandbits(64) for count in range(holdings)) for player in range(2))
+    return square_keys, reserve_keys, capture_keys, rng.getrandbits(64)
+
+
+class Rules:
+    """
+    The Rules class holds the settings of a Focus game: the number of squares on each side of the board, the
+    most pieces a stack may hold, the number of captured pieces that wins, and the layout of the starting
+    pieces. The layout is a sequence of 0 for a first player piece, 1 for a second player piece or None for an
+    empty square, repeated over the squares in flat board order. The move, mobility and hashing tables of
+    the rules are built once when the Rules instance is made, so games with the same rules should share it.
+    """
+    __slots__ = ('_board_size', '_max_stack', '_capture_target', '_layout', '_typecode', '_rays', '_coordinates',
+                 '_stack_moves', '_reserve_moves', '_mobility', '_top_owners', '_zobrist')
+
+    def __init__(self, board_size=BOARD_SIZE, max_stack=MAX_STACK, capture_target=6, layout=(0, 0, 1, 1)):
+        """
+        Initializes the rules from the settings and builds their tables. Raises a ValueError for settings
+        that cannot be played.
+        """
+
+        if not 2 <= board_size <= MAX_BOARD_SIZE:
+            raise ValueError('board size must be from 2 to %d' % MAX_BOARD_SIZE)
+        if not 1 <= max_stack <= HEIGHT_MASK:
+            raise ValueError('stack limit must be from 1 to %d' % HEIGHT_MASK)
+        if capture_target < 1 or not layout or any(owner not in (0, 1, None) for owner in layout):
+            raise ValueError('invalid capture target or layout')
+        self._board_size = board_size
+        self._max_stack = max_stack
+        self._capture_target = capture_target
+        self._layout = tuple(layout)
+
+        # A square needs the height bits and one owner bit per piece.
+        self._typecode = 'B' if HEIGHT_BITS + max_stack <= 8 else 'H'
+        squares = board_size * board_size
+        self._rays = build_ray_tables(board_size)
+        self._coordinates, self._stack_moves = build_move_tables(board_size, max_stack)
+        self._reserve_moves = tuple((None, coordinate, 1) for coordinate in self._coordinates)
+        self._mobility = tuple(tuple(len(moves) for moves in by_height) for by_height in self._stack_moves)
+        self._top_owners = build_top_owners(max_stack)
+        self._zobrist = build_zobrist_keys(squares, 1 << (HEIGHT_BITS + max_stack), squares)
+
+    def __reduce__(self):
+        """
+        Pickles the rules as their settings, so the tables are built again instead of copied.
+        """
+
+        return Rules, (self._board_size, self._max_stack, self._capture_target, self._layout)
+
+    def __eq__(self, other):
+        """
+        Returns True if the other rules have the same settings.
+        """
+
+        return self is other or (isinstance(other, Rules) and self.get_settings() == other.get_settings())
+
+    def __hash__(self):
+        """
+        Returns the hash of the settings.
+        """
+
+        return hash(self.get_settings())
+
+    def get_settings(self):
+        """
+        Returns the (board size, stack limit, capture target, layout) settings of the rules.
+        """
+
+        return self._board_size, self._max_stack, self._capture_target, self._layout
+
+    def get_board_size(self):
+        """
+        Returns the number of squares on each side of the board.
+        """
+
+        return self._board_size
+
+    def get_square_count(self):
+        """
+        Returns the number of squares of the board.
+        """
+
+        return self._board_size * self._board_size
+
+    def get_max_stack(self):
+        """
+        Returns the most pieces a stack may hold.
+        """
+
+        return self._max_stack
+
+    def get_capture_target(self):
+        """
+        Returns the number of captured pieces that wins the game.
+        """
+
+        return self._capture_target
+
+    def get_layout(self):
+        """
+        Returns the layout pattern of the starting pieces.
+        """
+
+        return self._layout
+
+    def get_typecode(self):
+        """
+        Returns the array typecode that holds a square of the board.
+        """
+
+        return self._typecode
+
+    def make_squares(self, codes=None):
+        """
+        Returns a new flat store of square codes for a board of the rules: a bytearray when a square fits in a
+        byte and an array of two-byte codes otherwise. The store is empty unless it is made from the bytes of
+        Board.get_codes. Raises a ValueError if the bytes are not a board of the rules.
+        """
+
+        if self._typecode == 'B':
+            squares = bytearray(self.get_square_count()) if codes is None else bytearray(codes)
+        elif codes is None:
+            squares = array.array(self._typecode, [0]) * self.get_square_count()
+        else:
+            squares = array.array(self._typecode)
+            squares.frombytes(codes)
+        if len(squares) != self.get_square_count():
+            raise ValueError('the codes are not a board of the rules')
+        return squares
+
+    def get_start_codes(self):
+        """
+        Returns the list of square codes of the starting position in flat board order.
+        """
+
+        codes = []
+        for index in range(self.get_square_count()):
+            owner = self._layout[index % len(self._layout)]
+            codes.append(0 if owner is None else 1 | (owner << HEIGHT_BITS))
+        return codes
+
+    def get_rays(self):
+        """
+        Returns the rays of every square, as built by build_ray_tables.
+        """
+
+        return self._rays
+
+    def get_coordinates(self):
+        """
+        Returns the (x, y) coordinates of every square in flat board order.
+        """
+
+        return self._coordinates
+
+    def get_stack_moves(self):
+        """
+        Returns the stack moves of every square by stack height, as built by build_move_tables.
+        """
+
+        return self._stack_moves
+
+    def get_reserve_moves(self):
+        """
+        Returns the reserve move onto every square.
+        """
+
+        return self._reserve_moves
+
+    def get_mobility(self):
+        """
+        Returns the number of stack moves from every square by the height of the stack on it.
+        """
+
+        return self._mobility
+
+    def get_top_owners(self):
+        """
+        Returns the owner of the top piece of every square code, or -1 for an empty square.
+        """
+
+        return self._top_owners
+
+    def get_zobrist_keys(self):
+        """
+        Returns the (square, reserve, capture, side) Zobrist keys of the rules, as built by build_zobrist_keys.
+        """
+
+        return self._zobrist
+
+
+# The rules of the game described in the README, used when no rules are given.
+DEFAULT_RULES = Rules()
+
+# Precomputed rays, stack moves and reserve placements for the default board.
+RAYS = DEFAULT_RULES.get_rays()
+COORDINATES = DEFAULT_RULES.get_coordinates()
+STACK_MOVES = DEFAULT_RULES.get_stack_moves()
+RESERVE_MOVES = DEFAULT_RULES.get_reserve_moves()
+
+# The number of stack moves from each square by the height of the stack on it, and the owner of the top piece
+# of every square byte (-1 for an empty square).
+MOBILITY = DEFAULT_RULES.get_mobility()
+TOP_OWNERS = DEFAULT_RULES.get_top_owners()
+
+# Zobrist keys for the default board.
+ZOBRIST_SQUARES, ZOBRIST_RESERVES, ZOBRIST_CAPTURES, ZOBRIST_SIDE = DEFAULT_RULES.get_zobrist_keys()
+
+# The kinds of scores kept in a transposition table entry.
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+
+class MoveStatus(enum.IntEnum):
+    """
+    The MoveStatus class lists the results of trying a move. SUCCESS and WIN mean the move was made, and every
+    other status names the reason the move was not allowed.
+    """
+    SUCCESS = 0
+    WIN = 1
+    NOT_YOUR_TURN = 2
+    INVALID_NAME = 3
+    INVALID_LOCATION = 4
+    NO_PIECE = 5
+    NOT_YOUR_PIECE = 6
+    NO_MOVEMENT = 7
+    DIAGONAL_MOVE = 8
+    INVALID_NUMBER_OF_PIECES = 9
+    NO_RESERVES = 10
+
+
 class FocusGame:
     """
-    This class creates a Focus game instance for two players on a 6x6 game board. The Focus game
+    This class creates a Focus game instance for two players on a 6x6 game board, or on the board of the
+    Rules instance passed to it. The Focus game
     instance allows the players to play an entire game of Focus. Each player moves their game piece
     on top of another game piece to create a stack that is controlled by the player's piece that is on top.
     If a player moves a piece that has other pieces stacked underneath the player's chosen piece, the player
@@ -15,505 +332,1520 @@ class FocusGame:
     pieces from a stack they "captured" that had over 5 pieces in a move instead of stacking pieces already
     on the board.
 
-    In order to play a Focus game, there needs to be a player class to hold player instances and a board
-    class to "create" the board. This class will have to communicate with the Board class and the Player
-    class in order to play a full game.
+    In order to play a Focus game, there needs to be a player class to hold player instances and a board
+    class to "create" the board. This class will have to communicate with the Board class and the Player
+    class in order to play a full game.
+    """
+    __slots__ = ('_player1', '_player2', '_player1_name', '_player2_name', '_player1_color', '_player2_color',
+                 '_board', '_feed')
+
+    def __init__(self, _player1, _player2, rules=None):
+        """
+        This method initializes the Focus game instance by identifying the two players and their chosen piece
+        colors. The init class calls the Board class to create a board for the Focus game with the rules, or
+        the default rules if none are given, and the board creates the player instances.
+        """
+
+        # Call the board class to create the board instance.
+        self.use_board(Board(_player1, _player2, rules))
+        self._feed = None
+
+    def use_board(self, board):
+        """
+        Makes the board the game's board. The game uses the board's player instances, so the reserve and
+        capture pieces are only held in one place.
+        """
+
+        self._board = board
+        self._player1 = board.player1
+        self._player2 = board.player2
+        self._player1_name = self._player1.get_player_name()
+        self._player2_name = self._player2.get_player_name()
+        self._player1_color = self._player1.get_player_color()
+        self._player2_color = self._player2.get_player_color()
+
+    def snapshot(self):
+        """
+        Returns a GameSnapshot of the game position that restore can go back to. The snapshot shares the
+        board squares with the game until the game next changes them, so taking one does not copy the board.
+        """
+
+        return self._board.snapshot()
+
+    def restore(self, snapshot):
+        """
+        Sets the game back to the position of a GameSnapshot taken from this game or another game with the
+        same rules. The moves made before cannot be taken back afterwards.
+        """
+
+        self._board.restore(snapshot)
+        if self._feed is not None:
+            self._feed.publish(self.make_sync_event())
+
+    def fork(self):
+        """
+        Returns a new game in the same position that can be played on without changing this game. The two
+        games share the board squares copy-on-write, so a fork only copies them when one of the games changes
+        them. The moves made before the fork can only be taken back in this game.
+        """
+
+        game = FocusGame.__new__(FocusGame)
+        game.use_board(self._board.fork())
+        game._feed = None
+        return game
+
+    def get_feed(self):
+        """
+        Returns the event feed the game publishes its changes to, or None.
+        """
+
+        return self._feed
+
+    def set_feed(self, feed):
+        """
+        Makes the game publish a GameEvent to the feed, an EventFeed from domination_events, for every move
+        made with move_piece, reserved_move or their try_ forms, every move taken back with undo_move, and
+        every position set up with load_position or restore. The moves made with apply_moves are sent as one
+        sync event. A feed of None stops the events.
+        """
+
+        self._feed = feed
+
+    def make_event(self, kind, player, move, holdings):
+        """
+        Returns the GameEvent of a move made or taken back by the player, where the holdings are the player's
+        (reserves, captures) before it. Only the squares the move starts and ends on are read from the board.
+        """
+
+        board = self._board
+        start, end, pieces = move
+        positions = (tuple(end),) if start is None else (tuple(start), tuple(end))
+        squares = tuple((position, board.get_board_position(*position)) for position in positions)
+        reserves = player.get_reserves() - holdings[0]
+        captures = player.get_captures() - holdings[1]
+
+        # The pieces pushed off the bottom of the end stack went to the player's reserves or captures, and a
+        # reserve move used one reserve piece besides.
+        confiscated = reserves + captures + (1 if start is None else 0) if kind == 'move' else 0
+        winner = None
+        if kind == 'move' and player.get_captures() >= board.get_rules().get_capture_target():
+            winner = player.get_player_name()
+        return GameEvent(kind, player.get_player_name(), move, squares, confiscated, reserves, captures,
+                         self.get_holdings(), board.check_turn(), winner)
+
+    def make_sync_event(self):
+        """
+        Returns a GameEvent of the whole position, with every square that holds a stack, for a subscriber that
+        has just joined or has missed events.
+        """
+
+        board = self._board
+        size = board.get_size()
+        squares = tuple(((x_coord, y_coord), board.get_board_position(x_coord, y_coord))
+                        for x_coord in range(size) for y_coord in range(size) if board.get_height(x_coord, y_coord))
+        target = board.get_rules().get_capture_target()
+        winner = None
+        for player in (self._player1, self._player2):
+            if winner is None and player.get_captures() >= target:
+                winner = player.get_player_name()
+        return GameEvent('sync', None, None, squares, 0, 0, 0, self.get_holdings(), board.check_turn(), winner)
+
+    def get_holdings(self):
+        """
+        Returns the (reserves, captures) pair of each player.
+        """
+
+        return tuple((player.get_reserves(), player.get_captures()) for player in (self._player1, self._player2))
+
+    def get_player_from_name(self, name):
+        """
+        Returns the player instance from a player name.
+        """
+
+        if self._player1_name.lower() == name.lower():
+            return self._player1
+        if self._player2_name.lower() == name.lower():
+            return self._player2
+
+    def move_piece(self, name, start, end, number_of_pieces):
+        """
+        This method moves the player piece to represent a turn in the Focus game. This method checks for
+        various errors and checks if the move is valid. If the move is valid, the pieces will be moved.
+        This method returns "Move successful" and also checks for win conditions if the move is valid.
+        """
+
+        # Checks that the name given (case-insensitive) is a player of the game and that it is their turn.
+        status, player = self.check_player(name)
+        raise_for_status(status)
+
+        # Checks that the move is valid for start location, end location, and number of pieces being moved,
+        # and moves the game piece if it passes the validation checks.
+        holdings = (player.get_reserves(), player.get_captures())
+        self._board.start_validation(player, start, end, number_of_pieces)
+        self._board.trim_history()
+        if self._feed is not None:
+            self._feed.publish(self.make_event('move', player, (start, end, number_of_pieces), holdings))
+        if self._board.check_win(player) == 'win':
+            return name + 'wins!'
+        return 'successfully moved'
+
+    def try_move(self, name, start, end, number_of_pieces):
+        """
+        Makes the same move as move_piece, but returns a MoveStatus instead of raising an error when the move
+        is not allowed, for callers that try many moves. The move is only made if the status is SUCCESS or WIN.
+        """
+
+        status, player = self.check_player(name)
+        if status:
+            return status
+        status = self._board.validate_move(player, start, end, number_of_pieces)
+        if status:
+            return status
+        holdings = (player.get_reserves(), player.get_captures())
+        self._board.apply_move(player, (start, end, number_of_pieces))
+        self._board.trim_history()
+        if self._feed is not None:
+            self._feed.publish(self.make_event('move', player, (start, end, number_of_pieces), holdings))
+        if self._board.check_win(player) == 'win':
+            return MoveStatus.WIN
+        return MoveStatus.SUCCESS
+
+    def apply_moves(self, sequence):
+        """
+        Makes a sequence of moves and returns a ReplayResult with the number of moves made, the final position
+        and, if a move was not allowed, its index and MoveStatus. Every move is a (player, move) pair where the
+        player is a player name (case-insensitive) or the index of the player, and the move is a (start, end,
+        pieces) tuple or a (None, position, 1) tuple for a reserve move. The players and the turn are looked
+        up once for the whole sequence instead of once per move, and each move is checked in the order
+        move_piece and reserved_move check it. The moves stop at the first one that is not allowed, which is
+        not made. The game's event feed is sent one sync event of the position after the moves, if any were
+        made, instead of an event per move.
+        """
+
+        board = self._board
+        players = (self._player1, self._player2)
+        indexes = {self._player1_name.lower(): 0, self._player2_name.lower(): 1}
+        side = self.get_side()
+        target = board.get_rules().get_capture_target()
+        winner = -1
+        applied = 0
+        status = MoveStatus.SUCCESS
+        for who, move in sequence:
+            index = who if isinstance(who, int) else indexes.get(who.lower(), -1)
+            start, end, pieces = move
+            if start is None:
+                status = self.check_reserve_index(index, end, side)
+            else:
+                status = self.check_player_index(index, side) or \
+                    board.validate_move(players[index], start, end, pieces)
+            if status:
+                break
+            player = players[index]
+            board.apply_move(player, (start, end, 1) if start is None else move)
+            applied += 1
+            if winner < 0 and player.get_captures() >= target:
+                winner = index
+            side = 1 - index
+        board.trim_history()
+        if applied and self._feed is not None:
+            self._feed.publish(self.make_sync_event())
+        holdings = tuple((player.get_reserves(), player.get_captures()) for player in players)
+        return ReplayResult(applied, status, applied if status else None, winner, board.get_codes(), holdings,
+                            side, board.get_hash())
+
+    def check_player(self, name):
+        """
+        Returns the MoveStatus of the named player trying to move, along with the player instance if the
+        status is SUCCESS or None otherwise. The move_piece and try_move methods share this check.
+        """
+
+        index = self.find_player(name)
+        status = self.check_player_index(index, self.get_side())
+        return status, (self._player1, self._player2)[index] if status == MoveStatus.SUCCESS else None
+
+    def find_player(self, name):
+        """
+        Returns the index of the named player (case-insensitive), or -1 if the name is not a player of the game.
+        """
+
+        names = self._board.get_names_list()
+        lowered = name.lower()
+        return names.index(lowered) if lowered in names else -1
+
+    def get_side(self):
+        """
+        Returns the index of the player whose turn it is.
+        """
+
+        return 0 if self._board.check_turn().lower() == self._player1_name.lower() else 1
+
+    def check_player_index(self, index, side):
+        """
+        Returns the MoveStatus of the player with the index trying to make a stack move when the player with
+        the index side is to move. Every way of making a stack move checks the player with this method.
+        """
+
+        if index not in (0, 1):
+            return MoveStatus.INVALID_NAME
+        if index != side:
+            return MoveStatus.NOT_YOUR_TURN
+        return MoveStatus.SUCCESS
+
+    def check_reserve_index(self, index, position, side):
+        """
+        Returns the MoveStatus of the player with the index placing a reserve piece at the position when the
+        player with the index side is to move. The checks are made in the order the reserved_move method has
+        always made them, and every way of making a reserve move makes them with this method.
+        """
+
+        if index not in (0, 1):
+            return MoveStatus.INVALID_NAME
+        if len(position) != 2:
+            return MoveStatus.INVALID_LOCATION
+        if (self._player1, self._player2)[index].get_reserves() == 0:
+            return MoveStatus.NO_RESERVES
+        size = self._board.get_size()
+        if not (0 <= position[0] < size and 0 <= position[1] < size):
+            return MoveStatus.INVALID_LOCATION
+        if index != side:
+            return MoveStatus.NOT_YOUR_TURN
+        return MoveStatus.SUCCESS
+
+    def legal_moves(self, name):
+        """
+        Returns a list of the legal moves for the named player. Stack moves are (start, end, pieces) tuples that
+        can be passed to move_piece and reserve moves are (None, position, 1) tuples for reserved_move. The list
+        is empty if it is not the player's turn.
+        """
+
+        # Checks that the name argument is a player of the Focus game instance.
+        if name.lower() not in self._board.get_names_list():
+            raise PlayerNameError("invalid player name")
+        if self._board.check_turn().lower() != name.lower():
+            return []
+        return self._board.generate_moves(self.get_player_from_name(name))
+
+    def undo_move(self):
+        """
+        Takes back the last move of the game. Returns the move that was taken back, as a (start, end, pieces)
+        tuple or a (None, position, 1) tuple for a reserve move, or None if there are no moves to take back.
+        The board keeps the last moves up to its history limit, HISTORY_LIMIT by default.
+        """
+
+        if self._feed is None:
+            return self._board.undo_move()
+        holdings = self.get_holdings()
+        move = self._board.undo_move()
+        if move is not None:
+            # The player whose move was taken back is the player to move again.
+            player = self.get_player_from_name(self._board.check_turn())
+            self._feed.publish(self.make_event('undo', player, move, holdings[self._board.get_player_index(player)]))
+        return move
+
+    def get_hash(self):
+        """
+        Returns the Zobrist hash of the game position.
+        """
+
+        return self._board.get_hash()
+
+    def probe_tablebase(self, tablebase):
+        """
+        Looks up the game position in an endgame Tablebase from domination_tablebase and returns an (outcome,
+        distance) pair for the player whose turn it is, or None if the tablebase does not hold the position.
+        """
+
+        return tablebase.probe(self._board, self.get_players())
+
+    def get_board(self):
+        """
+        Returns the Board instance of the game.
+        """
+
+        return self._board
+
+    def get_rules(self):
+        """
+        Returns the Rules instance of the game.
+        """
+
+        return self._board.get_rules()
+
+    def get_players(self):
+        """
+        Returns the two player instances of the game, which hold the reserve and capture pieces, in the order
+        they were passed to the game.
+        """
+
+        return self._player1, self._player2
+
+    def make_move(self, name, move):
+        """
+        Makes a move from legal_moves for the named player through move_piece, or through reserved_move for a
+        reserve move. Returns the message of the move.
+        """
+
+        start, end, pieces = move
+        if start is None:
+            return self.reserved_move(name, end)
+        return self.move_piece(name, start, end, pieces)
+
+    def load_position(self, codes, holdings, turn):
+        """
+        Sets up a position in the game from the board bytes returned by Board.get_codes, a pair of
+        (reserves, captures) tuples for the players, and the name of the player whose turn it is.
+        """
+
+        players = (self._player1, self._player2)
+        for player, (reserves, captures) in zip(players, holdings):
+            player.restore_holdings(reserves, captures)
+
+        # The player whose turn it is did not make the last move.
+        last_move = self._player2_name if turn.lower() == self._player1_name.lower() else self._player1_name
+        self._board.set_codes(codes, last_move, players)
+        if self._feed is not None:
+            self._feed.publish(self.make_sync_event())
+
+    def show_pieces(self, position):
+        """
+        This method takes a position of the Focus game board instance and finds the piece elements of the
+        position. It returns a list of the pieces at the tuple argument position.
+        """
+
+        position_x = position[0]
+        position_y = position[1]
+
+        # Checks to make sure the position argument is valid.
+        if len(position) != 2:
+            raise InvalidLocation('invalid location on the board')
+        else:
+            return self._board.get_board_position(position_x, position_y)
+
+    def show_reserve(self, player_name):
+        """
+        This method accesses the Player class's player instance from the player's name in the argument
+        (which is case-insensitive), and returns the number of pieces the player has in their reserve holdings.
+        """
+
+        # Checks if the player is a valid player in the game instance.
+        if player_name not in self._board.get_names_list():
+            return False
+        player = self.get_player_from_name(player_name)
+        return player.get_reserves()
+
+    def show_captured(self, player_name):
+        """
+        This method accesses the Player class's player instance from the player's name in the argument
+        (which is case-insensitive), and returns the number of opponent pieces the player has captured.
+        """
+
+        player = self.get_player_from_name(player_name)
+        return player.get_captures()
+
+    def reserved_move(self, player_name, position):
+        """
+        This method accesses the Player class's player instance from the player's name in the argument
+        (which is case-insensitive), and takes a reserve piece from the player's reserve piece list
+        and places the reserved piece on the board at the location argument provided. After placing the
+        reserved piece onto the board, the number of the player's reserved pieces decreases by 1. If
+        the player has no reserve pieces the move is not considered valid. If the move is not valid, an
+        error is raised that returns "no pieces in reserve."
+        """
+
+        # Checks the player, their reserve pieces and the position before making the reserve move.
+        status, player = self.check_reserved_move(player_name, position)
+        raise_for_status(status)
+        holdings = (player.get_reserves(), player.get_captures())
+        self._board.make_reserved_move(player.get_player_color(), position[0], position[1], player)
+        self._board.trim_history()
+        if self._feed is not None:
+            self._feed.publish(self.make_event('move', player, (None, position, 1), holdings))
+
+        # Checks for a win.
+        if self._board.check_win(player) == 'win':
+            return player_name + 'wins!'
+        return 'successfully moved'
+
+    def try_reserved_move(self, player_name, position):
+        """
+        Makes the same move as reserved_move, but returns a MoveStatus instead of raising an error when the
+        move is not allowed. The move is only made if the status is SUCCESS or WIN.
+        """
+
+        status, player = self.check_reserved_move(player_name, position)
+        if status:
+            return status
+        holdings = (player.get_reserves(), player.get_captures())
+        self._board.make_reserved_move(player.get_player_color(), position[0], position[1], player)
+        self._board.trim_history()
+        if self._feed is not None:
+            self._feed.publish(self.make_event('move', player, (None, position, 1), holdings))
+        if self._board.check_win(player) == 'win':
+            return MoveStatus.WIN
+        return MoveStatus.SUCCESS
+
+    def check_reserved_move(self, player_name, position):
+        """
+        Returns the MoveStatus of the named player placing a reserve piece at the position, along with the
+        player instance if the status is SUCCESS or None otherwise.
+        """
+
+        index = self.find_player(player_name)
+        status = self.check_reserve_index(index, position, self.get_side())
+        return status, (self._player1, self._player2)[index] if status == MoveStatus.SUCCESS else None
+
+
+class Board:
+    """
+    The Board class creates a 6x6 Board instance for the Focus game, or a board of the size set by its Rules.
+    The FocusGame class creates the Board class. The Board class interacts with the Player and the Game class by
+    holding/recording/updating all board variables and attributes. The Board class is integral to the focus
+    game because the Game class checks player move validity via the Board class methods.
+
+    The board is stored as one flat bytearray with a code for every square, or an array of two-byte codes when
+    the rules allow stacks too tall to fit in a byte. The low bits of a square hold the height of its stack and
+    the high bits hold one ownership bit per piece (bottom piece first), which is set when the piece belongs to
+    the second player. The piece lists used by the game are built from these codes when they are asked for.
+    Moves only touch the squares they start and end on, so their cost does not grow with the size of the board.
+    """
+    __slots__ = ('player1', 'player2', '_board', '_colors', '_last_move', '_names_list', '_undo', '_hash',
+                 '_features', '_rules', '_size', '_max_stack', '_zobrist', '_owns_board', '_history_limit')
+
+    def __init__(self, player1, player2, rules=None):
+        """
+        The initialization class that takes two player tuples that contain player names and player piece colors
+        and the Rules of the game, or None for the default rules. The board is created from the layout of the
+        rules.
+        """
+
+        self.player1 = Player(player1)
+        self.player2 = Player(player2)
+
+        # The piece color for each ownership bit stored on the board.
+        self._colors = (self.player1.get_player_color(), self.player2.get_player_color())
+
+        # Set up the board.
+        self._rules = DEFAULT_RULES if rules is None else rules
+        self._size = self._rules.get_board_size()
+        self._max_stack = self._rules.get_max_stack()
+        self._zobrist = self._rules.get_zobrist_keys()
+        self._board = self._rules.make_squares()
+        self._features = BoardFeatures(self._rules)
+        self._owns_board = True
+
+        # Add player pieces to the board.
+        for index, code in enumerate(self._rules.get_start_codes()):
+            self.set_square(index, code)
+
+        # Creates a variable that will record the last player who had a successful move.
+        self._last_move = ''
+        self._undo = []
+        self._history_limit = HISTORY_LIMIT
+        self._hash = self.compute_hash()
+        self._names_list = [self.player1.get_player_name().lower(), self.player2.get_player_name().lower()]
+
+    def get_names_list(self):
+        """
+        Returns the private list that holds the name of each player.
+        """
+
+        return self._names_list
+
+    def get_rules(self):
+        """
+        Returns the Rules instance of the board.
+        """
+
+        return self._rules
+
+    def get_size(self):
+        """
+        Returns the number of squares on each side of the board.
+        """
+
+        return self._size
+
+    def get_index(self, x_coord, y_coord):
+        """
+        Returns the position of the x and y coordinates in the flat board array. Raises an error if the
+        coordinates are not on the board.
+        """
+
+        if x_coord < 0 or x_coord >= self._size or y_coord < 0 or y_coord >= self._size:
+            raise InvalidLocation('invalid location')
+        return x_coord * self._size + y_coord
+
+    def get_hash(self):
+        """
+        Returns the Zobrist hash of the position, which is kept up to date as moves are made and taken back.
+        """
+
+        return self._hash
+
+    def compute_hash(self, holders=()):
+        """
+        Computes the Zobrist hash of the position from scratch. The hash covers the stack on every square,
+        the side to move, and the reserve and capture counts of the players in the holders argument, which
+        are the players passed to the moves.
+        """
+
+        square_keys, reserve_keys, capture_keys, side_key = self._zobrist
+        value = 0
+        for index, code in enumerate(self._board):
+            value ^= square_keys[index][code]
+        if self._last_move == self.player1.get_player_name():
+            value ^= side_key
+        for player in holders:
+            index = self.get_player_index(player)
+            value ^= reserve_keys[index][player.get_reserves()] ^ capture_keys[index][player.get_captures()]
+        return value
+
+    def get_player_index(self, player):
+        """
+        Returns 0 if the player is the first player of the board and 1 if the player is the second player.
+        """
+
+        return 0 if player.get_player_name() == self.player1.get_player_name() else 1
+
+    def get_codes(self):
+        """
+        Returns a copy of the board bytes in flat board order. Boards with two bytes per square return two
+        bytes per square in the machine byte order.
+        """
+
+        return bytes(self._board)
+
+    def set_codes(self, codes, last_move, holders=()):
+        """
+        Replaces the board bytes and the name of the player who moved last, for setting up a position. The
+        moves made before cannot be taken back afterwards. The hash is computed again with the holdings of the
+        players in the holders argument. Raises a ValueError if the bytes are not a board of the rules.
+        """
+
+        squares = self._rules.make_squares(codes)
+        self._board = self._rules.make_squares()
+        self._features = BoardFeatures(self._rules)
+        self._owns_board = True
+        for index, code in enumerate(squares):
+            self.set_square(index, code)
+        for player in holders:
+            self._features.set_holdings(self.get_player_index(player), player.get_reserves(), player.get_captures())
+        self._last_move = last_move
+        self._undo = []
+        self._hash = self.compute_hash(holders)
+
+    def set_square(self, index, code):
+        """
+        Sets the byte of the square at the flat board index and updates the position features for the change.
+        Every change to the board goes through this method, so it is where shared squares are copied.
+        """
+
+        if not self._owns_board:
+            self.own_board()
+        self._features.change_square(index, self._board[index], code)
+        self._board[index] = code
+
+    def own_board(self):
+        """
+        Copies the squares and features that the board shares with a snapshot or fork, so that the board can
+        change them.
+        """
+
+        self._board = self._board[:]
+        self._features = self._features.copy()
+        self._owns_board = True
+
+    def snapshot(self):
+        """
+        Returns a GameSnapshot of the position. The squares and features are shared with the snapshot, and
+        the board copies them before it next changes them.
+        """
+
+        self._owns_board = False
+        holdings = ((self.player1.get_reserves(), self.player1.get_captures()),
+                    (self.player2.get_reserves(), self.player2.get_captures()))
+        return GameSnapshot(self._rules, self._board, self._features, holdings, self.get_last_index(), self._hash)
+
+    def get_last_index(self):
+        """
+        Returns the index of the player who moved last, or -1 before the first move.
+        """
+
+        return -1 if self._last_move == '' else 0 if self._last_move == self.player1.get_player_name() else 1
+
+    def restore(self, snapshot):
+        """
+        Sets the board back to the position of a GameSnapshot. The squares and features of the snapshot are
+        shared until the board next changes them. Raises a ValueError if the snapshot has other rules.
+        """
+
+        if snapshot.get_rules() != self._rules:
+            raise ValueError('the snapshot has different rules')
+        self._board, self._features = snapshot.get_squares(), snapshot.get_features()
+        self._owns_board = False
+        for player, (reserves, captures) in zip((self.player1, self.player2), snapshot.get_holdings()):
+            player.restore_holdings(reserves, captures)
+
+        # The player who moved last is stored as the first or second player, since the snapshot may be from a
+        # game with other player names.
+        last_index = snapshot.get_last_index()
+        self._last_move = '' if last_index < 0 else (self.player1, self.player2)[last_index].get_player_name()
+        self._undo = []
+        self._hash = snapshot.get_hash()
+
+    def fork(self):
+        """
+        Returns a new board in the same position with copies of the players. The two boards share the squares
+        and features until one of them changes them. The new board has no moves to take back.
+        """
+
+        board = Board.__new__(Board)
+        board.player1 = self.player1.copy()
+        board.player2 = self.player2.copy()
+        board._colors = self._colors
+        board._names_list = self._names_list
+        board._rules = self._rules
+        board._size = self._size
+        board._max_stack = self._max_stack
+        board._zobrist = self._zobrist
+        board._board = self._board
+        board._features = self._features
+        board._last_move = self._last_move
+        board._undo = []
+        board._history_limit = self._history_limit
+        board._hash = self._hash
+        self._owns_board = board._owns_board = False
+        return board
+
+    def features(self):
+        """
+        Returns the BoardFeatures of the position, which changes as moves are made and taken back. The board
+        replaces it with a new object when the position is set up with set_codes or restore, and when the board
+        copies the features it shared with a snapshot or fork.
+        """
+
+        return self._features
+
+    def get_board_position(self, x_coord, y_coord):
+        """
+        Returns the board position for the x and y coordinates of the board.
+        """
+
+        code = self._board[self.get_index(x_coord, y_coord)]
+        owners = code >> HEIGHT_BITS
+        return [self._colors[(owners >> level) & 1] for level in range(code & HEIGHT_MASK)]
+
+    def check_turn(self):
+        """
+        Returns the private data variable of the player that moved last.
+        """
+
+        # Returns the first player if it is the first move of the game.
+        if self._last_move == '':
+            return self.player1.get_player_name()
+
+        # Returns the player whose turn it is after checking the _last_move variable.
+
+        else:
+            # Returns player 2 if the last move was by player 1.
+            if self._last_move == self.player1.get_player_name():
+                return self.player2.get_player_name().lower()
+
+            # Returns player 1 if the last move was by player 2.
+            if self._last_move == self.player2.get_player_name():
+                return self.player1.get_player_name()
+
+    def generate_moves(self, player):
+        """
+        Returns a list of every legal move for the player, in flat board order of the stacks they move. Only
+        the stacks with the player's piece on top are visited, so empty and opponent squares cost nothing.
+        Stack moves are (start, end, pieces) tuples and reserve moves are (None, position, 1) tuples.
+        """
+
+        # Finds the stacks topped by the piece owners on the board that the player's color can move.
+        color = player.get_player_color()
+        squares = [index for owner in (0, 1) if color in self._colors[owner]
+                   for index in self._features.get_squares(owner)]
+
+        # Adds the moves of every stack with the player's piece on top.
+        board = self._board
+        stack_moves = self._rules.get_stack_moves()
+        moves = []
+        for index in sorted(squares):
+            moves.extend(stack_moves[index][board[index] & HEIGHT_MASK])
+
+        # A reserve piece can be placed on any square.
+        if player.get_reserves() > 0:
+            moves.extend(self._rules.get_reserve_moves())
+        return moves
+
+    def get_control(self):
+        """
+        Returns a list with the number of stacks each player controls, indexed by player, where a player
+        controls a stack if their piece is on top of it.
+        """
+
+        return [self._features.get_control(0), self._features.get_control(1)]
+
+    def get_confiscations(self, player, move):
+        """
+        Returns how many pieces the move would add to the player's reserves and to the player's captures,
+        as a (reserves, captures) tuple, without making the move.
+        """
+
+        start, end, pieces = move
+        code = self._board[end[0] * self._size + end[1]]
+        over = (code & HEIGHT_MASK) + pieces - self._max_stack
+        if over <= 0:
+            return 0, 0
+
+        # Pieces taken from the bottom of the end stack (a move never takes its own moved pieces, since no
+        # more pieces are moved than a stack may hold).
+        owners = (code >> HEIGHT_BITS) & ((1 << over) - 1)
+        color = player.get_player_color()
+        reserves = sum(1 for level in range(over) if color == self._colors[(owners >> level) & 1])
+        return reserves, over - reserves
+
+    def start_validation(self, player, start, end, pieces):
+        """
+        This method checks the start and end location validity of the move, the movement's direction and the
+        number of pieces moved. If the move passes the checks it is made, otherwise the error for the failed
+        check is raised.
+        """
+
+        raise_for_status(self.validate_move(player, start, end, pieces))
+        self.apply_move(player, (start, end, pieces))
+
+    def validate_move(self, player, start, end, pieces):
+        """
+        Returns the MoveStatus of the player moving the number of pieces from the start to the end location,
+        without making the move. SUCCESS means the move is valid. The checks are made in the same order the
+        errors of start_validation have always been raised in.
+        """
+
+        # Checks that the positions passed are x-y coordinates on the board.
+        if len(start) != 2 or len(end) != 2:
+            return MoveStatus.INVALID_LOCATION
+        start_x, start_y = start
+        end_x, end_y = end
+        size = self._size
+        if not (0 <= start_x < size and 0 <= start_y < size and 0 <= end_x < size and 0 <= end_y < size):
+            return MoveStatus.INVALID_LOCATION
+
+        # Checks that the player's piece is at the top of the piece stack on the start location.
+        stack_start = self._board[start_x * size + start_y]
+        if stack_start == 0:
+            return MoveStatus.NO_PIECE
+        top = (stack_start >> (HEIGHT_BITS + (stack_start & HEIGHT_MASK) - 1)) & 1
+        if player.get_player_color() not in self._colors[top]:
+            return MoveStatus.NOT_YOUR_PIECE
+
+        # Checks the movement: it must be horizontal or vertical, and the pieces moved must equal the
+        # distance moved and be no more than the stack holds.
+        vertical = abs(end_x - start_x)
+        horizontal = abs(end_y - start_y)
+        if vertical and horizontal:
+            return MoveStatus.DIAGONAL_MOVE
+        if vertical + horizontal == 0:
+            return MoveStatus.NO_MOVEMENT
+        if pieces != vertical + horizontal or pieces > stack_start & HEIGHT_MASK:
+            return MoveStatus.INVALID_NUMBER_OF_PIECES
+        return MoveStatus.SUCCESS
+
+    def get_height(self, x_coord, y_coord):
+        """
+        Returns the number of pieces stacked at the x and y coordinates of the board.
+        """
+
+        return self._board[self.get_index(x_coord, y_coord)] & HEIGHT_MASK
+
+    def apply_move(self, player, move):
+        """
+        Makes a stack move or a reserve move for the player without validating it, and records an undo entry
+        for it. The pieces moved are put on top of the stack at the end position, the pieces over the stack
+        limit at the end position are added to the player's reserves or captures, and the player turn is updated.
+        """
+
+        start, end, pieces = move
+        end_index = end[0] * self._size + end[1]
+        end_code = self._board[end_index]
+        holdings = (player.get_reserves(), player.get_captures())
+
+        # Takes the moving pieces off the start stack, or takes a piece out of the player's reserves.
+        if start is None:
+            start_index, start_code = -1, 0
+            stack = 1 | (self.get_player_index(player) << HEIGHT_BITS)
+            player.remove_1reserve()
+        else:
+            start_index = start[0] * self._size + start[1]
+            start_code = self._board[start_index]
+            stack = self.pop(start_index, pieces)
+
+        # Stacks the pieces and takes the pieces over the stack limit at the end position.
+        self.push(end_index, stack, player)
+        if start is None or (end_code & HEIGHT_MASK) + pieces > self._max_stack:
+            self._features.set_holdings(self.get_player_index(player), player.get_reserves(), player.get_captures())
+        self._undo.append((player, move, end_index, end_code, start_index, start_code) + holdings +
+                          (self._last_move, self._hash))
+        self.update_hash(player, end_index, end_code, start_index, start_code, holdings)
+        self.update_turn(player)
+
+    def update_hash(self, player, end_index, end_code, start_index, start_code, holdings):
+        """
+        Updates the Zobrist hash for a move by the player from the old start and end squares, the player's old
+        reserve and capture counts, and the side to move changing.
+        """
+
+        board = self._board
+        square_keys, reserve_keys, capture_keys, side_key = self._zobrist
+        index = self.get_player_index(player)
+        value = self._hash ^ square_keys[end_index][end_code] ^ square_keys[end_index][board[end_index]]
+        if start_index >= 0:
+            value ^= square_keys[start_index][start_code] ^ square_keys[start_index][board[start_index]]
+        value ^= reserve_keys[index][holdings[0]] ^ reserve_keys[index][player.get_reserves()]
+        value ^= capture_keys[index][holdings[1]] ^ capture_keys[index][player.get_captures()]
+
+        # The second player is to move after the first player moves.
+        first_name = self.player1.get_player_name()
+        if (self._last_move == first_name) != (player.get_player_name() == first_name):
+            value ^= side_key
+        self._hash = value
+
+    def undo_move(self):
+        """
+        Takes back the last move made with apply_move. The start and end stacks, the reserve and capture
+        holdings of the player who moved, the player turn and the hash go back to what they were. Returns the
+        move that was taken back, or None if there are no moves to take back.
+        """
+
+        if not self._undo:
+            return None
+        player, move, end_index, end_code, start_index, start_code, reserves, captures, last_move, value = \
+            self._undo.pop()
+
+        # Puts the stacks, holdings, turn and hash back.
+        self.set_square(end_index, end_code)
+        if start_index >= 0:
+            self.set_square(start_index, start_code)
+        if start_index < 0 or (end_code & HEIGHT_MASK) + move[2] > self._max_stack:
+            player.restore_holdings(reserves, captures)
+            self._features.set_holdings(self.get_player_index(player), reserves, captures)
+        self._last_move = last_move
+        self._hash = value
+        return move
+
+    def get_history(self):
+        """
+        Returns the moves that can be taken back with undo_move, oldest first, as tuples of numbers that
+        set_history can load into another board: the index of the player who moved, the start square (-1 for a
+        reserve move), the end square, the number of pieces moved, the old end and start square bytes, the
+        player's old reserves and captures, the index of the player who moved before (-1 before the first
+        move) and the old hash. Squares are in flat board order.
+        """
+
+        names = ('', self.player1.get_player_name(), self.player2.get_player_name())
+        return [(self.get_player_index(player), start_index, end_index, move[2], end_code, start_code, reserves,
+                 captures, names.index(last_move) - 1, value)
+                for player, move, end_index, end_code, start_index, start_code, reserves, captures, last_move, value
+                in self._undo]
+
+    def get_history_limit(self):
+        """
+        Returns the number of played moves the board keeps to take back, or None if it keeps them all.
+        """
+
+        return self._history_limit
+
+    def set_history_limit(self, limit):
+        """
+        Sets the number of played moves the board keeps to take back, or None to keep them all, and drops the
+        older moves.
+        """
+
+        self._history_limit = limit
+        self.trim_history()
+
+    def trim_history(self):
+        """
+        Drops the oldest moves that can be taken back beyond the history limit. The FocusGame move methods
+        call it after every move they make.
+        """
+
+        if self._history_limit is not None and len(self._undo) > self._history_limit:
+            del self._undo[:len(self._undo) - self._history_limit]
+
+    def set_history(self, entries):
+        """
+        Replaces the moves that can be taken back with the entries returned by get_history for the board's
+        current position. The entries are not checked against the position.
+        """
+
+        players = (self.player1, self.player2)
+        names = ('', self.player1.get_player_name(), self.player2.get_player_name())
+        coordinates = self._rules.get_coordinates()
+        self._undo = [(players[player_index], (None if start_index < 0 else coordinates[start_index],
+                                               coordinates[end_index], pieces),
+                       end_index, end_code, start_index, start_code, reserves, captures, names[last_index + 1], value)
+                      for player_index, start_index, end_index, pieces, end_code, start_code, reserves, captures,
+                      last_index, value in entries]
+
+    def make_reserved_move(self, color, location_x, location_y, player):
+        """
+        Makes a reserve move for the player from the player's reserve pieces.
+        """
+
+        self.apply_move(player, (None, (location_x, location_y), 1))
+
+    def pop(self, position, pieces):
+        """
+        Pops pieces off the top of the stack at a board position. Returns the pieces as a stack.
+        """
+
+        code = self._board[position]
+        keep = (code & HEIGHT_MASK) - pieces
+        owners = code >> HEIGHT_BITS
+        self.set_square(position, keep | ((owners & ((1 << keep) - 1)) << HEIGHT_BITS))
+        return pieces | ((owners >> keep) << HEIGHT_BITS)
+
+    def push(self, position, stack, player):
+        """
+        Pushes a piece or pieces onto the piece stack at the top or end of the piece list. Pieces over the stack
+        limit from the bottom of the new stack are added to the player's reserves or captures.
+        """
+
+        # Puts the moved stack on top of the stack already at the position.
+        code = self._board[position]
+        height = code & HEIGHT_MASK
+        length = height + (stack & HEIGHT_MASK)
+        owners = (code >> HEIGHT_BITS) | ((stack >> HEIGHT_BITS) << height)
+
+        # Takes the pieces from the bottom of the stack that are over the stack limit and puts them in the
+        # player's reserve or player's capture holdings.
+        if length > self._max_stack:
+            over = length - self._max_stack
+            second = bin(owners & ((1 << over) - 1)).count('1')
+            if self.get_player_index(player) == 0:
+                player.add_holdings(over - second, second)
+            else:
+                player.add_holdings(second, over - second)
+            owners >>= over
+            length = self._max_stack
+
+        self.set_square(position, length | (owners << HEIGHT_BITS))
+
+    def update_turn(self, player):
+        """
+        Updates the _last_move variable to the player that just moved.
+        """
+
+        self._last_move = player.get_player_name()
+
+    def check_win(self, player):
+        """
+        Checks the win conditions for the game. Returns "successfully moved" or "win."
+        """
+
+        # Collects the number of player captures.
+        captures = player.get_captures()
+
+        # If the player captures 6 enemy pieces, or the capture target of the rules, the game is won. "Win" is
+        # returned.
+        if captures >= self._rules.get_capture_target():
+            return "win"
+        return "successfully moved"
+
+
+class BoardFeatures:
+    """
+    The BoardFeatures class holds counts about a board position that the Board keeps up to date as squares
+    change, so they can be read without scanning the board. For each player it holds the number of stacks they
+    control, the squares of those stacks, their controlled stacks by height, the number of stack moves from
+    their controlled stacks, and their reserve and capture counts. It also holds the number of stack moves from
+    every square, which is its mobility, and the number of pieces on the board.
     """
-    def __init__(self, _player1, _player2):
+    __slots__ = ('_control', '_squares', '_heights', '_mobility', '_square_mobility', '_holdings', '_mobility_table',
+                 '_top_owners', '_pieces')
+
+    def __init__(self, rules=None):
         """
-        This method initializes the Focus game instance by identifying the two players and their chosen piece
-        colors. The init class calls the player class to create the player instances and calls the Board
-        class to create a board for the Focus game.
+        Initializes the features of an empty board of the rules, or of the default rules, with no reserve or
+        captured pieces.
         """
-        # Player attributes
-        self._player1 = Player(_player1)
-        self._player2 = Player(_player2)
-        self._player1_name = self._player1.get_player_name()
-        self._player2_name = self._player2.get_player_name()
-        self._player1_color = self._player1.get_player_color()
-        self._player2_color = self._player2.get_player_color()
 
-        # Call the board class to create the board instance.
-        self._board = Board(_player1, _player2)
+        rules = DEFAULT_RULES if rules is None else rules
+        self._control = [0, 0]
+        self._squares = (set(), set())
+        self._heights = [[0] * (rules.get_max_stack() + 1), [0] * (rules.get_max_stack() + 1)]
+        self._mobility = [0, 0]
+        self._square_mobility = [0] * rules.get_square_count()
+        self._holdings = [[0, 0], [0, 0]]
+        self._mobility_table = rules.get_mobility()
+        self._top_owners = rules.get_top_owners()
+        self._pieces = 0
+
+    def change_square(self, index, old, new):
+        """
+        Updates the features for the byte of the square at the flat board index changing from old to new.
+        """
 
-    def get_player_from_name(self, name):
+        mobility = self._mobility_table[index]
+        top_owners = self._top_owners
+        if top_owners[old] != top_owners[new]:
+            if old:
+                self._squares[top_owners[old]].discard(index)
+            if new:
+                self._squares[top_owners[new]].add(index)
+        if old:
+            owner, height = top_owners[old], old & HEIGHT_MASK
+            self._control[owner] -= 1
+            self._heights[owner][height] -= 1
+            self._mobility[owner] -= mobility[height]
+        if new:
+            owner, height = top_owners[new], new & HEIGHT_MASK
+            self._control[owner] += 1
+            self._heights[owner][height] += 1
+            self._mobility[owner] += mobility[height]
+        self._square_mobility[index] = mobility[new & HEIGHT_MASK]
+        self._pieces += (new & HEIGHT_MASK) - (old & HEIGHT_MASK)
+
+    def set_holdings(self, player_index, reserves, captures):
         """
-        Returns the player instance from a player name.
+        Sets the reserve and capture counts of the player with the index.
         """
 
-        if self._player1_name.lower() == name.lower():
-            return self._player1
-        if self._player2_name.lower() == name.lower():
-            return self._player2
+        holdings = self._holdings[player_index]
+        holdings[0] = reserves
+        holdings[1] = captures
 
-    def move_piece(self, name, start, end, number_of_pieces):
+    def get_control(self, player_index):
         """
-        This method moves the player piece to represent a turn in the Focus game. This method checks for
-        various errors and checks if the move is valid. If the move is valid, the pieces will be moved.
-        This method returns "Move successful" and also checks for win conditions if the move is valid.
+        Returns the number of stacks the player with the index controls.
         """
 
-        # Checks if the name argument is a player of the Focus game instance.
-        if name.lower() in self._board.get_names_list():
-            turn = self._board.check_turn().lower()
-            if turn == name.lower():
-                player = self.get_player_from_name(name)
-
-                # Checks if the name given (case-insensitive) is the correct player's turn and if the move
-                # is valid for start location, end location, and number of pieces being moved. Other functions
-                # are called to move the game piece if the move passes validation checks.
-                self._board.start_validation(player, start, end, number_of_pieces)
-                check_for_win = self._board.check_win(player)
-                if check_for_win == 'win':
-                    return name + 'wins!'
-                if check_for_win == 'successfully moved':
-                    return 'successfully moved'
-
-            # Returns an error message if the name given is the wrong player's turn.
-            if turn != name.lower():
-                raise PlayerTurnError("not your turn")
-
-        # Returns an error message if the player name is not a player in the Focus game instance.
-        elif name.lower() not in self._board.get_names_list():
-            raise PlayerNameError("invalid player name")
+        return self._control[player_index]
 
-    def show_pieces(self, position):
+    def get_squares(self, player_index):
         """
-        This method takes a position of the Focus game board instance and finds the piece elements of the
-        position. It returns a list of the pieces at the tuple argument position.
+        Returns the set of flat board indexes of the stacks the player with the index controls. The set is
+        changed as the board changes, so it should not be changed by the caller.
         """
 
-        position_x = position[0]
-        position_y = position[1]
+        return self._squares[player_index]
 
-        # Checks to make sure the position argument is valid.
-        if len(position) != 2:
-            raise InvalidLocation('invalid location on the board')
-        else:
-            return self._board.get_board_position(position_x, position_y)
+    def get_tall_stacks(self, player_index, height):
+        """
+        Returns the number of stacks of the height or taller that the player with the index controls.
+        """
 
-    def show_reserve(self, player_name):
+        return sum(self._heights[player_index][max(height, 1):])
+
+    def get_mobility(self, player_index):
         """
-        This method accesses the Player class's player instance from the player's name in the argument
-        (which is case-insensitive), and returns the number of pieces the player has in their reserve holdings.
+        Returns the number of stack moves from the stacks the player with the index controls.
         """
 
-        # Checks if the player is a valid player in the game instance.
-        if player_name not in self._board.get_names_list():
-            return False
-        player = self.get_player_from_name(player_name)
-        return player.get_reserves()
+        return self._mobility[player_index]
 
-    def show_captured(self, player_name):
+    def get_square_mobility(self, index):
         """
-        This method accesses the Player class's player instance from the player's name in the argument
-        (which is case-insensitive), and returns the number of opponent pieces the player has captured.
+        Returns the number of stack moves from the square at the flat board index.
         """
 
-        player = self.get_player_from_name(player_name)
-        return player.get_captures()
+        return self._square_mobility[index]
 
-    def reserved_move(self, player_name, position):
+    def get_board_pieces(self):
         """
-        This method accesses the Player class's player instance from the player's name in the argument
-        (which is case-insensitive), and takes a reserve piece from the player's reserve piece list
-        and places the reserved piece on the board at the location argument provided. After placing the
-        reserved piece onto the board, the number of the player's reserved pieces decreases by 1. If
-        the player has no reserve pieces the move is not considered valid. If the move is not valid, an
-        error is raised that returns "no pieces in reserve."
+        Returns the number of pieces on the board.
         """
 
-        player = self.get_player_from_name(player_name)
-        color = player.get_player_color()
-        position_x = position[0]
-        position_y = position[1]
+        return self._pieces
 
-        # Checks if the position passed is a valid x-y tuple coordinate.
-        if len(position) != 2:
-            raise InvalidLocation('invalid location on the board')
-        # Checks if the player has reserve pieces.
-        if player.get_reserves() == 0:
-            raise PlayerPieceError('no pieces in reserve')
+    def get_reserves(self, player_index):
+        """
+        Returns the number of reserve pieces of the player with the index.
+        """
+
+        return self._holdings[player_index][0]
 
-        # Checks if the piece can be placed on the board.
-        if self._board.get_board_position(position_x, position_y) is True:
-            if self._board.check_turn().lower() == player_name.lower():
+    def get_captures(self, player_index):
+        """
+        Returns the number of pieces the player with the index has captured.
+        """
 
-                # Makes the reserve move.
-                self._board.make_reserved_move(color, position_x, position_y, player)
+        return self._holdings[player_index][1]
 
-                # Checks for a win.
-                check_for_win = self._board.check_win(player)
-                if check_for_win == 'win':
-                    return player_name + 'wins!'
-                if check_for_win == 'successfully moved':
-                    return 'successfully moved'
-                return self._board.update_turn(player)
+    def copy(self):
+        """
+        Returns a copy of the features that can be changed without changing these.
+        """
 
-            else:
-                raise PlayerTurnError('not your turn')
+        features = BoardFeatures.__new__(BoardFeatures)
+        features._control = self._control[:]
+        features._squares = (set(self._squares[0]), set(self._squares[1]))
+        features._heights = [self._heights[0][:], self._heights[1][:]]
+        features._mobility = self._mobility[:]
+        features._square_mobility = self._square_mobility[:]
+        features._holdings = [self._holdings[0][:], self._holdings[1][:]]
+        features._mobility_table = self._mobility_table
+        features._top_owners = self._top_owners
+        features._pieces = self._pieces
+        return features
+
+    def to_dict(self):
+        """
+        Returns the features as a dictionary of per-player lists.
+        """
 
-        else:
-            raise InvalidLocation('invalid location on board')
+        return {'control': list(self._control), 'heights': [list(counts) for counts in self._heights],
+                'mobility': list(self._mobility), 'reserves': [held[0] for held in self._holdings],
+                'captures': [held[1] for held in self._holdings]}
 
 
-class Board:
+class GameSnapshot:
     """
-    The Board class creates a 6x6 Board instance for the Focus game. The FocusGame class creates the Board class.
-    The Board class interacts with the Player and the Game class by holding/recording/updating all board
-    variables and attributes. The Board class is integral to the focus game because the Game class checks
-    player move validity via the Board class methods.
+    The GameSnapshot class holds a game position that FocusGame.restore can go back to: the squares and
+    features of the board, the reserve and capture pieces of both players, the player who moved last and the
+    hash. The squares and features are shared with the board they were taken from, which copies them before
+    changing them, so a snapshot is never changed.
     """
-    def __init__(self, player1, player2):
+    __slots__ = ('_rules', '_squares', '_features', '_holdings', '_last_index', '_hash')
+
+    def __init__(self, rules, squares, features, holdings, last_index, value):
         """
-        The initialization class that takes two player tuples that contain player names and player piece colors
-        as well as an empty list variable. The board is created on the empty board list.
+        Initializes the snapshot from the rules, the shared squares and features, the (reserves, captures)
+        pair of each player, the index of the player who moved last (-1 before the first move) and the hash.
         """
 
-        self.player1 = Player(player1)
-        self.player2 = Player(player2)
+        self._rules = rules
+        self._squares = squares
+        self._features = features
+        self._holdings = holdings
+        self._last_index = last_index
+        self._hash = value
 
-        # Set up the board.
-        self._board = [[[] for y in range(6)] for x in range(6)]
+    def get_rules(self):
+        """
+        Returns the Rules instance of the position.
+        """
 
-        # Add player pieces to the board.
-        count = 0
-        for board_list in self._board:
-            for i in board_list:
-                if count >= 2:
-                    i.append(self.player2.get_player_color())
-                    count += 1
-                if count < 2:
-                    i.append(self.player1.get_player_color())
-                    count += 1
-                if count == 4:
-                    count = 0
+        return self._rules
 
-        # Creates a variable that will record the last player who had a successful move.
-        self._last_move = ''
-        self._names_list = [self.player1.get_player_name().lower(), self.player2.get_player_name().lower()]
+    def get_squares(self):
+        """
+        Returns the shared square store of the position, which must not be changed.
+        """
 
+        return self._squares
 
-    def get_names_list(self):
+    def get_features(self):
         """
-        Returns the private list that holds the name of each player.
+        Returns the shared BoardFeatures of the position, which must not be changed.
         """
 
-        return self._names_list
+        return self._features
 
-    def get_board_position(self, x_coord, y_coord):
+    def get_codes(self):
         """
-        Returns the board position for the x and y coordinates of the board.
+        Returns a copy of the board bytes of the position, in the form of Board.get_codes.
         """
 
-        return self._board[x_coord][y_coord]
+        return bytes(self._squares)
 
-    def check_turn(self):
+    def get_holdings(self):
         """
-        Returns the private data variable of the player that moved last.
+        Returns the (reserves, captures) pair of each player.
         """
 
-        # Returns the first player if it is the first move of the game.
-        if self._last_move == '':
-            return self.player1.get_player_name()
+        return self._holdings
 
-        # Returns the player whose turn it is after checking the _last_move variable.
+    def get_last_index(self):
+        """
+        Returns the index of the player who moved last, or -1 before the first move.
+        """
 
-        else:
-            # Returns player 2 if the last move was by player 1.
-            if self._last_move == self.player1.get_player_name():
-                return self.player2.get_player_name().lower()
+        return self._last_index
 
-            # Returns player 1 if the last move was by player 2.
-            if self._last_move == self.player2.get_player_name():
-                return self.player1.get_player_name()
+    def get_hash(self):
+        """
+        Returns the Zobrist hash of the position.
+        """
 
-    def start_validation(self, player, start, end, pieces):
+        return self._hash
+
+
+class ReplayResult:
+    """
+    The ReplayResult class holds the result of FocusGame.apply_moves: the number of moves made, the MoveStatus
+    and index of the first move that was not allowed (SUCCESS and None if every move was made), the index of
+    the first player to reach the capture target (-1 if neither did), and the final position as the board
+    bytes, the (reserves, captures) pair of each player, the index of the player to move and the hash.
+    """
+    __slots__ = ('_applied', '_status', '_error_index', '_winner', '_codes', '_holdings', '_turn', '_hash')
+
+    def __init__(self, applied, status, error_index, winner, codes, holdings, turn, value):
         """
-        This method checks the start and end location validity of the move. If the move passes the checks
-        and is deemed viable, another function is called to verify that checks the movement's direction.
+        Initializes the result of a sequence of moves.
         """
 
-        # Gets the x and y coordinates for start and end positions.
-        start_x = start[0]
-        start_y = start[1]
-        end_x = end[0]
-        end_y = end[1]
-        stack_start = self._board[start_x][start_y]
+        self._applied = applied
+        self._status = status
+        self._error_index = error_index
+        self._winner = winner
+        self._codes = codes
+        self._holdings = holdings
+        self._turn = turn
+        self._hash = value
 
-        # Checks that the positions on the board passed are x-y coordinates.
-        if (len(start)) != 2 or (len(end)) != 2:
-            raise InvalidLocation('invalid location')
+    def is_valid(self):
+        """
+        Returns True if every move of the sequence was made.
+        """
 
-        # Checks that the move has a player piece on the start location.
-        if stack_start == []:
-            raise InvalidLocation('no piece on start location')
+        return self._error_index is None
 
-        # Affirms that the player's piece is at the top of the piece stack on the board's start position.
-        if player.get_player_color() not in stack_start[-1]:
-            raise PlayerPieceError('not your piece')
+    def get_applied(self):
+        """
+        Returns the number of moves made.
+        """
 
-        # Makes sure the start position and end position are on the board.
-        if start_x > 5 or start_x < 0:
-            raise InvalidLocation('invalid location')
-        if start_y > 5 or start_y < 0:
-            raise InvalidLocation('invalid location')
-        if end_x > 5 or end_x < 0:
-            raise InvalidLocation('invalid location')
-        if end_y > 5 or end_y < 0:
-            raise InvalidLocation('invalid location')
+        return self._applied
 
-        # Two types of valid movement is specified: forward and backward. Both movement directions
-        # have their own function.
-        if end > start:
-            self.forward_piece_validation(player, start, end, pieces, start_x, start_y, end_x, end_y)
-        if start > end:
-            self.backward_piece_validation(player, start, end, pieces, start_x, start_y, end_x, end_y)
+    def get_status(self):
+        """
+        Returns the MoveStatus of the first move that was not allowed, or SUCCESS.
+        """
 
-        # Confirms that the move does not stay in the same place.
-        if end == start:
-            raise InvalidLocation('piece does not move')
+        return self._status
 
-    def forward_piece_validation(self, player, start, end, pieces, start_x, start_y, end_x, end_y):
+    def get_error_index(self):
         """
-        This function checks the validity of the move that travels forward on the board, or if the piece starts at a
-        board location that is less than its end location. If the piece passes the validity checks, then it is
-        passed to a movement function.
+        Returns the index in the sequence of the first move that was not allowed, or None.
         """
 
-        # Determines the x-y coordinate movement of the piece.
-        vertical = end_x - start_x
-        horizontal = end_y - start_y
+        return self._error_index
 
-        # Affirms the validity of a move that is horizontal.
-        if vertical == 0 and horizontal > 0:
+    def get_winner(self):
+        """
+        Returns the index of the first player to reach the capture target, or -1.
+        """
 
-            # Ensures the pieces moved equal the amount of proposed board movement.
-            if pieces == horizontal:
-                if pieces <= len(self._board[start_x][start_y]):
-                    self.make_horizontal_move(player, start, end, pieces, horizontal, start_x, start_y, end_x,
-                                              end_y, temp=0, count=0)
-                else:
-                    raise PlayerPieceError('invalid number of pieces')
+        return self._winner
 
-            else:
-                raise PlayerPieceError('invalid number of pieces')
+    def get_codes(self):
+        """
+        Returns the board bytes of the final position, in the form of Board.get_codes.
+        """
 
-        # Affirms the validity of a move that is vertical.
-        if horizontal == 0 and vertical > 0:
+        return self._codes
+
+    def get_holdings(self):
+        """
+        Returns the (reserves, captures) pair of each player in the final position.
+        """
 
-            # Ensures the pieces moved equal the amount of proposed board movement.
-            if pieces == vertical:
-                if pieces <= len(self._board[start_x][start_y]):
-                    self.make_vertical_move(player, start, end, pieces, vertical, start_x, start_y, end_x,
-                                            end_y, temp=0, count=0)
-                else:
-                    raise PlayerPieceError('invalid number of pieces')
+        return self._holdings
 
-            else:
-                raise PlayerPieceError('invalid number of pieces')
+    def get_turn(self):
+        """
+        Returns the index of the player to move in the final position.
+        """
 
-        # Does not allow diagonal moves.
-        if horizontal != 0:
-            if vertical != 0:
-                raise InvalidLocation('diagonal moves not allowed')
+        return self._turn
 
-    def backward_piece_validation(self, player, start, end, pieces, start_x, start_y, end_x, end_y):
-        """
-        This function checks the validity of the move that travels backwards on the board, or if the piece starts at a
-        board location that is greater than its end location. If the piece passes the validity checks, then it is
-        passed to a movement function.
+    def get_hash(self):
+        """
+        Returns the Zobrist hash of the final position.
         """
 
-        # Obtains the vertical and horizontal movement of the piece.
-        vertical = start_x - end_x
-        horizontal = start_y - end_y
+        return self._hash
 
-        # Checks a horizontal move.
-        if vertical == 0 and horizontal > 0:
-            if pieces == horizontal:
-                if pieces <= len(self._board[start_x][start_y]):
-                    self.make_horizontal_move(player, start, end, pieces, -horizontal, start_x, start_y, end_x,
-                                              end_y, temp=0, count=0)
-                else:
-                    raise PlayerPieceError('invalid number of pieces')
+    def to_dict(self):
+        """
+        Returns the result as a dictionary that can be written as JSON.
+        """
 
-            if pieces > horizontal or pieces < horizontal:
-                raise PlayerPieceError('invalid number of pieces')
-
-        # Checks a vertical move.
-        if horizontal == 0 and vertical > 0:
-            if pieces == vertical:
-                if pieces >= len(self._board[start_x][start_y]):
-                    # print(pieces >= len(self._board[start_x][start_y]))
-                    self.make_vertical_move(player, start, end, pieces, -vertical, start_x, start_y, end_x,
-                                            end_y, temp=0, count=0)
-                else:
-                    raise PlayerPieceError('invalid number of pieces')
-
-            if pieces < vertical or pieces > vertical:
-                raise PlayerPieceError('invalid number of pieces')
-
-        # Does not allow a diagonal move.
-        if horizontal != 0:
-            if vertical != 0:
-                raise InvalidLocation('diagonal moves not allowed')
-
-    def make_vertical_move(self, player, start, end, pieces, vertical, start_x, start_y, end_x, end_y, temp, count):
-        """
-        This is a recursive function that vertically moves a piece from its start position to the end position.
-        It returns "successfully moved" or "player wins."
-        """
-
-        position = self._board[start_x][start_y]
-
-        if (start_x, start_y) == (end_x, end_y):
-            self.push(position, temp)
-
-            # Takes pieces from the bottom of the stack at the final position that are more than 5 and
-            # puts them in the player's reserve or player's capture holdings.
-            if len(position) > 5:
-                length = len(position)
-                over = 5 - length
-                confiscated_pieces = position[0: over]
-                player.add_reserves_or_captures(confiscated_pieces)
-
-            # Updates the player turn.
-            self.update_turn(player)
-            check_for_win = self.check_win(player)
-            if check_for_win == 'win':
-                return player + 'wins!'
-            if check_for_win == 'successfully moved':
-                return 'successfully moved'
-
-        if (start_x, start_y) != (end_x, end_y):
-            if count == 0:
-                if len(position) > 1:
-                    piece_holder = []
-                    for game_pieces in range(len(position)):
-                        piece_holder.append(self.pop(position))
-                        temp = piece_holder[::-1]
-
-                else:
-                    temp = self.pop(position)
-
-            # Recursive call for the function.
-            if vertical > 0:
-                self.make_vertical_move(player, start, end, pieces, vertical, start_x+1, start_y, end_x,
-                                        end_y, temp, count + 1)
-            if vertical < 0:
-                self.make_vertical_move(player, start, end, pieces, vertical, start_x-1, start_y, end_x,
-                                        end_y, temp, count + 1)
-
-    def make_horizontal_move(self, player, start, end, pieces, horizontal, start_x, start_y, end_x, end_y, temp, count):
-        """
-        This is a recursive function that horizontally moves a piece from its start position to the end position.
-        It returns "successfully moved" or "player wins."
-        """
-
-        position = self._board[start_x][start_y]
-
-        if (start_x, start_y) == (end_x, end_y):
-            self.push(position, temp)
-
-            # Takes pieces from the bottom of the stack at the final position that are more than 5 and
-            # puts them in the player's reserve or player's capture holdings.
-            if len(position) > 5:
-                length = len(position)
-
-                over = length - 5
-
-                confiscated_pieces = position[0: over]
-                player.add_reserves_or_captures(confiscated_pieces)
-                del position[0: over]
-
-            # Updates the player turn.
-            self.update_turn(player)
-
-            # Checks the win conditions for the player.
-            check_for_win = self.check_win(player)
-            if check_for_win == 'win':
-                return player + 'wins!'
-            if check_for_win == 'successfully moved':
-                return 'successfully moved'
-
-        if (start_x, start_y) != (end_x, end_y):
-            if count == 0:
-                if len(position) > 1:
-                    piece_holder = []
-                    for game_pieces in range(len(position)):
-                        piece_holder.append(self.pop(position))
-                        temp = piece_holder[::-1]
-
-                else:
-                    temp = self.pop(position)
+        return {'applied': self._applied, 'status': self._status.name, 'error_index': self._error_index,
+                'winner': self._winner, 'codes': self._codes.hex(), 'holdings': [list(held) for held in self._holdings],
+                'turn': self._turn, 'hash': self._hash}
 
-            # Recursive call for moving another space on the board.
-            if horizontal > 0:
-                self.make_horizontal_move(player, start, end, pieces, horizontal, start_x, start_y+1, end_x,
-                                          end_y, temp, count + 1)
-            if horizontal < 0:
-                self.make_horizontal_move(player, start, end, pieces, horizontal, start_x, start_y-1, end_x,
-                                          end_y, temp, count + 1)
 
+class GameEvent:
+    """
+    The GameEvent class holds the changes of one move made or taken back in a FocusGame, for clients that show
+    the game without reading the whole board after every move. A "move" or "undo" event holds the squares the
+    move started and ended on with their new stacks, the pieces pushed off the bottom of the end stack, and
+    the changes to the reserves and captures of the player. A "sync" event holds every square with a stack,
+    so a client can start over from it. Every event also holds the holdings of both players, the player whose
+    turn it is and the winner, if any. One event is made per move and shared by every subscriber.
+    """
+    __slots__ = ('_kind', '_player', '_move', '_squares', '_confiscated', '_reserves', '_captures', '_holdings',
+                 '_turn', '_winner')
 
-    def make_reserved_move(self, color, location_x, location_y, player):
+    def __init__(self, kind, player, move, squares, confiscated, reserves, captures, holdings, turn, winner):
         """
-        Makes a reserve move for the player from the player's reserve pieces.
+        Initializes the event.
+        """
+
+        self._kind = kind
+        self._player = player
+        self._move = move
+        self._squares = squares
+        self._confiscated = confiscated
+        self._reserves = reserves
+        self._captures = captures
+        self._holdings = holdings
+        self._turn = turn
+        self._winner = winner
+
+    def get_kind(self):
+        """
+        Returns "move" for a move made, "undo" for a move taken back or "sync" for a whole position.
         """
 
-        # Checks the location on the board
-        location = self._board[location_x][location_y]
-        location.append(color)
+        return self._kind
 
-        # Takes the pieces over 5 at the end position and adds them to reserves/captures.
-        if len(location) > 5:
-            length = len(location)
-            over = length - 5
-            confiscated_pieces = location[0: over]
-            player.add_reserves_or_captures(confiscated_pieces)
-            del location[0: over]
+    def get_player(self):
+        """
+        Returns the name of the player whose move was made or taken back, or None for a sync event.
+        """
 
-        # Removes a reserve piece from the player's reserve holdings.
-        player.remove_1reserve()
+        return self._player
 
-    def pop(self, stack):
+    def get_move(self):
         """
-        Pops a piece of the stack off of the top. Returns the top piece.
+        Returns the move as a (start, end, pieces) tuple or a (None, position, 1) tuple for a reserve move, or
+        None for a sync event.
         """
 
-        val = stack[-1]
-        del stack[-1]
-        return val
+        return self._move
 
-    def push(self, position, stack):
+    def get_squares(self):
         """
-        Pushes a piece or pieces onto the piece stack at the top or end of the piece list.
+        Returns a tuple of (position, pieces) pairs with the list of piece colors, bottom first, of every square
+        that changed. The squares of a sync event are every square with a stack, and the others are empty.
         """
 
-        for element in stack:
-            position.append(element)
+        return self._squares
 
-    def update_turn(self, player):
+    def get_confiscated(self):
         """
-        Updates the _last_move variable to the player that just moved.
+        Returns the number of pieces the move pushed off the bottom of the end stack.
         """
 
-        self._last_move = player.get_player_name()
+        return self._confiscated
 
-    def check_win(self, player):
+    def get_reserves(self):
         """
-        Checks the win conditions for the game. Returns "successfully moved" or "win."
+        Returns the change to the reserve pieces of the player.
         """
 
-        # Collects the number of player captures.
-        captures = player.get_captures()
+        return self._reserves
 
-        # If the player captures 6 enemy pieces, the game is won. "Win" is returned.
-        if captures > 5:
-            return "win"
-        if captures < 5:
-            return "successfully moved"
+    def get_captures(self):
+        """
+        Returns the change to the captured pieces of the player.
+        """
+
+        return self._captures
+
+    def get_holdings(self):
+        """
+        Returns the (reserves, captures) pair of each player after the event.
+        """
+
+        return self._holdings
+
+    def get_turn(self):
+        """
+        Returns the name of the player whose turn it is after the event, as check_turn returns it.
+        """
+
+        return self._turn
+
+    def get_winner(self):
+        """
+        Returns the name of the player who won with the move, or who has won for a sync event, or None.
+        """
+
+        return self._winner
+
+    def to_dict(self):
+        """
+        Returns the event as a dictionary that can be written as JSON.
+        """
+
+        return {'kind': self._kind, 'player': self._player, 'move': self._move,
+                'squares': [[list(position), pieces] for position, pieces in self._squares],
+                'confiscated': self._confiscated, 'reserves': self._reserves, 'captures': self._captures,
+                'holdings': [list(held) for held in self._holdings], 'turn': self._turn, 'winner': self._winner}
+
+
+class TranspositionTable:
+    """
+    The TranspositionTable class holds search results for positions, keyed on the Zobrist hash of the Board.
+    The table has a fixed number of buckets and every bucket has two entries. The depth-preferred entry is
+    only replaced by a result that was searched at least as deep, and the always-replace entry takes every
+    other result, so deep results are kept while recent ones are still found.
+    """
+    __slots__ = ('_mask', '_deep', '_recent')
+
+    def __init__(self, buckets=1 << 16):
+        """
+        Initializes an empty table. The number of buckets is rounded up to a power of two.
+        """
+
+        size = 1 << max(buckets - 1, 0).bit_length()
+        self._mask = size - 1
+        self._deep = [None] * size
+        self._recent = [None] * size
+
+    def get_size(self):
+        """
+        Returns the number of buckets in the table.
+        """
+
+        return self._mask + 1
+
+    def probe(self, key):
+        """
+        Returns the (key, depth, score, bound, move) entry stored for the hash key, or None if the table
+        does not hold the position.
+        """
+
+        index = key & self._mask
+        entry = self._deep[index]
+        if entry is not None and entry[0] == key:
+            return entry
+        entry = self._recent[index]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        """
+        Stores a search result for the hash key. The bound is EXACT, LOWER_BOUND or UPPER_BOUND depending on
+        how the score compares with the search window it was found in.
+        """
+
+        index = key & self._mask
+        entry = (key, depth, score, bound, move)
+        deep = self._deep[index]
+        if deep is None or deep[0] == key or depth >= deep[1]:
+            # A different position pushed out of the depth-preferred entry moves to the always-replace entry.
+            if deep is not None and deep[0] != key:
+                self._recent[index] = deep
+            self._deep[index] = entry
+        else:
+            self._recent[index] = entry
+
+    def clear(self):
+        """
+        Removes every entry from the table.
+        """
+
+        size = self._mask + 1
+        self._deep = [None] * size
+        self._recent = [None] * size
 
 
 class Player:
@@ -522,6 +1854,8 @@ class Player:
     the pieces for each player. This class also holds the reserve pieces and the captured pieces
     for each player. The Player class interacts with the Board and the Game classes in order to play the Focus game.
     """
+    __slots__ = ('_player', '_player_name', '_player_color', '_reserves', '_captures')
+
     def __init__(self, _player):
         """
         This method initializes the player's private attributes from the player tuple argument.
@@ -530,8 +1864,8 @@ class Player:
         self._player = _player
         self._player_name = self._player[0]
         self._player_color = self._player[1]
-        self._reserves = []
-        self._captures = []
+        self._reserves = 0
+        self._captures = 0
 
     def get_player_name(self):
         """
@@ -555,33 +1889,52 @@ class Player:
         if name.lower() in self._player.lower():
             return self._player
 
+    def copy(self):
+        """
+        Returns a new player instance with the same name, color and holdings.
+        """
+
+        player = Player(self._player)
+        player.restore_holdings(self._reserves, self._captures)
+        return player
+
     def get_captures(self):
         """
         The method returns the number of captured opponent pieces.
         """
 
-        if len(self._captures) == 0:
-            return 0
-        else:
-            return len(self._captures)
+        return self._captures
 
     def get_reserves(self):
         """
         Returns the number of reserve pieces a player holds.
         """
 
-        if len(self._reserves) == 0:
-            return 0
-        else:
-            return len(self._reserves)
+        return self._reserves
 
     def remove_1reserve(self):
         """
         Removes the number of reserved pieces by one.
         """
 
-        if len(self._reserves) > 0:
-            del self._reserves[-1]
+        if self._reserves > 0:
+            self._reserves -= 1
+
+    def restore_holdings(self, reserves, captures):
+        """
+        Puts the player's reserve and capture holdings back to the given numbers of pieces.
+        """
+
+        self._reserves = reserves
+        self._captures = captures
+
+    def add_holdings(self, reserves, captures):
+        """
+        Adds the numbers of reserve and captured pieces to the player's holdings.
+        """
+
+        self._reserves += reserves
+        self._captures += captures
 
     def add_reserves_or_captures(self, pieces_list):
         """
@@ -590,9 +1943,9 @@ class Player:
 
         for i in pieces_list:
             if i == self._player_color:
-                self._reserves.append(i)
+                self._reserves += 1
             else:
-                self._captures.append(i)
+                self._captures += 1
 
 
 class PlayerTurnError(Exception):
@@ -624,6 +1977,30 @@ class PlayerPieceError(Exception):
     pass
 
 
+# The error raised by the raising move methods for every MoveStatus that is not allowed.
+STATUS_ERRORS = {
+    MoveStatus.NOT_YOUR_TURN: (PlayerTurnError, 'not your turn'),
+    MoveStatus.INVALID_NAME: (PlayerNameError, 'invalid player name'),
+    MoveStatus.INVALID_LOCATION: (InvalidLocation, 'invalid location'),
+    MoveStatus.NO_PIECE: (InvalidLocation, 'no piece on start location'),
+    MoveStatus.NOT_YOUR_PIECE: (PlayerPieceError, 'not your piece'),
+    MoveStatus.NO_MOVEMENT: (InvalidLocation, 'piece does not move'),
+    MoveStatus.DIAGONAL_MOVE: (InvalidLocation, 'diagonal moves not allowed'),
+    MoveStatus.INVALID_NUMBER_OF_PIECES: (PlayerPieceError, 'invalid number of pieces'),
+    MoveStatus.NO_RESERVES: (PlayerPieceError, 'no pieces in reserve'),
+}
+
+
+def raise_for_status(status):
+    """
+    Raises the error of a MoveStatus that is not allowed, and does nothing for SUCCESS or WIN.
+    """
+
+    if status in STATUS_ERRORS:
+        error, message = STATUS_ERRORS[status]
+        raise error(message)
+
+
 # playa1 = ("Drew", 'r')
 # playa2 = ("Ellie", 'g')
 # game1 = FocusGame(playa1, playa2)
@@ -0,0 +1,533 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program lets the computer play a Focus game with a Monte Carlo tree search, which plays many
+# random games from the position and picks the move that won the most of them.
+
+import argparse
+import concurrent.futures
+import math
+import os
+import random
+import sys
+import time
+
+from domination_game import FocusGame
+
+# The weight of trying moves that have been played out less often against playing the moves that won the most.
+EXPLORATION = 1.4
+
+# The number of moves a playout makes before it is scored by the captured pieces instead of played to the end.
+ROLLOUT_LIMIT = 300
+
+# Games kept by each worker process for playing out positions, by player tuples.
+ROLLOUT_GAMES = {}
+
+
+def rollout(board, players, side, rng, limit=ROLLOUT_LIMIT):
+    """
+    Plays random moves on the board from the position, with the player with the index side to move, until a
+    player wins or the limit of moves is reached, and then takes the moves back. Returns 1.0 if the player to
+    move won, 0.0 if they lost and 0.5 for a draw. A player with no legal moves loses, and a playout that
+    reaches the limit is won by the player with more captured pieces.
+    """
+
+    start = side
+    target = board.get_rules().get_capture_target()
+    result = None
+    depth = 0
+    while depth < limit:
+        player = players[side]
+        moves = board.generate_moves(player)
+        if not moves:
+            result = 0.0 if side == start else 1.0
+            break
+        board.apply_move(player, moves[rng.randrange(len(moves))])
+        depth += 1
+        if player.get_captures() >= target:
+            result = 1.0 if side == start else 0.0
+            break
+        side = 1 - side
+
+    # Scores a playout that reached the limit by the captured pieces.
+    if result is None:
+        lead = players[start].get_captures() - players[1 - start].get_captures()
+        result = 0.5 if lead == 0 else float(lead > 0)
+    for index in range(depth):
+        board.undo_move()
+    return result
+
+
+def run_rollouts(player_tuples, position, count, seed, limit=ROLLOUT_LIMIT):
+    """
+    Plays the number of random playouts from a position and returns the total score for the player to move.
+    The position is the (board codes, holdings, side, rules) tuple of MCTSEngine.get_position. This is the
+    unit of work sent to a worker process, which keeps one game per pair of players and rules to load the
+    positions into.
+    """
+
+    codes, holdings, side, rules = position
+    if (player_tuples, rules) not in ROLLOUT_GAMES:
+        ROLLOUT_GAMES[player_tuples, rules] = FocusGame(*player_tuples, rules=rules)
+    game = ROLLOUT_GAMES[player_tuples, rules]
+    game.load_position(codes, holdings, player_tuples[side][0])
+    rng = random.Random(seed)
+    return sum(rollout(game.get_board(), game.get_players(), side, rng, limit) for index in range(count))
+
+
+class MCTSNode:
+    """
+    The MCTSNode class is one position of the search tree. It holds the move that led to it, the index of the
+    player to move, the moves not yet tried from it, its child nodes, and how many playouts went through it and
+    how many of them the player who made the move won. A node whose position is decided holds the index of
+    the winner.
+    """
+    __slots__ = ('_move', '_parent', '_side', '_key', '_untried', '_children', '_visits', '_wins', '_winner')
+
+    def __init__(self, move, parent, side, key, untried, winner):
+        """
+        Initializes a node with no playouts for the move from the parent node, the index of the player to
+        move, the hash of the position, the legal moves of the position and the winner, or None.
+        """
+
+        self._move = move
+        self._parent = parent
+        self._side = side
+        self._key = key
+        self._untried = untried
+        self._children = []
+        self._visits = 0
+        self._wins = 0.0
+        self._winner = winner
+
+    def get_move(self):
+        """
+        Returns the move that led to the node.
+        """
+
+        return self._move
+
+    def get_side(self):
+        """
+        Returns the index of the player to move at the node.
+        """
+
+        return self._side
+
+    def get_key(self):
+        """
+        Returns the hash of the node's position.
+        """
+
+        return self._key
+
+    def get_children(self):
+        """
+        Returns the list of child nodes.
+        """
+
+        return self._children
+
+    def get_visits(self):
+        """
+        Returns the number of playouts through the node, including playouts that have not finished yet.
+        """
+
+        return self._visits
+
+    def get_wins(self):
+        """
+        Returns the score of the finished playouts through the node for the player who made the node's move.
+        """
+
+        return self._wins
+
+    def get_winner(self):
+        """
+        Returns the index of the player who won at the node, or None if the game goes on.
+        """
+
+        return self._winner
+
+    def detach(self):
+        """
+        Makes the node the root of its own tree.
+        """
+
+        self._parent = None
+        self._move = None
+
+    def is_expandable(self):
+        """
+        Returns True if the node has moves that have not been tried yet.
+        """
+
+        return bool(self._untried)
+
+    def expand(self, rng):
+        """
+        Takes one of the untried moves at random and returns it.
+        """
+
+        untried = self._untried
+        index = rng.randrange(len(untried))
+        untried[index], untried[-1] = untried[-1], untried[index]
+        return untried.pop()
+
+    def add_child(self, child):
+        """
+        Adds a child node.
+        """
+
+        self._children.append(child)
+
+    def select_child(self, exploration):
+        """
+        Returns the child with the highest upper confidence bound, which favors children that won the most
+        and children that have been played out the least. A child whose move wins the game is always returned.
+        """
+
+        scale = exploration * math.sqrt(math.log(self._visits))
+        best, best_bound = None, -1.0
+        for child in self._children:
+            if child._winner == self._side:
+                return child
+            bound = child._wins / child._visits + scale / math.sqrt(child._visits)
+            if bound > best_bound:
+                best, best_bound = child, bound
+        return best
+
+    def visit(self, count):
+        """
+        Counts the number of playouts as going through this node and every node above it before they finish,
+        so that playouts running at the same time spread across the tree instead of all taking one path.
+        """
+
+        node = self
+        while node is not None:
+            node._visits += count
+            node = node._parent
+
+    def backpropagate(self, score, count, side):
+        """
+        Adds the total score of the number of finished playouts, counted for the player with the index side, to
+        this node and every node above it, each for the player who made its move.
+        """
+
+        node = self
+        while node._parent is not None:
+            node._wins += score if node._parent._side == side else count - score
+            node = node._parent
+
+
+class MCTSResult:
+    """
+    The MCTSResult class holds the move chosen by a Monte Carlo tree search along with the statistics of the
+    search.
+    """
+    __slots__ = ('_move', '_visits', '_score', '_playouts', '_elapsed')
+
+    def __init__(self, move, visits, score, playouts, elapsed):
+        """
+        Initializes the result from the chosen move, its playouts and average score, the number of playouts
+        of the search and the seconds the search took.
+        """
+
+        self._move = move
+        self._visits = visits
+        self._score = score
+        self._playouts = playouts
+        self._elapsed = elapsed
+
+    def get_move(self):
+        """
+        Returns the chosen move, or None if the player has no legal moves.
+        """
+
+        return self._move
+
+    def get_visits(self):
+        """
+        Returns the number of playouts of the chosen move, including playouts from earlier searches.
+        """
+
+        return self._visits
+
+    def get_score(self):
+        """
+        Returns the average playout score of the chosen move, from 0.0 for a loss to 1.0 for a win.
+        """
+
+        return self._score
+
+    def get_playouts(self):
+        """
+        Returns the number of playouts of the search.
+        """
+
+        return self._playouts
+
+    def get_elapsed(self):
+        """
+        Returns the number of seconds the search took.
+        """
+
+        return self._elapsed
+
+    def get_playouts_per_second(self):
+        """
+        Returns the number of playouts per second of the search.
+        """
+
+        return self._playouts / self._elapsed if self._elapsed > 0 else 0.0
+
+
+class MCTSEngine:
+    """
+    The MCTSEngine class finds moves for a FocusGame with a Monte Carlo tree search. Each playout walks down
+    the tree by the upper confidence bound of the moves, adds one new position to the tree and plays random
+    moves from it to the end of the game. The search stops after the number of playouts or when the time
+    budget runs out, and picks the move that was played out the most.
+
+    The tree is kept between searches. When the position searched next is already in the tree, one or two
+    moves below the last root, the search goes on from that part of the tree. With more than one worker the
+    random playouts run in a pool of worker processes while the search keeps choosing new positions to play
+    out, and playouts still running count as visits so that new ones go elsewhere in the tree.
+    """
+    __slots__ = ('_playouts', '_time_limit', '_workers', '_leaf_rollouts', '_exploration', '_limit', '_rng',
+                 '_root', '_executor')
+
+    def __init__(self, playouts=1000, time_limit=None, workers=1, leaf_rollouts=1, exploration=EXPLORATION,
+                 seed=0, limit=ROLLOUT_LIMIT):
+        """
+        Initializes the engine with the number of playouts per search, the seconds a search may take or None
+        for no limit, the number of worker processes, the number of playouts run from each new position, the
+        exploration weight, the random seed and the move limit of a playout.
+        """
+
+        self._playouts = playouts
+        self._time_limit = time_limit
+        self._workers = workers
+        self._leaf_rollouts = leaf_rollouts
+        self._exploration = exploration
+        self._limit = limit
+        self._rng = random.Random(seed)
+        self._root = None
+        self._executor = None
+
+    def get_root(self):
+        """
+        Returns the root node of the tree, or None before the first search.
+        """
+
+        return self._root
+
+    def close(self):
+        """
+        Shuts down the worker processes.
+        """
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        """
+        Returns the engine for use in a with statement.
+        """
+
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Shuts down the worker processes at the end of a with statement.
+        """
+
+        self.close()
+
+    def search(self, game):
+        """
+        Searches the game position for the player whose turn it is and returns an MCTSResult. The board of
+        the game is the same after the search as before it. The move of the result is a random legal move
+        when no playout ran, and None only when the player has no legal moves.
+        """
+
+        board = game.get_board()
+        players = game.get_players()
+        side = 0 if board.check_turn().lower() == players[0].get_player_name().lower() else 1
+        started = time.perf_counter()
+        deadline = float('inf') if self._time_limit is None else started + self._time_limit
+        root = self.find_root(board, players, side)
+        if self._workers > 1:
+            playouts = self.search_parallel(board, players, root, deadline)
+        else:
+            playouts = 0
+            while playouts < self._playouts and root.get_winner() is None and time.perf_counter() < deadline:
+                node, score, position = self.select_leaf(board, players, root)
+                node.backpropagate(score, self._leaf_rollouts, node.get_side())
+                playouts += self._leaf_rollouts
+
+        # Picks a move that wins the game, or else the move that was played out the most.
+        best = root.select_child(0.0) if root.get_visits() else None
+        if best is None or best.get_winner() != side:
+            best = max(root.get_children(), key=MCTSNode.get_visits, default=None)
+        if best is None:
+            # No playout ran, so any legal move is as good as another.
+            moves = board.generate_moves(players[side])
+            move = self._rng.choice(moves) if moves else None
+            return MCTSResult(move, 0, 0.0, playouts, time.perf_counter() - started)
+        return MCTSResult(best.get_move(), best.get_visits(), best.get_wins() / best.get_visits(), playouts,
+                          time.perf_counter() - started)
+
+    def search_parallel(self, board, players, root, deadline):
+        """
+        Runs the playouts of a search in the worker pool, keeping two playout jobs per worker running, and
+        returns the number of playouts made.
+        """
+
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self._workers)
+        player_tuples = tuple((player.get_player_name(), player.get_player_color()) for player in players)
+        count = self._leaf_rollouts
+        pending = {}
+        started = playouts = 0
+        while pending or (started < self._playouts and root.get_winner() is None and time.perf_counter() < deadline):
+            while len(pending) < self._workers * 2 and started < self._playouts and time.perf_counter() < deadline:
+                node, score, position = self.select_leaf(board, players, root)
+                started += count
+                if position is None:
+                    node.backpropagate(score, count, node.get_side())
+                    playouts += count
+                    continue
+                job = self._executor.submit(run_rollouts, player_tuples, position, count, self._rng.getrandbits(32),
+                                            self._limit)
+                pending[job] = node
+            done, waiting = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for job in done:
+                node = pending.pop(job)
+                node.backpropagate(job.result(), count, node.get_side())
+                playouts += count
+        return playouts
+
+    def select_leaf(self, board, players, root):
+        """
+        Walks down the tree from the root to a position to play out, adding it to the tree if it is new, and
+        counts the playouts as visits along the way. Returns the node and either the score of its playouts for
+        the player to move or, when the playouts run in the worker pool, None and the position to play out.
+        """
+
+        node, depth = root, 0
+        while node.get_winner() is None and not node.is_expandable():
+            node = node.select_child(self._exploration)
+            board.apply_move(players[1 - node.get_side()], node.get_move())
+            depth += 1
+        if node.get_winner() is None:
+            move = node.expand(self._rng)
+            board.apply_move(players[node.get_side()], move)
+            depth += 1
+            child = self.make_node(board, players, move, node, 1 - node.get_side())
+            node.add_child(child)
+            node = child
+
+        # Scores a decided position without playouts, or plays it out here when there is no worker pool.
+        count = self._leaf_rollouts
+        score, position = None, None
+        if node.get_winner() is not None:
+            score = float(count if node.get_winner() == node.get_side() else 0)
+        elif self._workers > 1:
+            position = self.get_position(board, players, node.get_side())
+        else:
+            score = sum(rollout(board, players, node.get_side(), self._rng, self._limit) for index in range(count))
+        for index in range(depth):
+            board.undo_move()
+        node.visit(count)
+        return node, score, position
+
+    def make_node(self, board, players, move, parent, side):
+        """
+        Returns a new node for the board position reached by the move from the parent node, with the player
+        with the index side to move.
+        """
+
+        mover = 1 - side
+        if players[mover].get_captures() >= board.get_rules().get_capture_target():
+            return MCTSNode(move, parent, side, board.get_hash(), [], mover)
+        moves = board.generate_moves(players[side])
+        return MCTSNode(move, parent, side, board.get_hash(), moves, None if moves else mover)
+
+    def find_root(self, board, players, side):
+        """
+        Returns the node of the tree for the board position, which becomes the new root, or a new root node
+        when the position is not the last root or one or two moves below it.
+        """
+
+        key = board.get_hash()
+        if self._root is not None:
+            candidates = [self._root] + self._root.get_children()
+            candidates += [grandchild for child in self._root.get_children() for grandchild in child.get_children()]
+            for node in candidates:
+                if node.get_key() == key and node.get_side() == side:
+                    node.detach()
+                    self._root = node
+                    return node
+        self._root = self.make_node(board, players, None, None, side)
+        return self._root
+
+    def get_position(self, board, players, side):
+        """
+        Returns the board position as a (board codes, holdings, side, rules) tuple that can be sent to a worker
+        process.
+        """
+
+        holdings = tuple((player.get_reserves(), player.get_captures()) for player in players)
+        return board.get_codes(), holdings, side, board.get_rules()
+
+    def play(self, game):
+        """
+        Searches the game position and makes the chosen move for the player whose turn it is. Returns the
+        message of the move, or None if the player has no legal moves.
+        """
+
+        move = self.search(game).get_move()
+        if move is None:
+            return None
+        return game.make_move(game.get_board().check_turn(), move)
+
+
+def main(argv=None):
+    """
+    Plays a game between two Monte Carlo tree search players from the command line and prints the playouts
+    per second of every move.
+    """
+
+    parser = argparse.ArgumentParser(description='Plays Focus with a Monte Carlo tree search.')
+    parser.add_argument('--playouts', type=int, default=1000, help='playouts per move')
+    parser.add_argument('--time', type=float, default=None, help='seconds per move')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--leaf-rollouts', type=int, default=1, help='playouts from each new position')
+    parser.add_argument('--moves', type=int, default=20, help='moves to play')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    game = FocusGame(('Player1', 'R'), ('Player2', 'G'))
+    engine = MCTSEngine(args.playouts, args.time, args.workers, args.leaf_rollouts, seed=args.seed)
+    playouts = elapsed = 0
+    with engine:
+        for number in range(args.moves):
+            name = game.get_board().check_turn()
+            result = engine.search(game)
+            if result.get_move() is None:
+                break
+            message = game.make_move(name, result.get_move())
+            playouts += result.get_playouts()
+            elapsed += result.get_elapsed()
+            print('%3d %-8s %-28s %6d playouts %5.2f score %9.1f playouts/sec' % (
+                number + 1, name, result.get_move(), result.get_playouts(), result.get_score(),
+                result.get_playouts_per_second()))
+            if message.endswith('wins!'):
+                break
+    print('playouts/sec: %.1f' % (playouts / elapsed if elapsed else 0.0))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
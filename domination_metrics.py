@@ -0,0 +1,296 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program measures how often and how long the Focus rule methods run, for finding where time
+# goes under load.
+
+import http.server
+import threading
+import time
+
+from domination_game import Board, FocusGame
+
+# The methods that are measured, by class.
+INSTRUMENTED = (
+    (FocusGame, 'move_piece'),
+    (FocusGame, 'reserved_move'),
+    (Board, 'start_validation'),
+    (Board, 'apply_move'),
+    (Board, 'make_reserved_move'),
+    (Board, 'undo_move'),
+    (Board, 'check_win'),
+)
+
+# Latencies are counted in buckets that split every power of two of nanoseconds into 4 parts.
+SUB_BUCKET_BITS = 2
+BUCKET_COUNT = 64 << SUB_BUCKET_BITS
+
+
+def bucket_of(nanoseconds):
+    """
+    Returns the histogram bucket of a latency in nanoseconds.
+    """
+
+    bits = nanoseconds.bit_length()
+    if bits <= SUB_BUCKET_BITS + 1:
+        return nanoseconds
+    return (bits << SUB_BUCKET_BITS) | ((nanoseconds >> (bits - SUB_BUCKET_BITS - 1)) & ((1 << SUB_BUCKET_BITS) - 1))
+
+
+def bucket_limit(bucket):
+    """
+    Returns the largest latency in nanoseconds counted in the histogram bucket.
+    """
+
+    bits = bucket >> SUB_BUCKET_BITS
+    if bits <= SUB_BUCKET_BITS + 1:
+        return bucket
+    part = bucket & ((1 << SUB_BUCKET_BITS) - 1)
+    return (((1 << SUB_BUCKET_BITS) | part) + 1 << (bits - SUB_BUCKET_BITS - 1)) - 1
+
+
+class MethodStats:
+    """
+    The MethodStats class holds the measurements of one method: the number of calls, a latency histogram,
+    the number of errors raised by type, and the deepest nesting of measured calls it was called at.
+    """
+    __slots__ = ('_calls', '_total', '_buckets', '_errors', '_max_depth')
+
+    def __init__(self):
+        """
+        Initializes the measurements with no calls.
+        """
+
+        self._calls = 0
+        self._total = 0
+        self._buckets = [0] * BUCKET_COUNT
+        self._errors = {}
+        self._max_depth = 0
+
+    def record(self, nanoseconds, depth, error):
+        """
+        Records a call that took the nanoseconds at the nesting depth and raised the error, or None.
+        """
+
+        self._calls += 1
+        self._total += nanoseconds
+        self._buckets[bucket_of(nanoseconds)] += 1
+        if depth > self._max_depth:
+            self._max_depth = depth
+        if error is not None:
+            name = type(error).__name__
+            self._errors[name] = self._errors.get(name, 0) + 1
+
+    def quantile(self, fraction):
+        """
+        Returns the latency in seconds that the fraction of calls took no longer than, to the resolution of
+        the histogram buckets.
+        """
+
+        if self._calls == 0:
+            return 0.0
+        wanted = fraction * self._calls
+        seen = 0
+        for bucket, count in enumerate(self._buckets):
+            seen += count
+            if count and seen >= wanted:
+                return bucket_limit(bucket) / 1e9
+        return 0.0
+
+    def to_dict(self):
+        """
+        Returns the measurements as a dictionary.
+        """
+
+        return {'calls': self._calls, 'total_seconds': self._total / 1e9, 'p50_seconds': self.quantile(0.5),
+                'p99_seconds': self.quantile(0.99), 'errors': dict(self._errors), 'max_depth': self._max_depth}
+
+
+class Instrumentation:
+    """
+    The Instrumentation class replaces the measured methods with wrappers that time them while it is enabled,
+    and puts the original methods back when it is disabled, so nothing is measured or slowed down while it
+    is off. The nesting depth counts measured calls made inside other measured calls, such as start_validation
+    inside move_piece. Each thread has its own nesting depth, so calls measured on other threads, such as a
+    PonderWorker searching in the background, do not add to it.
+    """
+    __slots__ = ('_stats', '_originals', '_local', '_lock')
+
+    def __init__(self):
+        """
+        Initializes the instrumentation, disabled and with no measurements.
+        """
+
+        self._stats = {}
+        self._originals = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def is_enabled(self):
+        """
+        Returns True if the methods are being measured.
+        """
+
+        return bool(self._originals)
+
+    def enable(self):
+        """
+        Starts measuring the methods.
+        """
+
+        for cls, name in INSTRUMENTED:
+            key = cls.__name__ + '.' + name
+            if key not in self._originals:
+                self._originals[key] = (cls, name, cls.__dict__[name])
+                self._stats.setdefault(key, MethodStats())
+                setattr(cls, name, self.wrap(cls.__dict__[name], self._stats[key]))
+
+    def disable(self):
+        """
+        Stops measuring the methods and puts the original methods back. The measurements are kept.
+        """
+
+        for cls, name, method in self._originals.values():
+            setattr(cls, name, method)
+        self._originals.clear()
+
+    def reset(self):
+        """
+        Removes all measurements.
+        """
+
+        with self._lock:
+            self._stats = {key: MethodStats() for key in self._stats}
+        if self.is_enabled():
+            self.disable()
+            self.enable()
+
+    def wrap(self, method, stats):
+        """
+        Returns a wrapper of the method that records its calls in the stats. The calls are recorded under the
+        lock, so calls measured on several threads at once are all counted and snapshot sees whole records.
+        """
+
+        local = self._local
+        lock = self._lock
+
+        def measured(*args, **kwargs):
+            depth = getattr(local, 'depth', 0) + 1
+            local.depth = depth
+            error = None
+            started = time.perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            except Exception as raised:
+                error = raised
+                raise
+            finally:
+                elapsed = time.perf_counter_ns() - started
+                with lock:
+                    stats.record(elapsed, depth, error)
+                local.depth = depth - 1
+
+        measured.__name__ = method.__name__
+        measured.__doc__ = method.__doc__
+        measured.__wrapped__ = method
+        return measured
+
+    def snapshot(self):
+        """
+        Returns the measurements of every method as a dictionary keyed by class and method name.
+        """
+
+        with self._lock:
+            return {key: stats.to_dict() for key, stats in self._stats.items()}
+
+    def to_prometheus(self):
+        """
+        Returns the measurements in the Prometheus text format.
+        """
+
+        lines = ['# HELP focus_calls_total Calls of the Focus rule methods.', '# TYPE focus_calls_total counter']
+        snapshot = self.snapshot()
+        for key, stats in snapshot.items():
+            lines.append('focus_calls_total{method="%s"} %d' % (key, stats['calls']))
+        lines += ['# HELP focus_call_seconds Latency of the Focus rule methods.', '# TYPE focus_call_seconds summary']
+        for key, stats in snapshot.items():
+            for label, field in (('0.5', 'p50_seconds'), ('0.99', 'p99_seconds')):
+                lines.append('focus_call_seconds{method="%s",quantile="%s"} %.9g' % (key, label, stats[field]))
+            lines.append('focus_call_seconds_sum{method="%s"} %.9g' % (key, stats['total_seconds']))
+            lines.append('focus_call_seconds_count{method="%s"} %d' % (key, stats['calls']))
+        lines += ['# HELP focus_errors_total Errors raised by the Focus rule methods.',
+                  '# TYPE focus_errors_total counter']
+        for key, stats in snapshot.items():
+            for error, count in sorted(stats['errors'].items()):
+                lines.append('focus_errors_total{method="%s",error="%s"} %d' % (key, error, count))
+        lines += ['# HELP focus_call_depth_max Deepest nesting of measured calls.', '# TYPE focus_call_depth_max gauge']
+        for key, stats in snapshot.items():
+            lines.append('focus_call_depth_max{method="%s"} %d' % (key, stats['max_depth']))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """
+        Writes the measurements in the Prometheus text format to the file at the path.
+        """
+
+        with open(path, 'w') as output:
+            output.write(self.to_prometheus())
+
+    def serve_prometheus(self, port=9464, host='127.0.0.1'):
+        """
+        Serves the measurements in the Prometheus text format over HTTP on the host and port from a background
+        thread. Returns the HTTP server, which stops when its shutdown method is called.
+        """
+
+        instrumentation = self
+
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                """
+                Sends the measurements for every GET request.
+                """
+
+                body = instrumentation.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                """
+                Does not log requests.
+                """
+
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# The instrumentation used by the functions below.
+INSTRUMENTATION = Instrumentation()
+
+
+def enable():
+    """
+    Starts measuring the Focus rule methods.
+    """
+
+    INSTRUMENTATION.enable()
+
+
+def disable():
+    """
+    Stops measuring the Focus rule methods.
+    """
+
+    INSTRUMENTATION.disable()
+
+
+def snapshot():
+    """
+    Returns the measurements of the Focus rule methods.
+    """
+
+    return INSTRUMENTATION.snapshot()
@@ -0,0 +1,249 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program counts the move sequences of a set length from a Focus position, for checking the
+# move rules and timing the move generator.
+
+import argparse
+import concurrent.futures
+import os
+import sys
+import time
+
+from domination_game import FocusGame, InvalidLocation, PlayerPieceError, PlayerTurnError, Rules
+from domination_records import GameArchive
+
+# The players of the games made by the command line.
+PLAYER_TUPLES = (('Player1', 'R'), ('Player2', 'G'))
+
+
+def get_side(game):
+    """
+    Returns the index of the player whose turn it is.
+    """
+
+    players = game.get_players()
+    return 0 if game.get_board().check_turn().lower() == players[0].get_player_name().lower() else 1
+
+
+def count_moves(board, players, side, depth):
+    """
+    Returns the number of move sequences of the depth from the board position, with the player with the
+    index side to move. The moves are made and taken back on the board. The rules let players keep moving
+    after a win, so won positions are counted through like any other.
+    """
+
+    moves = board.generate_moves(players[side])
+    if depth == 1:
+        return len(moves)
+    total = 0
+    for move in moves:
+        board.apply_move(players[side], move)
+        total += count_moves(board, players, 1 - side, depth - 1)
+        board.undo_move()
+    return total
+
+
+def perft(game, depth):
+    """
+    Returns the number of move sequences of the depth from the game position. The game is the same afterwards.
+    """
+
+    if depth == 0:
+        return 1
+    return count_moves(game.get_board(), game.get_players(), get_side(game), depth)
+
+
+def divide(game, depth):
+    """
+    Returns a list of (move, count) pairs with the number of move sequences of the depth that start with each
+    legal move of the game position.
+    """
+
+    board = game.get_board()
+    players = game.get_players()
+    side = get_side(game)
+    counts = []
+    for move in board.generate_moves(players[side]):
+        board.apply_move(players[side], move)
+        counts.append((move, 1 if depth == 1 else count_moves(board, players, 1 - side, depth - 1)))
+        board.undo_move()
+    return counts
+
+
+def get_position(game):
+    """
+    Returns the game position as a (player tuples, board codes, holdings, side, rules) tuple that can be sent
+    to a worker process.
+    """
+
+    players = game.get_players()
+    player_tuples = tuple((player.get_player_name(), player.get_player_color()) for player in players)
+    holdings = tuple((player.get_reserves(), player.get_captures()) for player in players)
+    return player_tuples, game.get_board().get_codes(), holdings, get_side(game), game.get_rules()
+
+
+def load_game(position):
+    """
+    Returns a new game set up at a position from get_position.
+    """
+
+    player_tuples, codes, holdings, side, rules = position
+    game = FocusGame(*player_tuples, rules=rules)
+    game.load_position(codes, holdings, player_tuples[side][0])
+    return game
+
+
+def divide_moves(position, moves, depth):
+    """
+    Returns the (move, count) pairs of divide for the given root moves of the position. This is the unit of
+    work sent to a worker process.
+    """
+
+    game = load_game(position)
+    board = game.get_board()
+    players = game.get_players()
+    side = position[3]
+    counts = []
+    for move in moves:
+        board.apply_move(players[side], move)
+        counts.append((move, 1 if depth == 1 else count_moves(board, players, 1 - side, depth - 1)))
+        board.undo_move()
+    return counts
+
+
+def divide_parallel(game, depth, workers=None):
+    """
+    Returns the same (move, count) pairs as divide, with the root moves split across a pool of worker
+    processes, one per core unless the number of workers is given.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    moves = game.legal_moves(game.get_board().check_turn())
+    if workers == 1 or depth == 1:
+        return divide(game, depth)
+    position = get_position(game)
+    chunks = [moves[index::workers * 4] for index in range(workers * 4)]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(divide_moves, [position] * len(chunks), chunks, [depth] * len(chunks))
+        found = dict(pair for counts in results for pair in counts)
+    return [(move, found[move]) for move in moves]
+
+
+def candidate_moves(game):
+    """
+    Returns every move worth trying in the game position, allowed or not: a move of 1 piece up to the stack
+    limit from every square to every other square in its row or column, and a reserve move to every square.
+    """
+
+    rules = game.get_rules()
+    coordinates = rules.get_coordinates()
+    candidates = []
+    for start in coordinates:
+        for end in coordinates:
+            if end != start and (end[0] == start[0] or end[1] == start[1]):
+                candidates.extend((start, end, pieces) for pieces in range(1, rules.get_max_stack() + 1))
+    candidates.extend((None, end, 1) for end in coordinates)
+    return candidates
+
+
+def perft_reference(game, depth, candidates=None):
+    """
+    Returns the number of move sequences of the depth from the game position, found without the move
+    generator by trying every candidate move with the move_piece and reserved_move rules and keeping the
+    ones that do not raise an error. This is slow, and its count should equal perft's.
+    """
+
+    if depth == 0:
+        return 1
+    if candidates is None:
+        candidates = candidate_moves(game)
+    name = game.get_board().check_turn()
+    total = 0
+    for move in candidates:
+        try:
+            game.make_move(name, move)
+        except (InvalidLocation, PlayerPieceError, PlayerTurnError):
+            continue
+        total += perft_reference(game, depth - 1, candidates)
+        game.undo_move()
+    return total
+
+
+def divide_reference(game, depth):
+    """
+    Returns a list of (move, count) pairs like divide, found with perft_reference. The moves are the candidate
+    moves that the move_piece and reserved_move rules allow.
+    """
+
+    candidates = candidate_moves(game)
+    name = game.get_board().check_turn()
+    counts = []
+    for move in candidates:
+        try:
+            game.make_move(name, move)
+        except (InvalidLocation, PlayerPieceError, PlayerTurnError):
+            continue
+        counts.append((move, perft_reference(game, depth - 1, candidates)))
+        game.undo_move()
+    return counts
+
+
+def load_archive_position(path, index, moves):
+    """
+    Returns the game with the index from a game archive, replayed up to the number of moves, or all of them.
+    """
+
+    with GameArchive(path) as archive:
+        record = archive.get_game(index)
+        if record is None:
+            raise ValueError('the archive has no game %d' % index)
+        game = record.replay(moves)
+        return load_game(get_position(game))
+
+
+def main(argv=None):
+    """
+    Counts the move sequences of a depth from the command line, from the starting position or a position of
+    a game archive, and prints the count for every root move and the number of positions per second.
+    """
+
+    parser = argparse.ArgumentParser(description='Counts the Focus move sequences of a depth.')
+    parser.add_argument('depth', type=int)
+    parser.add_argument('--workers', type=int, default=1, help='processes to split the root moves across')
+    parser.add_argument('--divide', action='store_true', help='print the count of every root move')
+    parser.add_argument('--reference', action='store_true', help='also count with the move_piece rules')
+    parser.add_argument('--archive', help='game archive to load the position from')
+    parser.add_argument('--game', type=int, default=0, help='index of the archive game')
+    parser.add_argument('--moves', type=int, default=None, help='moves of the archive game to replay')
+    parser.add_argument('--size', type=int, default=6, help='squares on each side of the board')
+    parser.add_argument('--stack', type=int, default=5, help='most pieces a stack may hold')
+    args = parser.parse_args(argv)
+
+    game = FocusGame(*PLAYER_TUPLES, rules=Rules(args.size, args.stack))
+    if args.archive:
+        game = load_archive_position(args.archive, args.game, args.moves)
+    started = time.perf_counter()
+    counts = divide_parallel(game, args.depth, args.workers) if args.depth > 0 else []
+    elapsed = time.perf_counter() - started
+    total = sum(count for move, count in counts) if args.depth > 0 else 1
+    if args.divide:
+        for move, count in counts:
+            print('%-28s %d' % (move, count))
+    print('perft(%d) = %d  %.1f positions/sec' % (args.depth, total, total / elapsed if elapsed else 0.0))
+
+    # Compares the counts with the ones found with the rules of move_piece and reserved_move, and prints the
+    # root moves that differ.
+    if args.reference and args.depth > 0:
+        reference = dict(divide_reference(game, args.depth))
+        found = dict(counts)
+        for move in sorted(set(reference) | set(found), key=str):
+            if reference.get(move) != found.get(move):
+                print('MISMATCH %-28s perft %s  reference %s' % (move, found.get(move), reference.get(move)))
+        print('reference = %d  %s' % (sum(reference.values()), 'ok' if reference == found else 'MISMATCH'))
+        return 0 if reference == found else 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
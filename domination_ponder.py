@@ -0,0 +1,213 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program searches a live Focus game in the background while the players think, so that
+# hints and computer replies are ready as soon as they are asked for.
+
+import threading
+
+from domination_game import TranspositionTable
+from domination_search import SearchEngine
+
+# The bytes a full bucket of the transposition table takes: two entry tuples with their keys and scores, and
+# the two list slots that point to them. The memory cap of a worker is turned into a number of buckets with it.
+BUCKET_BYTES = 272
+
+# The memory a worker's transposition table may use unless it is given a cap, in bytes.
+MEMORY_CAP = 64 * 1024 * 1024
+
+
+class PonderWorker:
+    """
+    The PonderWorker class searches a FocusGame on a background thread. It listens to the game's EventFeed and
+    starts over whenever a move is made or taken back: the search running for the old position is stopped and
+    its results are thrown away, apart from the result for the new position if it was already searched. The
+    worker searches the position for the player to move, then the positions after that player's likeliest
+    moves, so the reply to the move that is made is usually ready. Every search shares one transposition
+    table, which stays warm from move to move and is sized to fit the memory cap.
+
+    The worker searches a fork of the game, so the game itself is never changed by it, and the fork is taken
+    on the thread that makes the moves. The search holds the interpreter lock while it runs, so it slows the
+    thread that makes the moves somewhat but never stops it for longer than a thread switch.
+    """
+    __slots__ = ('_feed', '_engine', '_table', '_replies', '_condition', '_thread', '_position', '_cancel',
+                 '_generation', '_finished', '_results', '_running', '_closed')
+
+    def __init__(self, feed, time_limit=1.0, max_depth=32, replies=4, memory_cap=MEMORY_CAP):
+        """
+        Initializes a worker for the game of the EventFeed and starts its thread on the game's position. Each
+        position is searched for up to time_limit seconds and to max_depth, and the number of the likeliest
+        moves of the player to move whose replies are searched is given by replies. The transposition table
+        has as many buckets as fit in memory_cap bytes, rounded down to a power of two.
+        """
+
+        buckets = max(memory_cap // BUCKET_BYTES, 1)
+        self._feed = feed
+        self._table = TranspositionTable(1 << (buckets.bit_length() - 1))
+        self._engine = SearchEngine(time_limit, max_depth, self._table)
+        self._replies = replies
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._finished = 0
+        self._position = None
+        self._cancel = threading.Event()
+        self._results = {}
+        self._running = False
+        self._closed = False
+        self._thread = threading.Thread(target=self.run, name='ponder', daemon=True)
+        feed.add(self)
+        self.push(None)
+        self._thread.start()
+
+    def get_table(self):
+        """
+        Returns the transposition table of the worker.
+        """
+
+        return self._table
+
+    def get_memory_use(self):
+        """
+        Returns the most bytes the worker's transposition table can take.
+        """
+
+        return self._table.get_size() * BUCKET_BYTES
+
+    def is_running(self):
+        """
+        Returns True while the worker is searching.
+        """
+
+        return self._running
+
+    def push(self, event):
+        """
+        Starts the work over for the game's position after an event of its feed. This is called on the
+        thread that makes the moves, which is where the game is forked. The work of every generation has its
+        own cancel event, which is set when the generation ends, so a search of an old position stops even if
+        it had not started yet.
+        """
+
+        game = self._feed.get_game()
+        board = game.get_board()
+        with self._condition:
+            if self._closed:
+                return
+            self._cancel.set()
+            self._cancel = threading.Event()
+            self._generation += 1
+            self._position = (self._generation, game.fork(), self._cancel)
+            key = board.get_hash()
+            self._results = {key: self._results[key]} if key in self._results else {}
+            self._condition.notify_all()
+
+    def cancel(self):
+        """
+        Stops the search of the current position. The worker starts again after the next move.
+        """
+
+        with self._condition:
+            self._generation += 1
+            self._finished = self._generation
+            self._position = None
+            self._cancel.set()
+            self._condition.notify_all()
+
+    def close(self):
+        """
+        Stops the worker and waits for its thread to end. The feed no longer sends it events.
+        """
+
+        with self._condition:
+            self._closed = True
+            self._position = None
+            self._cancel.set()
+            self._condition.notify_all()
+        self._feed.remove(self)
+        self._thread.join()
+
+    def get_hint(self, timeout=0.0):
+        """
+        Returns the SearchResult for the game's position, waiting up to the timeout in seconds for the worker
+        to finish it, or None if it is not ready. A timeout of None waits until it is ready, unless the work is
+        cancelled, the worker is closed or the position has no moves to search.
+        """
+
+        with self._condition:
+            key = self._feed.get_game().get_hash()
+            self._condition.wait_for(lambda: key in self._results or self._closed or
+                                     self._finished == self._generation, timeout)
+            return self._results.get(key)
+
+    def play(self, timeout=None):
+        """
+        Makes the move of the hint for the player whose turn it is, waiting up to the timeout as get_hint does.
+        Returns the message of the move, or None if there is no hint or the player has no legal moves.
+        """
+
+        game = self._feed.get_game()
+        result = self.get_hint(timeout)
+        if result is None or result.get_move() is None:
+            return None
+        return game.make_move(game.get_board().check_turn(), result.get_move())
+
+    def run(self):
+        """
+        Searches the positions handed to the worker until it is closed. This is the body of the worker thread.
+        """
+
+        while True:
+            with self._condition:
+                self._running = False
+                self._condition.wait_for(lambda: self._closed or self._position is not None)
+                if self._closed:
+                    return
+                generation, game, cancel = self._position
+                self._position = None
+                self._running = True
+            self.analyse(generation, game, cancel)
+            with self._condition:
+                self._finished = max(self._finished, generation)
+                self._condition.notify_all()
+
+    def analyse(self, generation, game, cancel):
+        """
+        Searches the position of the game, then the positions after the likeliest moves of the player to move,
+        and keeps every result as long as the position has not changed since the work of the generation began.
+        The searches stop when the generation's cancel event is set.
+        """
+
+        board = game.get_board()
+        name = board.check_turn()
+        result = self.search(generation, game, cancel)
+        if result is None or result.get_move() is None:
+            return
+
+        # The likeliest moves are the best move found, then the moves the search tries first.
+        player = game.get_player_from_name(name)
+        moves = self._engine.order_moves(board, player, board.generate_moves(player), result.get_move())
+        for move in moves[:self._replies]:
+            board.apply_move(player, move)
+            found = self.search(generation, game, cancel)
+            board.undo_move()
+            if found is None:
+                return
+
+    def search(self, generation, game, cancel):
+        """
+        Searches the position of the game and records the SearchResult, unless the position of the game being
+        played changed during the search. Returns the result, or None if it was thrown away.
+        """
+
+        key = game.get_hash()
+        with self._condition:
+            if generation != self._generation:
+                return None
+            if key in self._results:
+                return self._results[key]
+        result = self._engine.search(game, cancel)
+        with self._condition:
+            if generation != self._generation:
+                return None
+            self._results[key] = result
+            self._condition.notify_all()
+        return result
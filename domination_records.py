@@ -0,0 +1,408 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program writes Focus games to a compact binary archive and reads and replays them.
+
+import argparse
+import mmap
+import struct
+import sys
+
+from domination_game import DEFAULT_RULES, FocusGame, Rules
+
+# Every game in an archive starts with the magic bytes, the format version and a flags byte kept for later use.
+# Games played with the default rules are written in version 1, and games with other rules in version 2.
+MAGIC = b'FCSG'
+VERSION = 1
+RULES_VERSION = 2
+GAME_HEADER = struct.Struct('<4sBB')
+
+# The length of a player name or color, and the number of moves of a game.
+TEXT_LENGTH = struct.Struct('<B')
+MOVE_COUNT = struct.Struct('<I')
+
+# Every move is the index of the player who moved, the start square (or RESERVE for a reserve move), the end
+# square and the number of pieces moved, one byte each. Squares are in flat board order.
+MOVE_RECORD = struct.Struct('<BBBB')
+RESERVE = 255
+
+# Version 2 games hold their rules after the header: the board size, the stack limit, the capture target and
+# the length of the layout, followed by one byte per layout entry (LAYOUT_EMPTY for an empty square). Their
+# squares take two bytes, so boards with more than 255 squares fit.
+RULES_RECORD = struct.Struct('<BBHB')
+LAYOUT_EMPTY = 2
+WIDE_MOVE_RECORD = struct.Struct('<BHHB')
+WIDE_RESERVE = 0xFFFF
+
+
+class RecordError(Exception):
+    """
+    This error is raised when an archive does not hold valid game records.
+    """
+    pass
+
+
+def get_move_format(rules):
+    """
+    Returns the (move record, reserve square) pair that the moves of a game with the rules are written with.
+    """
+
+    if rules == DEFAULT_RULES:
+        return MOVE_RECORD, RESERVE
+    return WIDE_MOVE_RECORD, WIDE_RESERVE
+
+
+def encode_move(player_index, move, rules=DEFAULT_RULES):
+    """
+    Returns the record bytes of a move by the player with the index in a game with the rules. The move is a
+    (start, end, pieces) tuple or a (None, position, 1) tuple for a reserve move.
+    """
+
+    start, end, pieces = move
+    size = rules.get_board_size()
+    record, reserve = get_move_format(rules)
+    start_square = reserve if start is None else start[0] * size + start[1]
+    return record.pack(player_index, start_square, end[0] * size + end[1], pieces)
+
+
+def decode_move(start_square, end_square, pieces, rules=DEFAULT_RULES):
+    """
+    Returns the move tuple of the square numbers and number of pieces of a move record of a game with the rules.
+    Raises a RecordError if a square is not on the board of the rules.
+    """
+
+    coordinates = rules.get_coordinates()
+    reserve = get_move_format(rules)[1]
+    if end_square >= len(coordinates) or (start_square >= len(coordinates) and start_square != reserve):
+        raise RecordError('move record square out of range')
+    start = None if start_square == reserve else coordinates[start_square]
+    return start, coordinates[end_square], pieces
+
+
+def encode_rules(rules):
+    """
+    Returns the record bytes of the rules of a version 2 game.
+    """
+
+    size, max_stack, capture_target, layout = rules.get_settings()
+    entries = bytes(LAYOUT_EMPTY if owner is None else owner for owner in layout)
+    return RULES_RECORD.pack(size, max_stack, capture_target, len(entries)) + entries
+
+
+def encode_game(players, moves, rules=DEFAULT_RULES):
+    """
+    Returns the record bytes of a game between the two player tuples passed to FocusGame, with moves given as
+    (player index, move) pairs in the order they were made, played with the rules.
+    """
+
+    if rules == DEFAULT_RULES:
+        parts = [GAME_HEADER.pack(MAGIC, VERSION, 0)]
+    else:
+        parts = [GAME_HEADER.pack(MAGIC, RULES_VERSION, 0), encode_rules(rules)]
+    for name, color in players:
+        for text in (name.encode('utf-8'), color.encode('utf-8')):
+            parts.append(TEXT_LENGTH.pack(len(text)) + text)
+    parts.append(MOVE_COUNT.pack(len(moves)))
+    parts.extend(encode_move(player_index, move, rules) for player_index, move in moves)
+    return b''.join(parts)
+
+
+class ArchiveWriter:
+    """
+    The ArchiveWriter class appends games to an archive file.
+    """
+    __slots__ = ('_file',)
+
+    def __init__(self, path):
+        """
+        Opens the archive file at the path for appending.
+        """
+
+        self._file = open(path, 'ab')
+
+    def write_game(self, players, moves, rules=DEFAULT_RULES):
+        """
+        Appends a game between the two player tuples with moves given as (player index, move) pairs, played
+        with the rules.
+        """
+
+        self._file.write(encode_game(players, moves, rules))
+
+    def close(self):
+        """
+        Closes the archive file.
+        """
+
+        self._file.close()
+
+    def __enter__(self):
+        """
+        Returns the archive for use in a with statement.
+        """
+
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Closes the archive at the end of a with statement.
+        """
+
+        self.close()
+
+
+class GameRecord:
+    """
+    The GameRecord class is one game of an archive. It only holds where the game's moves are in the archive,
+    and reads them when they are asked for.
+    """
+    __slots__ = ('_data', '_players', '_offset', '_count', '_rules', '_record')
+
+    def __init__(self, data, players, offset, count, rules=DEFAULT_RULES):
+        """
+        Initializes the record from the archive data, the player tuples, the offset of the first move, the
+        number of moves and the rules of the game.
+        """
+
+        self._data = data
+        self._players = players
+        self._offset = offset
+        self._count = count
+        self._rules = rules
+        self._record = get_move_format(rules)[0]
+
+    def get_players(self):
+        """
+        Returns the two (name, color) player tuples of the game.
+        """
+
+        return self._players
+
+    def get_rules(self):
+        """
+        Returns the Rules instance the game was played with.
+        """
+
+        return self._rules
+
+    def get_move_count(self):
+        """
+        Returns the number of moves of the game.
+        """
+
+        return self._count
+
+    def get_move(self, index):
+        """
+        Returns the (player index, move) pair of the move with the index.
+        """
+
+        if not 0 <= index < self._count:
+            raise IndexError('move index out of range')
+        offset = self._offset + index * self._record.size
+        player_index, start, end, pieces = self._record.unpack_from(self._data, offset)
+        return player_index, decode_move(start, end, pieces, self._rules)
+
+    def iter_moves(self):
+        """
+        Yields the (player index, move) pairs of the game in order. Raises a RecordError at a move with a
+        square that is not on the board.
+        """
+
+        record = self._record
+        for offset in range(self._offset, self._offset + self._count * record.size, record.size):
+            player_index, start, end, pieces = record.unpack_from(self._data, offset)
+            yield player_index, decode_move(start, end, pieces, self._rules)
+
+    def iter_states(self):
+        """
+        Replays the game and yields the FocusGame after each move, along with the message of the move. The
+        same FocusGame is changed and yielded every time.
+        """
+
+        game = FocusGame(*self._players, rules=self._rules)
+        names = [player[0] for player in self._players]
+        for player_index, move in self.iter_moves():
+            yield game, game.make_move(names[player_index], move)
+
+    def replay(self, moves=None):
+        """
+        Returns a FocusGame with the first number of moves of the game made, or all of the moves.
+        """
+
+        game = FocusGame(*self._players, rules=self._rules)
+        names = [player[0] for player in self._players]
+        for number, (player_index, move) in enumerate(self.iter_moves()):
+            if moves is not None and number >= moves:
+                break
+            game.make_move(names[player_index], move)
+        return game
+
+
+class GameArchive:
+    """
+    The GameArchive class reads an archive file through a memory map, so archives larger than memory can be
+    read. Games are found one at a time as they are asked for, and their moves are only read from the map
+    when they are used.
+    """
+    __slots__ = ('_file', '_data', '_offsets', '_end', '_rules')
+
+    def __init__(self, path):
+        """
+        Opens and memory-maps the archive file at the path.
+        """
+
+        self._file = open(path, 'rb')
+        size = self._file.seek(0, 2)
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._offsets = [0]
+        self._end = size
+        self._rules = {}
+
+    def read_game(self, offset):
+        """
+        Returns the GameRecord that starts at the offset and the offset of the game after it. Raises a
+        RecordError if the archive does not hold a whole game record at the offset.
+        """
+
+        start = offset
+        try:
+            record, offset = self.read_record(offset)
+        except (struct.error, IndexError, UnicodeDecodeError) as error:
+            raise RecordError('invalid game record at offset %d: %s' % (start, error))
+        if offset > self._end:
+            raise RecordError('the game record at offset %d is cut short' % start)
+        return record, offset
+
+    def read_record(self, offset):
+        """
+        Reads the game record at the offset for read_game, without checking that it ends inside the archive.
+        """
+
+        magic, version, flags = GAME_HEADER.unpack_from(self._data, offset)
+        if magic != MAGIC or version not in (VERSION, RULES_VERSION):
+            raise RecordError('no game record at offset %d' % offset)
+        offset += GAME_HEADER.size
+        rules = DEFAULT_RULES
+        if version == RULES_VERSION:
+            size, max_stack, capture_target, length = RULES_RECORD.unpack_from(self._data, offset)
+            offset += RULES_RECORD.size
+            layout = tuple(None if owner == LAYOUT_EMPTY else owner for owner in self._data[offset:offset + length])
+            offset += length
+            rules = self.get_rules((size, max_stack, capture_target, layout), offset)
+        texts = []
+        for index in range(4):
+            length = self._data[offset]
+            texts.append(bytes(self._data[offset + 1:offset + 1 + length]).decode('utf-8'))
+            offset += 1 + length
+        count = MOVE_COUNT.unpack_from(self._data, offset)[0]
+        offset += MOVE_COUNT.size
+        players = ((texts[0], texts[1]), (texts[2], texts[3]))
+        record = GameRecord(self._data, players, offset, count, rules)
+        return record, offset + count * get_move_format(rules)[0].size
+
+    def get_rules(self, settings, offset):
+        """
+        Returns the Rules instance with the settings of a version 2 game at the offset. Games with the same
+        settings share one instance, so the tables of the rules are only built once per archive.
+        """
+
+        if settings not in self._rules:
+            try:
+                self._rules[settings] = Rules(*settings)
+            except ValueError:
+                raise RecordError('invalid rules at offset %d' % offset)
+        return self._rules[settings]
+
+    def __iter__(self):
+        """
+        Yields the GameRecord of every game in the archive in order.
+        """
+
+        index = 0
+        while True:
+            record = self.get_game(index)
+            if record is None:
+                return
+            yield record
+            index += 1
+
+    def get_game(self, index):
+        """
+        Returns the GameRecord of the game with the index, or None if the archive has fewer games. The offsets
+        of the games before it are remembered, so later lookups do not read them again.
+        """
+
+        while len(self._offsets) <= index and self._offsets[-1] < self._end:
+            self._offsets.append(self.read_game(self._offsets[-1])[1])
+        if index >= len(self._offsets) or self._offsets[index] >= self._end:
+            return None
+        return self.read_game(self._offsets[index])[0]
+
+    def get_offsets(self):
+        """
+        Returns a list of the offsets of every game in the archive, in order. The offsets can be passed to
+        read_games, so the games of a range can be read without reading the games before them.
+        """
+
+        while self._offsets[-1] < self._end:
+            self._offsets.append(self.read_game(self._offsets[-1])[1])
+        return self._offsets[:-1]
+
+    def read_games(self, offset, count):
+        """
+        Yields the GameRecords of up to count games in order, starting with the game at the offset.
+        """
+
+        for index in range(count):
+            if offset >= self._end:
+                return
+            record, offset = self.read_game(offset)
+            yield record
+
+    def close(self):
+        """
+        Closes the memory map and the archive file.
+        """
+
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def __enter__(self):
+        """
+        Returns the archive for use in a with statement.
+        """
+
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Closes the archive at the end of a with statement.
+        """
+
+        self.close()
+
+
+def main(argv=None):
+    """
+    Prints the number of games and moves in an archive from the command line, and optionally replays every
+    game to check that its moves are legal.
+    """
+
+    parser = argparse.ArgumentParser(description='Reads a Focus game archive.')
+    parser.add_argument('path')
+    parser.add_argument('--replay', action='store_true', help='replay every game through FocusGame')
+    args = parser.parse_args(argv)
+
+    games = moves = 0
+    with GameArchive(args.path) as archive:
+        for record in archive:
+            games += 1
+            moves += record.get_move_count()
+            if args.replay:
+                record.replay()
+    print('games: %d  moves: %d' % (games, moves))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
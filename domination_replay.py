@@ -0,0 +1,140 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program checks and replays many recorded Focus games at once, on all of the computer's cores.
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import sys
+import time
+
+from domination_game import DEFAULT_RULES, FocusGame
+from domination_records import GameArchive
+
+
+def replay_game(players, moves, rules=DEFAULT_RULES):
+    """
+    Replays one game between the two player tuples with the moves, given as (player, move) pairs as for
+    FocusGame.apply_moves, and returns its ReplayResult.
+    """
+
+    return FocusGame(*players, rules=rules).apply_moves(moves)
+
+
+def replay_batch(games):
+    """
+    Replays a list of (players, moves) or (players, moves, rules) games and returns a list of their
+    ReplayResults. This is the unit of work sent to a worker process.
+    """
+
+    return [replay_game(*game) for game in games]
+
+
+def replay_archive_games(path, offset, count):
+    """
+    Replays up to count games of the archive at the path, starting with the game at the offset, and returns a
+    list of their ReplayResults. The archive is read by the worker process itself, so the moves are not sent
+    to it.
+    """
+
+    with GameArchive(path) as archive:
+        return [replay_game(record.get_players(), record.iter_moves(), record.get_rules())
+                for record in archive.read_games(offset, count)]
+
+
+def run_batches(function, jobs, workers):
+    """
+    Runs the function on the arguments of every job and yields the items of the lists it returns, in job
+    order. The jobs run across a pool of worker processes with only a few jobs per worker waiting at a time,
+    or in this process when there is one worker.
+    """
+
+    if workers == 1:
+        for job in jobs:
+            yield from function(*job)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for job in jobs:
+            pending.append(executor.submit(function, *job))
+            if len(pending) >= workers * 4:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def replay_games(games, workers=1, batch=64):
+    """
+    Replays the games of an iterable of (players, moves) or (players, moves, rules) tuples and yields their
+    ReplayResults in the order of the games. The games run in this process unless the number of workers is
+    more than 1 or None, which means one worker process per core, and are then sent to the workers in batches.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    def jobs():
+        chunk = []
+        for game in games:
+            chunk.append(game if workers == 1 else (game[0], list(game[1])) + tuple(game[2:]))
+            if len(chunk) == batch:
+                yield (chunk,)
+                chunk = []
+        if chunk:
+            yield (chunk,)
+
+    return run_batches(replay_batch, jobs(), workers)
+
+
+def replay_archive(path, workers=None, batch=256):
+    """
+    Replays every game of the archive at the path and yields their ReplayResults in archive order. The games
+    are split into batches that the worker processes, one per core unless the number of workers is given,
+    read from the archive themselves, starting at the offset of the batch's first game.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with GameArchive(path) as archive:
+        offsets = archive.get_offsets()
+    jobs = ((path, offsets[first], batch) for first in range(0, len(offsets), batch))
+    return run_batches(replay_archive_games, jobs, workers)
+
+
+def main(argv=None):
+    """
+    Replays every game of an archive from the command line and prints the number of games with a move that
+    is not allowed and the number of moves per second. The results of those games can also be written as
+    lines of JSON. The exit status is 1 if any game has a move that is not allowed.
+    """
+
+    parser = argparse.ArgumentParser(description='Checks and replays the games of a Focus game archive.')
+    parser.add_argument('path')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', help='file to write the result of every invalid game to as JSON')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    games = moves = invalid = 0
+    output = open(args.output, 'w') if args.output else None
+    for index, result in enumerate(replay_archive(args.path, args.workers)):
+        games += 1
+        moves += result.get_applied()
+        if not result.is_valid():
+            invalid += 1
+            if output:
+                output.write(json.dumps(dict(result.to_dict(), game=index)) + '\n')
+    if output:
+        output.close()
+
+    elapsed = time.perf_counter() - started
+    print('games: %d  invalid: %d  moves: %d  moves/sec: %.1f' % (games, invalid, moves,
+                                                                  moves / elapsed if elapsed else 0.0))
+    return 1 if invalid else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,325 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program lets the computer play a Focus game by searching the moves ahead of the position.
+
+import time
+
+from domination_game import EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable
+from domination_tablebase import LOSS, WIN
+
+# The score of a won position. Wins found sooner score higher than wins found later.
+WIN_SCORE = 1000000
+
+# Scores further from 0 than this are wins or losses, which the transposition table holds as the distance
+# from the stored position instead of from the root of the search.
+WIN_BOUND = WIN_SCORE // 2
+
+# The evaluation weights for each captured piece, reserve piece and controlled stack.
+CAPTURE_WEIGHT = 100
+RESERVE_WEIGHT = 30
+CONTROL_WEIGHT = 10
+
+# The number of searched positions between checks of the clock.
+CLOCK_INTERVAL = 256
+
+
+def to_table_score(score, ply):
+    """
+    Returns the score of a position at the ply from the root in the form the transposition table holds it.
+    """
+
+    if score > WIN_BOUND:
+        return score + ply
+    if score < -WIN_BOUND:
+        return score - ply
+    return score
+
+
+def from_table_score(score, ply):
+    """
+    Returns the score held in the transposition table for a position found at the ply from the root.
+    """
+
+    if score > WIN_BOUND:
+        return score - ply
+    if score < -WIN_BOUND:
+        return score + ply
+    return score
+
+
+class SearchResult:
+    """
+    The SearchResult class holds the best move found by a search along with its score and the statistics of
+    the search.
+    """
+    __slots__ = ('_move', '_score', '_depth', '_nodes', '_elapsed')
+
+    def __init__(self, move, score, depth, nodes, elapsed):
+        """
+        Initializes the result from the best move, its score, the deepest completed depth, the number of
+        positions searched and the seconds the search took.
+        """
+
+        self._move = move
+        self._score = score
+        self._depth = depth
+        self._nodes = nodes
+        self._elapsed = elapsed
+
+    def get_move(self):
+        """
+        Returns the best move as a (start, end, pieces) tuple, or a (None, position, 1) tuple for a reserve move.
+        Returns None if the player has no legal moves.
+        """
+
+        return self._move
+
+    def get_score(self):
+        """
+        Returns the score of the best move for the player that searched.
+        """
+
+        return self._score
+
+    def get_depth(self):
+        """
+        Returns the deepest search depth that was completed.
+        """
+
+        return self._depth
+
+    def get_nodes(self):
+        """
+        Returns the number of positions searched.
+        """
+
+        return self._nodes
+
+    def get_elapsed(self):
+        """
+        Returns the number of seconds the search took.
+        """
+
+        return self._elapsed
+
+    def get_nodes_per_second(self):
+        """
+        Returns the number of positions searched per second.
+        """
+
+        if self._elapsed <= 0:
+            return 0.0
+        return self._nodes / self._elapsed
+
+
+class SearchEngine:
+    """
+    The SearchEngine class finds moves for a FocusGame with a negamax alpha-beta search. The search deepens
+    one move at a time until the time budget runs out, and keeps the best move of the deepest finished depth.
+    Captures and moves that push a stack over 5 pieces are searched first. The search makes and takes back
+    moves on the game's own board with the Board move generator and apply_move, so it follows the same rules
+    as the moves made by players. Positions held by an endgame tablebase are scored from it without a search.
+    """
+    __slots__ = ('_time_limit', '_max_depth', '_table', '_nodes', '_deadline', '_stopped', '_capture_target',
+                 '_tablebase', '_cancel')
+
+    def __init__(self, time_limit=0.1, max_depth=32, table=None, tablebase=None):
+        """
+        Initializes the engine with the seconds it may spend on a move, the deepest depth it may search, the
+        transposition table it keeps between moves, and the Tablebase from domination_tablebase it looks
+        positions up in, if any.
+        """
+
+        self._time_limit = time_limit
+        self._max_depth = max_depth
+        self._table = table if table is not None else TranspositionTable()
+        self._nodes = 0
+        self._deadline = 0.0
+        self._stopped = False
+        self._capture_target = 6
+        self._tablebase = tablebase
+        self._cancel = None
+
+    def get_table(self):
+        """
+        Returns the transposition table of the engine.
+        """
+
+        return self._table
+
+    def stop(self):
+        """
+        Stops a running search. The search returns the best move of the deepest depth it finished. A stop that
+        comes before the search starts is forgotten, so other threads should stop a search with the cancel
+        argument of search instead.
+        """
+
+        self._stopped = True
+
+    def search(self, game, cancel=None):
+        """
+        Searches the game position for the player whose turn it is and returns a SearchResult. The board of
+        the game is the same after the search as before it. A search that is stopped before it finishes the
+        first depth returns the best move it searched so far, or the first move it would have searched, so the
+        result only has no move when the player has no legal moves. The search stops as stop does once the cancel
+        argument, a threading.Event or any object with an is_set method, is set, even if it was set before
+        the search started.
+        """
+
+        board = game.get_board()
+        players = game.get_players()
+        side = 0 if board.check_turn().lower() == players[0].get_player_name().lower() else 1
+        started = time.perf_counter()
+        self._nodes = 0
+        self._deadline = started + self._time_limit
+        self._cancel = cancel
+        self._stopped = cancel is not None and cancel.is_set()
+        self._capture_target = board.get_rules().get_capture_target()
+
+        # Searches one depth deeper each time until the time runs out or a win is found.
+        move, score, depth = None, 0, 0
+        for limit in range(1, self._max_depth + 1):
+            found, found_score = self.search_root(board, players, side, limit, move)
+            if self._stopped:
+                if move is None and found is not None:
+                    move, score = found, found_score
+                break
+            move, score, depth = found, found_score, limit
+            if move is None or abs(score) >= WIN_SCORE - self._max_depth:
+                break
+        if move is None:
+            moves = board.generate_moves(players[side])
+            if moves:
+                move = self.order_moves(board, players[side], moves, None)[0]
+        return SearchResult(move, score, depth, self._nodes, time.perf_counter() - started)
+
+    def play(self, game):
+        """
+        Searches the game position and makes the best move for the player whose turn it is. Returns the message
+        of the move, or None if the player has no legal moves.
+        """
+
+        move = self.search(game).get_move()
+        if move is None:
+            return None
+        return game.make_move(game.get_board().check_turn(), move)
+
+    def search_root(self, board, players, side, depth, first):
+        """
+        Searches every move of the position to the depth and returns the best move and its score. The first
+        move argument, the best move of the last depth, is searched before the others.
+        """
+
+        moves = self.order_moves(board, players[side], board.generate_moves(players[side]), first)
+        best, alpha = None, -WIN_SCORE - 1
+        for move in moves:
+            board.apply_move(players[side], move)
+            score = -self.negamax(board, players, 1 - side, depth - 1, -WIN_SCORE - 1, -alpha, 1)
+            board.undo_move()
+            if self._stopped:
+                return best, alpha
+            if score > alpha:
+                best, alpha = move, score
+        if best is not None:
+            self._table.store(board.get_hash(), depth, alpha, EXACT, best)
+        return best, alpha
+
+    def negamax(self, board, players, side, depth, alpha, beta, ply):
+        """
+        Returns the score of the position for the player to move, searched to the depth within the alpha-beta
+        window. Scores outside the window are only bounds.
+        """
+
+        self._nodes += 1
+        if self._nodes % CLOCK_INTERVAL == 0 and (time.perf_counter() > self._deadline or
+                                                  (self._cancel is not None and self._cancel.is_set())):
+            self._stopped = True
+        if self._stopped:
+            return 0
+
+        # The player who just moved has won, or the player to move has nothing left to move.
+        if players[1 - side].get_captures() >= self._capture_target:
+            return ply - WIN_SCORE
+
+        # Scores the position from the tablebase when it holds it, with wins that end sooner scoring higher.
+        if self._tablebase is not None:
+            found = self._tablebase.probe(board, players)
+            if found is not None:
+                outcome, distance = found
+                if outcome == WIN:
+                    return WIN_SCORE - ply - distance
+                return ply + distance - WIN_SCORE if outcome == LOSS else 0
+        if depth == 0:
+            return self.evaluate(board, players, side)
+
+        # Uses the stored result of the position when it was searched deep enough.
+        entry = self._table.probe(board.get_hash())
+        if entry is not None and entry[1] >= depth:
+            stored = from_table_score(entry[2], ply)
+            if entry[3] == EXACT or (entry[3] == LOWER_BOUND and stored >= beta) or \
+                    (entry[3] == UPPER_BOUND and stored <= alpha):
+                return stored
+        moves = board.generate_moves(players[side])
+        if not moves:
+            return ply - WIN_SCORE
+        first = entry[4] if entry is not None else None
+        return self.search_moves(board, players, side, depth, alpha, beta, ply, moves, first)
+
+    def search_moves(self, board, players, side, depth, alpha, beta, ply, moves, first):
+        """
+        Searches the moves of a position for negamax and stores the result in the transposition table.
+        """
+
+        start_alpha = alpha
+        best, best_score = None, -WIN_SCORE - 1
+        for move in self.order_moves(board, players[side], moves, first):
+            board.apply_move(players[side], move)
+            score = -self.negamax(board, players, 1 - side, depth - 1, -beta, -alpha, ply + 1)
+            board.undo_move()
+            if self._stopped:
+                return 0
+            if score > best_score:
+                best, best_score = move, score
+                alpha = max(alpha, score)
+                if alpha >= beta:
+                    break
+
+        # Records whether the score is exact or only a bound of the window.
+        bound = EXACT
+        if best_score <= start_alpha:
+            bound = UPPER_BOUND
+        elif best_score >= beta:
+            bound = LOWER_BOUND
+        self._table.store(board.get_hash(), depth, to_table_score(best_score, ply), bound, best)
+        return best_score
+
+    def order_moves(self, board, player, moves, first):
+        """
+        Returns the moves in the order to search them: the first move argument, then moves that capture the
+        most pieces, then moves that push the most pieces off the bottom of a stack, then the rest.
+        """
+
+        gains = {}
+        for move in moves:
+            reserves, captures = board.get_confiscations(player, move)
+            if reserves or captures:
+                gains[move] = captures * 8 + reserves
+        if first is not None:
+            gains[first] = 64
+        if not gains:
+            return moves
+        return sorted(moves, key=lambda move: -gains.get(move, 0))
+
+    def evaluate(self, board, players, side):
+        """
+        Returns the score of the position for the player to move from the captured pieces, reserve pieces and
+        controlled stacks of both players, read from the features the board keeps up to date.
+        """
+
+        features = board.features()
+        score = 0
+        for index in range(len(players)):
+            value = features.get_captures(index) * CAPTURE_WEIGHT + features.get_reserves(index) * RESERVE_WEIGHT
+            value += features.get_control(index) * CONTROL_WEIGHT
+            score += value if index == side else -value
+        return score
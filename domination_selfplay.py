@@ -0,0 +1,320 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program plays many Focus games between computer players on all of the computer's cores.
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import random
+import sys
+import time
+
+from domination_game import FocusGame
+from domination_mcts import MCTSEngine
+from domination_search import SearchEngine
+
+# The players of every self-play game. The first player moves first.
+PLAYER_TUPLES = (('Player1', 'R'), ('Player2', 'G'))
+
+
+class RandomPolicy:
+    """
+    The RandomPolicy class picks one of the legal moves at random.
+    """
+    __slots__ = ('_rng',)
+
+    def __init__(self, rng):
+        """
+        Initializes the policy with the random number generator it picks moves with.
+        """
+
+        self._rng = rng
+
+    def choose_move(self, game, name):
+        """
+        Returns a move for the named player, or None if the player has no legal moves.
+        """
+
+        moves = game.legal_moves(name)
+        if not moves:
+            return None
+        return self._rng.choice(moves)
+
+
+class GreedyPolicy:
+    """
+    The GreedyPolicy class picks the move that captures the most pieces, then the move that puts the most
+    pieces in the player's reserve. Ties are broken at random.
+    """
+    __slots__ = ('_rng',)
+
+    def __init__(self, rng):
+        """
+        Initializes the policy with the random number generator it breaks ties with.
+        """
+
+        self._rng = rng
+
+    def choose_move(self, game, name):
+        """
+        Returns a move for the named player, or None if the player has no legal moves.
+        """
+
+        moves = game.legal_moves(name)
+        if not moves:
+            return None
+        board = game.get_board()
+        player = game.get_player_from_name(name)
+        gains = [board.get_confiscations(player, move) for move in moves]
+        best = max((captures, reserves) for reserves, captures in gains)
+        return self._rng.choice([move for move, gain in zip(moves, gains) if (gain[1], gain[0]) == best])
+
+
+class SearchPolicy:
+    """
+    The SearchPolicy class picks the move found by a SearchEngine searched to a fixed depth. The depth is
+    fixed instead of the time so that games with the same seed play out the same way.
+    """
+    __slots__ = ('_engine',)
+
+    def __init__(self, rng, depth=2):
+        """
+        Initializes the policy with the depth to search. The random number generator is not used.
+        """
+
+        self._engine = SearchEngine(time_limit=float('inf'), max_depth=depth)
+
+    def choose_move(self, game, name):
+        """
+        Returns a move for the named player, or None if the player has no legal moves.
+        """
+
+        return self._engine.search(game).get_move()
+
+
+class MCTSPolicy:
+    """
+    The MCTSPolicy class picks the move found by an MCTSEngine with a fixed number of playouts, run in this
+    process and seeded from the game's random number generator so that games with the same seed play out the
+    same way. The engine's tree is kept from move to move.
+    """
+    __slots__ = ('_engine',)
+
+    def __init__(self, rng, playouts=200):
+        """
+        Initializes the policy with the number of playouts per move.
+        """
+
+        self._engine = MCTSEngine(playouts, seed=rng.getrandbits(32))
+
+    def choose_move(self, game, name):
+        """
+        Returns a move for the named player, or None if the player has no legal moves.
+        """
+
+        return self._engine.search(game).get_move()
+
+
+# The policies that can be chosen by name.
+POLICIES = {
+    'random': RandomPolicy,
+    'greedy': GreedyPolicy,
+    'search': SearchPolicy,
+    'mcts': MCTSPolicy,
+}
+
+
+class GameSummary:
+    """
+    The GameSummary class holds the result of one self-play game: the index of the game, the index of the
+    winning player (or None for a game that reached the move limit), the number of moves made, and the
+    captured and reserve pieces of each player at the end of the game.
+    """
+    __slots__ = ('_index', '_winner', '_moves', '_captures', '_reserves')
+
+    def __init__(self, index, winner, moves, captures, reserves):
+        """
+        Initializes the summary of a game.
+        """
+
+        self._index = index
+        self._winner = winner
+        self._moves = moves
+        self._captures = captures
+        self._reserves = reserves
+
+    def get_index(self):
+        """
+        Returns the index of the game.
+        """
+
+        return self._index
+
+    def get_winner(self):
+        """
+        Returns 0 if the first player won, 1 if the second player won, or None if nobody won.
+        """
+
+        return self._winner
+
+    def get_moves(self):
+        """
+        Returns the number of moves made in the game.
+        """
+
+        return self._moves
+
+    def get_captures(self):
+        """
+        Returns a tuple with the number of pieces each player captured.
+        """
+
+        return self._captures
+
+    def get_reserves(self):
+        """
+        Returns a tuple with the number of pieces each player held in reserve at the end of the game.
+        """
+
+        return self._reserves
+
+    def to_dict(self):
+        """
+        Returns the summary as a dictionary that can be written as JSON.
+        """
+
+        return {'index': self._index, 'winner': self._winner, 'moves': self._moves,
+                'captures': list(self._captures), 'reserves': list(self._reserves)}
+
+
+def make_policy(name, rng):
+    """
+    Returns a new policy of the named kind that uses the random number generator.
+    """
+
+    if name not in POLICIES:
+        raise ValueError('unknown policy: ' + name)
+    return POLICIES[name](rng)
+
+
+def game_seed(seed, index):
+    """
+    Returns the random number generator for a game, which only depends on the run's seed and the game index.
+    """
+
+    return random.Random('%d:%d' % (seed, index))
+
+
+def play_game(index, policy_names, seed=0, max_moves=500, players=PLAYER_TUPLES, recorder=None):
+    """
+    Plays one game between the two named policies and returns its GameSummary. A player that has no legal
+    moves loses the game. If a recorder is given, its record method is called with the game, the index of the
+    player to move and the number of moves made before every move.
+    """
+
+    rng = game_seed(seed, index)
+    policies = [make_policy(name, rng) for name in policy_names]
+    game = FocusGame(*players)
+    names = [player[0].lower() for player in players]
+    winner = None
+    moves = 0
+    while moves < max_moves:
+        name = game.get_board().check_turn()
+        side = names.index(name.lower())
+        move = policies[side].choose_move(game, name)
+        if move is None:
+            winner = 1 - side
+            break
+        if recorder is not None:
+            recorder.record(game, side, moves)
+        moves += 1
+        if game.make_move(name, move).endswith('wins!'):
+            winner = side
+            break
+    return summarize(game, index, winner, moves)
+
+
+def summarize(game, index, winner, moves):
+    """
+    Returns the GameSummary of a finished game.
+    """
+
+    players = game.get_players()
+    captures = tuple(player.get_captures() for player in players)
+    reserves = tuple(player.get_reserves() for player in players)
+    return GameSummary(index, winner, moves, captures, reserves)
+
+
+def play_games(first, last, policy_names, seed, max_moves):
+    """
+    Plays the games with indexes from first up to last and returns a list of their summaries. This is the
+    unit of work sent to a worker process.
+    """
+
+    return [play_game(index, policy_names, seed, max_moves) for index in range(first, last)]
+
+
+def run_selfplay(games, policy_names=('random', 'random'), seed=0, workers=None, max_moves=500, batch=64):
+    """
+    Plays the number of games between the two named policies and yields their summaries in game order as
+    they finish. The games are split into batches that run across a pool of worker processes, one per core
+    unless the number of workers is given, with only a few batches per worker waiting at a time. With one
+    worker the games are played in this process.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        for first in range(0, games, batch):
+            yield from play_games(first, min(first + batch, games), policy_names, seed, max_moves)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for first in range(0, games, batch):
+            pending.append(executor.submit(play_games, first, min(first + batch, games), policy_names, seed,
+                                           max_moves))
+            if len(pending) >= workers * 4:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv=None):
+    """
+    Runs self-play games from the command line and prints the totals. Each game summary can also be written
+    as a line of JSON.
+    """
+
+    parser = argparse.ArgumentParser(description='Plays Focus games between computer players.')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--players', nargs=2, default=['random', 'random'], choices=sorted(POLICIES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-moves', type=int, default=500)
+    parser.add_argument('--output', help='file to write one JSON summary per game to')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    wins = [0, 0, 0]
+    total_moves = 0
+    output = open(args.output, 'w') if args.output else None
+    for summary in run_selfplay(args.games, args.players, args.seed, args.workers, args.max_moves):
+        wins[2 if summary.get_winner() is None else summary.get_winner()] += 1
+        total_moves += summary.get_moves()
+        if output:
+            output.write(json.dumps(summary.to_dict()) + '\n')
+    if output:
+        output.close()
+
+    elapsed = time.perf_counter() - started
+    print('games: %d  %s wins: %d  %s wins: %d  unfinished: %d' % (args.games, args.players[0], wins[0],
+                                                                 args.players[1], wins[1], wins[2]))
+    print('average moves: %.1f  games/sec: %.1f' % (total_moves / max(args.games, 1), args.games / elapsed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,336 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program hosts many Focus games at once for clients that connect over a socket.
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import secrets
+import sys
+
+from domination_game import FocusGame
+from domination_sessions import SessionError, SessionStore, check_players
+
+# The longest request line a client may send, in bytes.
+LINE_LIMIT = 64 * 1024
+
+
+class ServerError(Exception):
+    """
+    This error is raised for requests the server cannot carry out, such as requests for unknown sessions.
+    """
+    pass
+
+
+class Session:
+    """
+    The Session class holds one hosted FocusGame along with the lock that makes requests to the game run one
+    at a time and the time the game was last used. A server with a SessionStore keeps the game in the store
+    and the session holds None in its place.
+    """
+    __slots__ = ('_game', '_lock', '_last_used')
+
+    def __init__(self, game, now):
+        """
+        Initializes the session for the game at the time given.
+        """
+
+        self._game = game
+        self._lock = asyncio.Lock()
+        self._last_used = now
+
+    def get_game(self):
+        """
+        Returns the FocusGame of the session, or None if the game is kept in a SessionStore.
+        """
+
+        return self._game
+
+    def get_lock(self):
+        """
+        Returns the lock of the session.
+        """
+
+        return self._lock
+
+    def get_last_used(self):
+        """
+        Returns the time the session was last used.
+        """
+
+        return self._last_used
+
+    def touch(self, now):
+        """
+        Records that the session was used at the time given.
+        """
+
+        self._last_used = now
+
+
+class GameServer:
+    """
+    The GameServer class hosts FocusGame sessions over a line protocol. Every request is one line of JSON with
+    an "op" field and every response is one line of JSON with an "ok" field, sent in the order the requests
+    came in. A connection's requests are read one at a time and the next one is only read after the last
+    response was taken by the client, so a slow client cannot make the server buffer without limit. Sessions
+    that are not used for the idle timeout are removed.
+
+    The games can be kept in a SessionStore from domination_sessions instead of in the sessions, in which case
+    only the recently used games stay in memory and the others are parked on disk until their next request.
+    The store and its games are only used on one thread of the server's own, so reading and writing the disk
+    does not hold up the event loop.
+    """
+    __slots__ = ('_sessions', '_max_sessions', '_idle_timeout', '_handlers', '_store', '_executor')
+
+    def __init__(self, max_sessions=10000, idle_timeout=600.0, store=None):
+        """
+        Initializes a server with no sessions that hosts up to the given number of sessions and removes
+        sessions idle for longer than the timeout in seconds. The games are kept in the SessionStore if one is
+        given.
+        """
+
+        self._sessions = {}
+        self._max_sessions = max_sessions
+        self._idle_timeout = idle_timeout
+        self._store = store
+        self._executor = None
+        if store is not None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='store')
+        self._handlers = {
+            'new': self.op_new,
+            'close': self.op_close,
+            'move_piece': self.op_move_piece,
+            'reserved_move': self.op_reserved_move,
+            'show_pieces': self.op_show_pieces,
+            'show_reserve': self.op_show_reserve,
+            'show_captured': self.op_show_captured,
+        }
+
+    def get_session_count(self):
+        """
+        Returns the number of sessions being hosted.
+        """
+
+        return len(self._sessions)
+
+    async def call_store(self, function, *args):
+        """
+        Calls the function with the arguments on the store's thread and returns its result.
+        """
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def op_new(self, request):
+        """
+        Starts a session for the two [name, color] players of the request and returns its id.
+        """
+
+        if len(self._sessions) >= self._max_sessions:
+            raise ServerError('too many sessions')
+        first, second = request['players']
+        try:
+            check_players((tuple(first), tuple(second)))
+        except SessionError as error:
+            raise ServerError(str(error))
+        session_id = secrets.token_hex(8)
+        game = FocusGame(tuple(first), tuple(second))
+        if self._store is None:
+            self._sessions[session_id] = Session(game, self.now())
+            return session_id
+
+        # The session takes its place before the store is waited for, so new sessions started meanwhile are
+        # counted against max_sessions, and gives it back if the game cannot be stored.
+        self._sessions[session_id] = Session(None, self.now())
+        try:
+            await self.call_store(self._store.put, session_id, game)
+        except BaseException:
+            del self._sessions[session_id]
+            raise
+        return session_id
+
+    async def op_close(self, request):
+        """
+        Ends the session of the request.
+        """
+
+        if self._sessions.pop(request['session'], None) is not None and self._store is not None:
+            await self.call_store(self._store.remove, request['session'])
+        return True
+
+    def op_move_piece(self, request, game):
+        """
+        Calls move_piece on the session's game.
+        """
+
+        return game.move_piece(request['name'], tuple(request['start']), tuple(request['end']), request['pieces'])
+
+    def op_reserved_move(self, request, game):
+        """
+        Calls reserved_move on the session's game.
+        """
+
+        return game.reserved_move(request['name'], tuple(request['position']))
+
+    def op_show_pieces(self, request, game):
+        """
+        Calls show_pieces on the session's game.
+        """
+
+        return game.show_pieces(tuple(request['position']))
+
+    def op_show_reserve(self, request, game):
+        """
+        Calls show_reserve on the session's game.
+        """
+
+        return game.show_reserve(request['name'])
+
+    def op_show_captured(self, request, game):
+        """
+        Calls show_captured on the session's game.
+        """
+
+        return game.show_captured(request['name'])
+
+    async def handle_request(self, request):
+        """
+        Carries out one decoded request and returns the result. Requests for a game hold the session's lock,
+        and run on the store's thread if the server has a store.
+        """
+
+        if not isinstance(request, dict):
+            raise ServerError('request must be an object')
+        op = request.get('op')
+        if op not in self._handlers:
+            raise ServerError('unknown op')
+        if op in ('new', 'close'):
+            return await self._handlers[op](request)
+        session = self._sessions.get(request.get('session'))
+        if session is None:
+            raise ServerError('unknown session')
+        async with session.get_lock():
+            session.touch(self.now())
+            if self._store is None:
+                return self._handlers[op](request, session.get_game())
+            return await self.call_store(self.handle_stored, op, request)
+
+    def handle_stored(self, op, request):
+        """
+        Carries out a request for a game kept in the store. This runs on the store's thread.
+        """
+
+        game = self._store.get(request['session'])
+        if game is None:
+            raise ServerError('unknown session')
+        return self._handlers[op](request, game)
+
+    async def respond(self, line):
+        """
+        Returns the response line for a request line. Errors from the game are sent back with the name of the
+        error and its message.
+        """
+
+        request = {}
+        try:
+            request = json.loads(line)
+            response = {'ok': True, 'result': await self.handle_request(request)}
+        except Exception as error:
+            response = {'ok': False, 'error': type(error).__name__, 'message': str(error)}
+        if isinstance(request, dict) and 'id' in request:
+            response['id'] = request['id']
+        return (json.dumps(response) + '\n').encode('utf-8')
+
+    async def handle_connection(self, reader, writer):
+        """
+        Answers the requests of one client connection until it closes.
+        """
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(b'{"ok": false, "error": "ServerError", "message": "request too long"}\n')
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    writer.write(await self.respond(line))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def evict_idle(self):
+        """
+        Removes the sessions that have not been used for the idle timeout, checking a few times per timeout.
+        """
+
+        while True:
+            await asyncio.sleep(self._idle_timeout / 4)
+            cutoff = self.now() - self._idle_timeout
+            for session_id, session in list(self._sessions.items()):
+                if session.get_last_used() < cutoff and not session.get_lock().locked():
+                    del self._sessions[session_id]
+                    if self._store is not None:
+                        await self.call_store(self._store.remove, session_id)
+
+    def now(self):
+        """
+        Returns the time of the running event loop.
+        """
+
+        return asyncio.get_running_loop().time()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        """
+        Serves clients on the host and port until cancelled.
+        """
+
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=LINE_LIMIT)
+        evictor = asyncio.create_task(self.evict_idle())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+
+    def close(self):
+        """
+        Waits for the store's thread to finish its work and closes the store, if the server has one.
+        """
+
+        if self._store is not None:
+            self._executor.shutdown()
+            self._store.close()
+
+
+def main(argv=None):
+    """
+    Runs the game server from the command line.
+    """
+
+    parser = argparse.ArgumentParser(description='Hosts Focus games over a JSON line protocol.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-sessions', type=int, default=10000)
+    parser.add_argument('--idle-timeout', type=float, default=600.0)
+    parser.add_argument('--store', help='SQLite file to park the games that are not used recently in')
+    parser.add_argument('--memory-games', type=int, default=1000, help='games kept in memory with --store')
+    args = parser.parse_args(argv)
+    store = SessionStore(args.store, args.memory_games) if args.store else None
+    server = GameServer(args.max_sessions, args.idle_timeout, store)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,476 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program keeps many unfinished Focus games by session id, holding the recently used games in
+# memory and parking the others in a SQLite file in a compact form until they are used again.
+
+import argparse
+import array
+import collections
+import os
+import random
+import sqlite3
+import struct
+import sys
+import time
+import tracemalloc
+
+from domination_game import DEFAULT_RULES, FocusGame, Rules
+from domination_records import LAYOUT_EMPTY, RULES_RECORD, TEXT_LENGTH, encode_rules
+
+# Every parked game starts with the magic bytes, the format version and a flags byte. Games played with other
+# rules than the default rules set FLAG_RULES and hold their rules after the header, as in domination_records.
+MAGIC = b'FCSS'
+VERSION = 1
+SESSION_HEADER = struct.Struct('<4sBB')
+FLAG_RULES = 1
+
+# After the players come the reserves and captures of both players, the index of the player who moved last
+# (-1 before the first move) and the number of moves that can be taken back, then the board bytes in
+# little-endian order and one history record per move in the form of Board.get_history.
+STATE_RECORD = struct.Struct('<HHHHbI')
+HISTORY_RECORD = struct.Struct('<BhHBHHHHbQ')
+
+# The most bytes a player name or color may take in UTF-8, since its length is written in one byte.
+TEXT_LIMIT = 255
+
+# The number of games a store keeps in memory unless it is given a capacity.
+CAPACITY = 1000
+
+# The number of games parked between commits of the SQLite file.
+COMMIT_INTERVAL = 256
+
+
+class SessionError(Exception):
+    """
+    This error is raised when a parked game cannot be read, such as a game written by a newer version, or a
+    game cannot be parked, such as a game with a player name too long to write.
+    """
+    pass
+
+
+def swap_codes(rules, codes):
+    """
+    Returns the board bytes of a game with the rules in little-endian order from machine order, or the other
+    way round. Only boards with two bytes per square are changed, and only on big-endian machines.
+    """
+
+    if rules.get_typecode() == 'B' or sys.byteorder == 'little':
+        return codes
+    squares = array.array(rules.get_typecode(), codes)
+    squares.byteswap()
+    return squares.tobytes()
+
+
+def check_players(players):
+    """
+    Raises a SessionError if a name or color of the (name, color) player tuples is too long to be parked.
+    """
+
+    for name, color in players:
+        for text in (name, color):
+            if len(text.encode('utf-8')) > TEXT_LIMIT:
+                raise SessionError('player names and colors may take at most %d bytes' % TEXT_LIMIT)
+
+
+def encode_game(game):
+    """
+    Returns the parked form of the game: its rules, players, position and the moves that can be taken back.
+    The game's event feed is not kept. Raises a SessionError if the game cannot be written in this form.
+    """
+
+    check_players((player.get_player_name(), player.get_player_color()) for player in game.get_players())
+    rules = game.get_rules()
+    board = game.get_board()
+    history = board.get_history()
+    if rules == DEFAULT_RULES:
+        parts = [SESSION_HEADER.pack(MAGIC, VERSION, 0)]
+    else:
+        parts = [SESSION_HEADER.pack(MAGIC, VERSION, FLAG_RULES), encode_rules(rules)]
+    for player in game.get_players():
+        for text in (player.get_player_name().encode('utf-8'), player.get_player_color().encode('utf-8')):
+            parts.append(TEXT_LENGTH.pack(len(text)) + text)
+    (reserves1, captures1), (reserves2, captures2) = game.get_holdings()
+    try:
+        parts.append(STATE_RECORD.pack(reserves1, captures1, reserves2, captures2, board.get_last_index(),
+                                       len(history)))
+        parts.append(swap_codes(rules, board.get_codes()))
+        parts.extend(HISTORY_RECORD.pack(*entry) for entry in history)
+    except struct.error as error:
+        raise SessionError('the game cannot be parked: %s' % error)
+    return b''.join(parts)
+
+
+def decode_game(data, rules_cache=None):
+    """
+    Returns a new FocusGame from its parked form. Games with the same rules settings share the Rules instance
+    kept for them in the rules_cache dictionary, if one is given, so the tables of the rules are only built
+    once. Raises a SessionError if the data is not a parked game of a version this program reads.
+    """
+
+    try:
+        magic, version, flags = SESSION_HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise SessionError('not a parked game of version %d' % VERSION)
+        offset = SESSION_HEADER.size
+        rules = DEFAULT_RULES
+        if flags & FLAG_RULES:
+            size, max_stack, capture_target, length = RULES_RECORD.unpack_from(data, offset)
+            offset += RULES_RECORD.size
+            layout = tuple(None if owner == LAYOUT_EMPTY else owner for owner in data[offset:offset + length])
+            offset += length
+            rules = get_rules((size, max_stack, capture_target, layout), rules_cache)
+        texts = []
+        for index in range(4):
+            length = data[offset]
+            texts.append(bytes(data[offset + 1:offset + 1 + length]).decode('utf-8'))
+            offset += 1 + length
+        reserves1, captures1, reserves2, captures2, last_index, count = STATE_RECORD.unpack_from(data, offset)
+        offset += STATE_RECORD.size
+        length = rules.get_square_count() * (1 if rules.get_typecode() == 'B' else 2)
+        codes = swap_codes(rules, bytes(data[offset:offset + length]))
+        offset += length
+        history = list(HISTORY_RECORD.iter_unpack(data[offset:offset + count * HISTORY_RECORD.size]))
+        if len(history) != count:
+            raise ValueError('the history is cut short')
+    except (struct.error, IndexError, UnicodeDecodeError, ValueError) as error:
+        raise SessionError('invalid parked game: %s' % error)
+
+    game = FocusGame((texts[0], texts[1]), (texts[2], texts[3]), rules)
+    players = game.get_players()
+    players[0].restore_holdings(reserves1, captures1)
+    players[1].restore_holdings(reserves2, captures2)
+    board = game.get_board()
+    try:
+        board.set_codes(codes, '' if last_index < 0 else players[last_index].get_player_name(), players)
+    except ValueError as error:
+        raise SessionError('invalid parked game: %s' % error)
+    board.set_history(history)
+    return game
+
+
+def get_rules(settings, rules_cache):
+    """
+    Returns the Rules instance with the settings, from the rules_cache dictionary if it holds one. Raises a
+    ValueError for settings that cannot be played.
+    """
+
+    if rules_cache is None:
+        return Rules(*settings)
+    if settings not in rules_cache:
+        rules_cache[settings] = Rules(*settings)
+    return rules_cache[settings]
+
+
+class SessionStore:
+    """
+    The SessionStore class holds FocusGames by session id. Up to its capacity of the most recently used games
+    are kept in memory as they are, and the least recently used game is parked in a SQLite file in its encoded
+    form whenever the capacity is passed. A parked game costs no memory and is decoded again the next time it
+    is asked for, so the games of the store can be used as if they were all in memory.
+
+    A game that was parked and decoded again is a new FocusGame, so callers should ask the store for a game
+    each time they use it instead of holding on to it. Games with an event feed or a worker listening to them
+    should not be put in a store, since the feed is not parked with the game. A store may be used from any
+    thread, but only from one thread at a time.
+
+    The row of a parked game is kept when the game is decoded again, until the game is parked again or removed,
+    so the SQLite file always holds the last parked position of a game that is back in memory.
+    """
+    __slots__ = ('_path', '_connection', '_capacity', '_games', '_rules', '_writes', '_parked', '_restored',
+                 '_backed')
+
+    def __init__(self, path, capacity=CAPACITY):
+        """
+        Initializes a store that parks games in the SQLite file at the path, which is created if it does not
+        exist, and keeps up to the capacity of games in memory. The games parked in the file by an earlier
+        store can be asked for by their session ids.
+        """
+
+        self._path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data BLOB NOT NULL)')
+        self._connection.commit()
+        self._capacity = capacity
+        self._games = collections.OrderedDict()
+        self._rules = {DEFAULT_RULES.get_settings(): DEFAULT_RULES}
+        self._writes = 0
+        self._parked = 0
+        self._restored = 0
+
+        # The session ids of the games in memory that still have a row in the SQLite file.
+        self._backed = set()
+
+    def get_path(self):
+        """
+        Returns the path of the SQLite file of the store.
+        """
+
+        return self._path
+
+    def get_capacity(self):
+        """
+        Returns the number of games the store keeps in memory.
+        """
+
+        return self._capacity
+
+    def get_memory_count(self):
+        """
+        Returns the number of games in memory.
+        """
+
+        return len(self._games)
+
+    def get_parked_count(self):
+        """
+        Returns the number of games parked in the SQLite file and not in memory.
+        """
+
+        return self._connection.execute('SELECT COUNT(*) FROM sessions').fetchone()[0] - len(self._backed)
+
+    def get_session_count(self):
+        """
+        Returns the number of games in the store.
+        """
+
+        return len(self._games) + self.get_parked_count()
+
+    def get_counts(self):
+        """
+        Returns the number of games parked and the number of parked games decoded again since the store was
+        opened.
+        """
+
+        return self._parked, self._restored
+
+    def __contains__(self, session_id):
+        """
+        Returns True if the store holds a game for the session id.
+        """
+
+        return session_id in self._games or self._connection.execute(
+            'SELECT 1 FROM sessions WHERE id = ?', (session_id,)).fetchone() is not None
+
+    def put(self, session_id, game):
+        """
+        Adds the game to the store as the most recently used game, in place of any game the session id had.
+        Raises a SessionError, and adds nothing, if the game's players could not be parked.
+        """
+
+        check_players((player.get_player_name(), player.get_player_color()) for player in game.get_players())
+        if session_id not in self._games or session_id in self._backed:
+            self._connection.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+            self._backed.discard(session_id)
+        self._games[session_id] = game
+        self._games.move_to_end(session_id)
+        self.evict()
+
+    def get(self, session_id):
+        """
+        Returns the game of the session id, decoding it if it was parked, and makes it the most recently used
+        game. Returns None if the store holds no game for the session id. The row of a decoded game is kept
+        until the game is parked again.
+        """
+
+        game = self._games.get(session_id)
+        if game is not None:
+            self._games.move_to_end(session_id)
+            return game
+        row = self._connection.execute('SELECT data FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        if row is None:
+            return None
+        game = decode_game(row[0], self._rules)
+        self._restored += 1
+        self._backed.add(session_id)
+        self._games[session_id] = game
+        self.evict()
+        return game
+
+    def remove(self, session_id):
+        """
+        Removes the game of the session id from the store.
+        """
+
+        if self._games.pop(session_id, None) is None or session_id in self._backed:
+            self._connection.execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+            self._backed.discard(session_id)
+
+    def park(self, session_id):
+        """
+        Moves the game of the session id from memory to the SQLite file. Nothing is done if it is not in memory.
+        """
+
+        game = self._games.get(session_id)
+        if game is not None:
+            self.write(session_id, game)
+            del self._games[session_id]
+
+    def evict(self):
+        """
+        Parks the least recently used games until the games in memory fit the capacity. A game is only taken
+        out of memory once it is written, so a game that cannot be parked is kept.
+        """
+
+        while len(self._games) > self._capacity:
+            session_id, game = next(iter(self._games.items()))
+            self.write(session_id, game)
+            del self._games[session_id]
+
+    def write(self, session_id, game):
+        """
+        Writes the encoded game to the SQLite file, committing after every COMMIT_INTERVAL games.
+        """
+
+        self._connection.execute('INSERT OR REPLACE INTO sessions (id, data) VALUES (?, ?)',
+                                 (session_id, encode_game(game)))
+        self._backed.discard(session_id)
+        self._parked += 1
+        self._writes += 1
+        if self._writes >= COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        """
+        Commits the changes to the SQLite file.
+        """
+
+        self._connection.commit()
+        self._writes = 0
+
+    def flush(self):
+        """
+        Parks every game in memory and commits, so the SQLite file holds every game of the store.
+        """
+
+        while self._games:
+            session_id, game = next(iter(self._games.items()))
+            self.write(session_id, game)
+            del self._games[session_id]
+        self.commit()
+
+    def close(self):
+        """
+        Parks every game in memory and closes the SQLite file.
+        """
+
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self):
+        """
+        Returns the store for use in a with statement.
+        """
+
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Closes the store at the end of a with statement.
+        """
+
+        self.close()
+
+
+def make_games(count, moves, seed=1, rules=None):
+    """
+    Returns a list of games with the rules, or the default rules, each played for up to the given number of
+    random legal moves.
+    """
+
+    rng = random.Random(seed)
+    games = []
+    for index in range(count):
+        game = FocusGame(('Player%d' % (2 * index), 'R'), ('Player%d' % (2 * index + 1), 'G'), rules)
+        for ply in range(moves):
+            name = game.get_board().check_turn()
+            legal = game.legal_moves(name)
+            if not legal:
+                break
+            game.make_move(name, rng.choice(legal))
+        games.append(game)
+    return games
+
+
+def measure_store(path, count=10000, moves=20, capacity=100):
+    """
+    Measures the store with the given number of games of up to the given number of moves, and returns a
+    dictionary of the games encoded and decoded per second, the games parked and restored per second by a
+    store of the capacity at the path, and the bytes per game encoded, in memory, in memory once parked and
+    on disk. Every game restored from the store parks the least recently used game in its place.
+    """
+
+    games = make_games(count, moves)
+    results = {}
+
+    started = time.perf_counter()
+    encoded = [encode_game(game) for game in games]
+    results['encode_per_sec'] = count / (time.perf_counter() - started)
+    rules_cache = {}
+    started = time.perf_counter()
+    for data in encoded:
+        decode_game(data, rules_cache)
+    results['decode_per_sec'] = count / (time.perf_counter() - started)
+    results['encoded_bytes'] = sum(len(data) for data in encoded) / count
+    del games
+
+    # The memory of the parked games is measured once every game is parked and the games are dropped, so it
+    # is what the store holds for them. The page cache of SQLite is not counted.
+    tracemalloc.start()
+    try:
+        start_memory = tracemalloc.get_traced_memory()[0]
+        games = [decode_game(data, rules_cache) for data in encoded]
+        results['memory_bytes'] = (tracemalloc.get_traced_memory()[0] - start_memory) / count
+        store = SessionStore(path, capacity)
+        started = time.perf_counter()
+        for index in range(count):
+            store.put('session%d' % index, games[index])
+        store.flush()
+        results['park_per_sec'] = count / (time.perf_counter() - started)
+        games = None
+        results['parked_bytes'] = (tracemalloc.get_traced_memory()[0] - start_memory) / count
+    finally:
+        tracemalloc.stop()
+
+    rng = random.Random(2)
+    started = time.perf_counter()
+    for index in range(count):
+        store.get('session%d' % rng.randrange(count))
+    results['restore_per_sec'] = count / (time.perf_counter() - started)
+    store.close()
+    results['disk_bytes'] = os.path.getsize(path) / count
+    return results
+
+
+def main(argv=None):
+    """
+    Measures a store from the command line with games parked in a temporary SQLite file, or opens a store
+    file and prints the number of games it holds.
+    """
+
+    parser = argparse.ArgumentParser(description='Keeps unfinished Focus games in memory and in a SQLite file.')
+    parser.add_argument('path', help='SQLite file of the store')
+    parser.add_argument('--measure', action='store_true', help='measure the store with new games')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--moves', type=int, default=20, help='random moves made in every game measured')
+    parser.add_argument('--capacity', type=int, default=100, help='games kept in memory')
+    args = parser.parse_args(argv)
+
+    if not args.measure:
+        with SessionStore(args.path, args.capacity) as store:
+            print('sessions: %d' % store.get_session_count())
+        return 0
+    if os.path.exists(args.path):
+        print('%s already exists' % args.path)
+        return 1
+    results = measure_store(args.path, args.games, args.moves, args.capacity)
+    for name in ('encode_per_sec', 'decode_per_sec', 'park_per_sec', 'restore_per_sec'):
+        print('%-16s %12.1f games/sec' % (name, results[name]))
+    for name in ('encoded_bytes', 'memory_bytes', 'parked_bytes', 'disk_bytes'):
+        print('%-16s %12.1f bytes/game' % (name, results[name]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,575 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program solves every Focus position with a few pieces left in play by retrograde analysis,
+# and stores whether each one is won, lost or drawn, and in how many moves, in an endgame tablebase file.
+
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import mmap
+import os
+import struct
+import sys
+import time
+
+from domination_game import HEIGHT_BITS, FocusGame, Rules
+
+# The first bytes and the format version of a tablebase file.
+MAGIC = b'FCTB'
+VERSION = 1
+
+# The header of a tablebase file: the magic bytes, the version, the board size, the stack limit, the most
+# pieces in play, the capture target, the number of slots and positions, the number of passes done, and
+# whether the tablebase is complete. The slots start at HEADER_SIZE.
+HEADER = struct.Struct('<4sBBBBHQQIB')
+HEADER_SIZE = 64
+
+# A slot of the tablebase: the 64-bit key of a position and its value. The low 2 bits of the value are the
+# outcome and the other bits are the distance, the number of moves to the end of the game.
+ENTRY = struct.Struct('<QH')
+OUTCOME_BITS = 2
+OUTCOME_MASK = 3
+MAX_DISTANCE = (1 << 16 - OUTCOME_BITS) - 1
+
+# The outcomes of a position for the player to move. A slot holds EMPTY when no position uses it, and a
+# position is UNKNOWN until it is solved. The positions that are still unknown when the tablebase is complete
+# are drawn, because neither player can force the end of the game from them.
+EMPTY = 0
+UNKNOWN = DRAW = 1
+WIN = 2
+LOSS = 3
+
+# The reserves, captures and side to move of a position in the positions file, after its board bytes.
+POSITION_STATE = struct.Struct('<HHHHB')
+
+# The players of the games that solve the positions.
+PLAYER_TUPLES = (('Player1', 'R'), ('Player2', 'G'))
+
+# The game of each set of rules in a worker process, kept between the ranges the worker solves.
+WORKER_GAMES = {}
+
+
+def get_capture_floor(rules, pieces):
+    """
+    Returns the lowest capture count that the tablebase for the rules and most pieces in play tells apart.
+    A player with fewer captures can never reach the capture target, because there are not enough pieces
+    in play to capture, so every lower count plays the same as this one.
+    """
+
+    if pieces <= rules.get_max_stack():
+        return rules.get_capture_target() - 1
+    return max(0, rules.get_capture_target() - pieces)
+
+
+def position_key(zobrist, squares, holdings, side, floor):
+    """
+    Returns the key of a position in the tablebase from the Zobrist keys of its rules, its square codes, the
+    (reserves, captures) holdings of both players and the index of the player to move. The key is the
+    Zobrist hash of the position with the captures below the floor raised to it.
+    """
+
+    square_keys, reserve_keys, capture_keys, side_key = zobrist
+    value = side_key if side else 0
+    for index, code in enumerate(squares):
+        value ^= square_keys[index][code]
+    for index, (reserves, captures) in enumerate(holdings):
+        value ^= reserve_keys[index][reserves] ^ capture_keys[index][max(captures, floor)]
+    return value
+
+
+def board_key(board, players, zobrist, floor):
+    """
+    Returns the key of the board position in the tablebase from its Zobrist hash, which the board keeps up
+    to date, by swapping the keys of the capture counts below the floor for the keys of the floor.
+    """
+
+    capture_keys = zobrist[2]
+    value = board.get_hash()
+    for index, player in enumerate(players):
+        captures = player.get_captures()
+        if captures < floor:
+            value ^= capture_keys[index][captures] ^ capture_keys[index][floor]
+    return value
+
+
+def iter_stacks(pieces, max_stack):
+    """
+    Yields every stack code holding up to the number of pieces, as (height, code) pairs.
+    """
+
+    for height in range(1, min(pieces, max_stack) + 1):
+        for owners in range(1 << height):
+            yield height, height | owners << HEIGHT_BITS
+
+
+def iter_boards(squares, pieces, max_stack, first=0):
+    """
+    Yields every board from the square index first onwards with up to the number of pieces on it, as
+    (pieces used, {index: code}) pairs.
+    """
+
+    yield 0, {}
+    for index in range(first, squares):
+        for height, code in iter_stacks(pieces, max_stack):
+            for used, stacks in iter_boards(squares, pieces - height, max_stack, index + 1):
+                stacks = dict(stacks)
+                stacks[index] = code
+                yield used + height, stacks
+
+
+def iter_positions(rules, pieces):
+    """
+    Yields every position with up to the number of pieces in play, on the board and in reserve, as (codes,
+    holdings, side) tuples. The captures of each player run from the capture floor up to one below the
+    capture target, since a position where a player has reached it is already over.
+    """
+
+    floor = get_capture_floor(rules, pieces)
+    captures = range(floor, rules.get_capture_target())
+    for used, stacks in iter_boards(rules.get_square_count(), pieces, rules.get_max_stack()):
+        codes = rules.make_squares()
+        for index, code in stacks.items():
+            codes[index] = code
+        codes = bytes(codes)
+        for reserves0 in range(pieces - used + 1):
+            for reserves1 in range(pieces - used - reserves0 + 1):
+                for captures0, captures1 in itertools.product(captures, captures):
+                    for side in (0, 1):
+                        yield codes, ((reserves0, captures0), (reserves1, captures1)), side
+
+
+def write_positions(path, rules, pieces):
+    """
+    Writes every position with up to the number of pieces in play to the positions file at the path and
+    returns the number of positions. The file is written under another name and renamed when it is done,
+    so a positions file is always complete.
+    """
+
+    count = 0
+    with open(path + '.tmp', 'wb') as output:
+        for codes, ((reserves0, captures0), (reserves1, captures1)), side in iter_positions(rules, pieces):
+            output.write(codes + POSITION_STATE.pack(reserves0, captures0, reserves1, captures1, side))
+            count += 1
+    os.replace(path + '.tmp', path)
+    return count
+
+
+def read_position(data, index, size):
+    """
+    Returns the position with the index from the positions file data as a (codes, holdings, side) tuple. The
+    size is the number of bytes of the board codes.
+    """
+
+    offset = index * (size + POSITION_STATE.size)
+    reserves0, captures0, reserves1, captures1, side = POSITION_STATE.unpack_from(data, offset + size)
+    return data[offset:offset + size], ((reserves0, captures0), (reserves1, captures1)), side
+
+
+def get_codes_size(rules):
+    """
+    Returns the number of bytes of the board codes of a position for the rules.
+    """
+
+    return len(bytes(rules.make_squares()))
+
+
+def get_slot_count(count):
+    """
+    Returns the number of slots of a tablebase with the number of positions: a power of two at least twice
+    as large, so the slots never get too full for quick lookups.
+    """
+
+    slots = 1
+    while slots < count * 2:
+        slots *= 2
+    return slots
+
+
+class Tablebase:
+    """
+    The Tablebase class reads and writes an endgame tablebase file. The file holds a header and a table of
+    slots with the key and value of every position, found by the key in the slot its low bits point to or the
+    slots after it. The file is memory-mapped, so a lookup reads only the slots it needs, and worker processes
+    that open the same file share its pages.
+    """
+    __slots__ = ('_path', '_file', '_data', '_rules', '_pieces', '_floor', '_zobrist', '_slots', '_mask', '_count',
+                 '_passes', '_complete')
+
+    def __init__(self, path, writable=False):
+        """
+        Opens the tablebase file at the path for reading, or for solving it when writable is True. Raises a
+        ValueError if the file is not a tablebase.
+        """
+
+        self._path = path
+        self._file = open(path, 'r+b' if writable else 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, size, stack, pieces, target, slots, count, passes, complete = \
+            HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('%s is not a tablebase file' % path)
+        self._rules = Rules(size, stack, target)
+        self._pieces = pieces
+        self._floor = get_capture_floor(self._rules, pieces)
+        self._zobrist = self._rules.get_zobrist_keys()
+        self._slots = slots
+        self._mask = slots - 1
+        self._count = count
+        self._passes = passes
+        self._complete = bool(complete)
+
+    def __enter__(self):
+        """
+        Returns the tablebase for a with statement.
+        """
+
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Closes the tablebase at the end of a with statement.
+        """
+
+        self.close()
+
+    def close(self):
+        """
+        Closes the tablebase file.
+        """
+
+        self._data.close()
+        self._file.close()
+
+    def get_rules(self):
+        """
+        Returns the Rules of the positions in the tablebase.
+        """
+
+        return self._rules
+
+    def get_pieces(self):
+        """
+        Returns the most pieces in play, on the board and in reserve, of the positions in the tablebase.
+        """
+
+        return self._pieces
+
+    def get_count(self):
+        """
+        Returns the number of positions in the tablebase.
+        """
+
+        return self._count
+
+    def get_passes(self):
+        """
+        Returns the number of retrograde passes done, which is also the distance solved by the next pass.
+        """
+
+        return self._passes
+
+    def is_complete(self):
+        """
+        Returns True if every position of the tablebase is solved.
+        """
+
+        return self._complete
+
+    def find_slot(self, key):
+        """
+        Returns the index of the slot holding the key, or of the empty slot where it would go.
+        """
+
+        data = self._data
+        mask = self._mask
+        slot = key & mask
+        while True:
+            found, value = ENTRY.unpack_from(data, HEADER_SIZE + slot * ENTRY.size)
+            if found == key or value == EMPTY:
+                return slot
+            slot = (slot + 1) & mask
+
+    def get_value(self, slot):
+        """
+        Returns the value of the slot with the index.
+        """
+
+        return ENTRY.unpack_from(self._data, HEADER_SIZE + slot * ENTRY.size)[1]
+
+    def set_entry(self, slot, key, value):
+        """
+        Sets the key and value of the slot with the index.
+        """
+
+        ENTRY.pack_into(self._data, HEADER_SIZE + slot * ENTRY.size, key, value)
+
+    def set_value(self, slot, value):
+        """
+        Sets the value of the slot with the index, keeping its key.
+        """
+
+        ENTRY.pack_into(self._data, HEADER_SIZE + slot * ENTRY.size, self.get_key(slot), value)
+
+    def get_key(self, slot):
+        """
+        Returns the key of the slot with the index.
+        """
+
+        return ENTRY.unpack_from(self._data, HEADER_SIZE + slot * ENTRY.size)[0]
+
+    def get_position_key(self, codes, holdings, side):
+        """
+        Returns the key of a position from its board bytes, the (reserves, captures) holdings of both players
+        and the index of the player to move.
+        """
+
+        return position_key(self._zobrist, self._rules.make_squares(codes), holdings, side, self._floor)
+
+    def get_board_key(self, board, players):
+        """
+        Returns the key of the board position with the two players.
+        """
+
+        return board_key(board, players, self._zobrist, self._floor)
+
+    def probe_key(self, key):
+        """
+        Returns the value of the position with the key, or None if the tablebase does not hold it.
+        """
+
+        value = self.get_value(self.find_slot(key))
+        return None if value == EMPTY else value
+
+    def probe(self, board, players):
+        """
+        Returns an (outcome, distance) pair for the board position with the two players, or None if the
+        tablebase does not hold the position or has not solved it yet. The outcome is WIN, LOSS or DRAW for
+        the player to move, and the distance is the number of moves to the end of the game when both players
+        play their best: the winner as quickly as they can and the loser as slowly.
+        """
+
+        rules = board.get_rules()
+        if rules is not self._rules and rules.get_settings()[:3] != self._rules.get_settings()[:3]:
+            return None
+        features = board.features()
+        if features.get_board_pieces() + players[0].get_reserves() + players[1].get_reserves() > self._pieces:
+            return None
+        target = rules.get_capture_target()
+        if players[0].get_captures() >= target or players[1].get_captures() >= target:
+            return None
+        value = self.probe_key(self.get_board_key(board, players))
+        if value is None or (value & OUTCOME_MASK == UNKNOWN and not self._complete):
+            return None
+        return value & OUTCOME_MASK, value >> OUTCOME_BITS
+
+    def set_passes(self, passes, complete=False):
+        """
+        Records the number of retrograde passes done and whether the tablebase is complete in the header, and
+        writes the tablebase to the disk.
+        """
+
+        self._passes = passes
+        self._complete = complete
+        HEADER.pack_into(self._data, 0, MAGIC, VERSION, *self._rules.get_settings()[:2], self._pieces,
+                         self._rules.get_capture_target(), self._slots, self._count, passes, complete)
+        self._data.flush()
+
+    def iter_values(self):
+        """
+        Yields the value of every position in the tablebase.
+        """
+
+        for slot in range(self._slots):
+            value = self.get_value(slot)
+            if value != EMPTY:
+                yield value
+
+
+def create_tablebase(path, positions_path, rules, pieces, count):
+    """
+    Writes a new tablebase file at the path holding the positions of the positions file, all unknown. The
+    file is written under another name and renamed when it is done.
+    """
+
+    slots = get_slot_count(count)
+    with open(path + '.tmp', 'wb') as output:
+        output.write(HEADER.pack(MAGIC, VERSION, rules.get_board_size(), rules.get_max_stack(), pieces,
+                                 rules.get_capture_target(), slots, count, 0, False).ljust(HEADER_SIZE, b'\0'))
+        output.truncate(HEADER_SIZE + slots * ENTRY.size)
+    with Tablebase(path + '.tmp', writable=True) as tablebase, open(positions_path, 'rb') as source:
+        positions = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        size = get_codes_size(rules)
+        for index in range(count):
+            key = tablebase.get_position_key(*read_position(positions, index, size))
+            slot = tablebase.find_slot(key)
+            if tablebase.get_value(slot) != EMPTY:
+                raise ValueError('two positions have the same key %#x' % key)
+            tablebase.set_entry(slot, key, UNKNOWN)
+        positions.close()
+        tablebase.set_passes(0)
+    os.replace(path + '.tmp', path)
+
+
+def get_worker_game(rules):
+    """
+    Returns the game the worker process solves positions of the rules with.
+    """
+
+    game = WORKER_GAMES.get(rules)
+    if game is None:
+        game = WORKER_GAMES[rules] = FocusGame(*PLAYER_TUPLES, rules=rules)
+    return game
+
+
+def solve_position(tablebase, board, players, side, distance):
+    """
+    Returns the value of the position on the board with the player with the index side to move if its
+    distance is the given one, or None. A position with no moves is lost at distance 0. A position is won at
+    an odd distance if a move reaches the capture target or a position lost at one less, and lost at an even
+    distance if every move reaches a position won at less. Positions solved at an earlier pass are not
+    passed in, so the first distance that fits is the shortest win and the longest loss.
+    """
+
+    player = players[side]
+    moves = board.generate_moves(player)
+    if distance == 0 or not moves:
+        return LOSS if distance == 0 and not moves else None
+
+    target = board.get_rules().get_capture_target()
+    winning = distance % 2 == 1
+    for move in moves:
+        board.apply_move(player, move)
+        if player.get_captures() >= target:
+            value = LOSS
+        else:
+            value = tablebase.probe_key(tablebase.get_board_key(board, players))
+        board.undo_move()
+        outcome, found = value & OUTCOME_MASK, value >> OUTCOME_BITS
+        if winning and outcome == LOSS and found == distance - 1:
+            return WIN | distance << OUTCOME_BITS
+        if not winning and (outcome != WIN or found >= distance):
+            return None
+    return None if winning else LOSS | distance << OUTCOME_BITS
+
+
+def solve_range(path, positions_path, first, last, distance):
+    """
+    Solves the unknown positions of the positions file with indexes from first up to last at the distance,
+    with the values of the tablebase at the path from the earlier passes, and returns a list of (slot, value)
+    pairs for the positions it solved. This is the unit of work sent to a worker process.
+    """
+
+    solved = []
+    with Tablebase(path) as tablebase, open(positions_path, 'rb') as source:
+        positions = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        rules = tablebase.get_rules()
+        size = get_codes_size(rules)
+        game = get_worker_game(rules)
+        board = game.get_board()
+        players = game.get_players()
+        for index in range(first, last):
+            codes, holdings, side = read_position(positions, index, size)
+            slot = tablebase.find_slot(tablebase.get_position_key(codes, holdings, side))
+            if tablebase.get_value(slot) != UNKNOWN:
+                continue
+            game.load_position(codes, holdings, PLAYER_TUPLES[side][0])
+            value = solve_position(tablebase, board, players, side, distance)
+            if value is not None:
+                solved.append((slot, value))
+        positions.close()
+    return solved
+
+
+def run_pass(path, positions_path, count, distance, workers, batch):
+    """
+    Solves the positions at the distance across a pool of worker processes, or in this process when there
+    is one worker, and returns the list of (slot, value) pairs of every position solved.
+    """
+
+    jobs = [(path, positions_path, first, min(first + batch, count), distance) for first in range(0, count, batch)]
+    if workers == 1:
+        return [pair for job in jobs for pair in solve_range(*job)]
+
+    solved = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for job in jobs:
+            pending.append(executor.submit(solve_range, *job))
+            if len(pending) >= workers * 4:
+                solved.extend(pending.popleft().result())
+        while pending:
+            solved.extend(pending.popleft().result())
+    return solved
+
+
+def generate(path, rules, pieces, workers=None, batch=4096, report=None):
+    """
+    Builds the tablebase of every position of the rules with up to the number of pieces in play at the path,
+    using one worker process per core unless the number of workers is given. Each pass solves the positions
+    of one distance and is recorded in the file, so a generation that was stopped carries on from the last
+    finished pass when run again. The report function, if given, is called with the distance and number of
+    positions solved after each pass. Returns the finished Tablebase, which the caller closes.
+    """
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if pieces > rules.get_square_count() or pieces > 0xFF:
+        raise ValueError('the tablebase cannot hold positions of these rules')
+    positions_path = path + '.positions'
+    if not os.path.exists(path):
+        if not os.path.exists(positions_path):
+            write_positions(positions_path, rules, pieces)
+        count = os.path.getsize(positions_path) // (get_codes_size(rules) + POSITION_STATE.size)
+        create_tablebase(path, positions_path, rules, pieces, count)
+
+    tablebase = Tablebase(path, writable=True)
+    if tablebase.get_rules().get_settings()[:3] != rules.get_settings()[:3] or tablebase.get_pieces() != pieces:
+        tablebase.close()
+        raise ValueError('%s is a tablebase of other rules' % path)
+
+    # Solves one distance at a time until a pass solves nothing, which leaves only drawn positions.
+    while not tablebase.is_complete():
+        distance = tablebase.get_passes()
+        if distance > MAX_DISTANCE:
+            tablebase.close()
+            raise ValueError('the positions need more moves than the tablebase can hold')
+        solved = run_pass(path, positions_path, tablebase.get_count(), distance, workers, batch)
+        for slot, value in solved:
+            tablebase.set_value(slot, value)
+        tablebase.set_passes(distance + 1, complete=distance > 0 and not solved)
+        if report:
+            report(distance, len(solved))
+    if os.path.exists(positions_path):
+        os.remove(positions_path)
+    return tablebase
+
+
+def main(argv=None):
+    """
+    Builds a tablebase from the command line and prints the number of positions solved by each pass, and
+    the number of won, lost and drawn positions.
+    """
+
+    parser = argparse.ArgumentParser(description='Builds a Focus endgame tablebase by retrograde analysis.')
+    parser.add_argument('path')
+    parser.add_argument('--size', type=int, default=6, help='squares on each side of the board')
+    parser.add_argument('--stack', type=int, default=5, help='most pieces a stack may hold')
+    parser.add_argument('--target', type=int, default=6, help='captured pieces that win')
+    parser.add_argument('--pieces', type=int, default=3, help='most pieces in play, on the board and in reserve')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    report = lambda distance, solved: print('distance %d: %d solved' % (distance, solved), flush=True)
+    with generate(args.path, Rules(args.size, args.stack, args.target), args.pieces, args.workers,
+                  report=report) as tablebase:
+        outcomes = collections.Counter(value & OUTCOME_MASK for value in tablebase.iter_values())
+        print('positions: %d  wins: %d  losses: %d  draws: %d  %.1f sec' % (
+            tablebase.get_count(), outcomes[WIN], outcomes[LOSS], outcomes[DRAW], time.perf_counter() - started))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
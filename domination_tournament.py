@@ -0,0 +1,404 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program plays a round-robin tournament between the computer players on all of the computer's
+# cores, and rates the players with Elo ratings.
+
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import time
+
+from domination_replay import run_batches
+from domination_selfplay import POLICIES, PLAYER_TUPLES, play_game
+
+# The number of standard deviations on each side of a 95% confidence interval.
+CONFIDENCE_Z = 1.959963984540054
+
+# The largest Elo difference reported, for players that won or lost every game.
+MAX_ELO = 1200
+
+
+def elo_from_score(score):
+    """
+    Returns the Elo difference that gives the expected score, from 0 to 1, capped at MAX_ELO either way.
+    """
+
+    low = 1 / (1 + 10 ** (MAX_ELO / 400))
+    score = min(max(score, low), 1 - low)
+    return -400 * math.log10(1 / score - 1)
+
+
+def score_from_elo(elo):
+    """
+    Returns the expected score, from 0 to 1, of a player rated the Elo difference higher than their opponent.
+    """
+
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class MatchStats:
+    """
+    The MatchStats class holds the wins, draws and losses of the first player of a match against the second,
+    and finds their Elo difference with its confidence interval and the log-likelihood ratio of a sequential
+    probability ratio test (SPRT). A game that reaches the move limit counts as a draw.
+    """
+    __slots__ = ('_players', '_wins', '_draws', '_losses', '_decision')
+
+    def __init__(self, players):
+        """
+        Initializes the statistics of a match between the pair of named players with no games.
+        """
+
+        self._players = players
+        self._wins = 0
+        self._draws = 0
+        self._losses = 0
+        self._decision = None
+
+    def get_players(self):
+        """
+        Returns the pair of player names of the match.
+        """
+
+        return self._players
+
+    def add(self, score):
+        """
+        Adds a game with the score of the first player: 1 for a win, 0.5 for a draw and 0 for a loss.
+        """
+
+        if score == 1:
+            self._wins += 1
+        elif score == 0:
+            self._losses += 1
+        else:
+            self._draws += 1
+
+    def add_counts(self, wins, draws, losses):
+        """
+        Adds the numbers of wins, draws and losses of the first player.
+        """
+
+        self._wins += wins
+        self._draws += draws
+        self._losses += losses
+
+    def get_counts(self):
+        """
+        Returns the (wins, draws, losses) of the first player.
+        """
+
+        return self._wins, self._draws, self._losses
+
+    def get_games(self):
+        """
+        Returns the number of games played.
+        """
+
+        return self._wins + self._draws + self._losses
+
+    def get_score(self):
+        """
+        Returns the average score of the first player, or 0.5 if no games were played.
+        """
+
+        games = self.get_games()
+        return (self._wins + self._draws / 2) / games if games else 0.5
+
+    def get_variance(self):
+        """
+        Returns the variance of the score of one game. When every game had the same result, the variance is
+        found as if one more game was a draw, so a one-sided match still has a confidence interval and an SPRT
+        that can end it.
+        """
+
+        wins, draws, losses = self._wins, self._draws, self._losses
+        if not self.get_games():
+            return 0.0
+        if (wins > 0) + (draws > 0) + (losses > 0) == 1:
+            draws += 1
+        games = wins + draws + losses
+        score = (wins + draws / 2) / games
+        return (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+
+    def get_elo(self):
+        """
+        Returns the Elo difference of the first player over the second.
+        """
+
+        return elo_from_score(self.get_score())
+
+    def get_interval(self):
+        """
+        Returns the (low, high) 95% confidence interval of the Elo difference.
+        """
+
+        games = self.get_games()
+        if not games:
+            return -MAX_ELO, MAX_ELO
+        margin = CONFIDENCE_Z * math.sqrt(self.get_variance() / games)
+        score = self.get_score()
+        return elo_from_score(score - margin), elo_from_score(score + margin)
+
+    def get_llr(self, elo0, elo1):
+        """
+        Returns the log-likelihood ratio of the first player being elo1 stronger than the second rather than
+        elo0 stronger, from the normal approximation to the game scores.
+        """
+
+        variance = self.get_variance()
+        if not variance:
+            return 0.0
+        score0, score1 = score_from_elo(elo0), score_from_elo(elo1)
+        return self.get_games() * (score1 - score0) * (2 * self.get_score() - score0 - score1) / (2 * variance)
+
+    def update_decision(self, sprt):
+        """
+        Runs the SPRT, given as an (elo0, elo1, alpha, beta) tuple, and records its decision once the ratio
+        crosses a bound: 'H1' if the first player is stronger by elo1, 'H0' if not stronger by more than elo0.
+        Returns the decision, or None while the match goes on.
+        """
+
+        if self._decision is None and sprt is not None:
+            elo0, elo1, alpha, beta = sprt
+            llr = self.get_llr(elo0, elo1)
+            if llr >= math.log((1 - beta) / alpha):
+                self._decision = 'H1'
+            elif llr <= math.log(beta / (1 - alpha)):
+                self._decision = 'H0'
+        return self._decision
+
+    def get_decision(self):
+        """
+        Returns the decision of the SPRT, or None if the match was not stopped early.
+        """
+
+        return self._decision
+
+    def to_dict(self):
+        """
+        Returns the statistics as a dictionary that can be written as JSON.
+        """
+
+        low, high = self.get_interval()
+        return {'players': list(self._players), 'wins': self._wins, 'draws': self._draws, 'losses': self._losses,
+                'elo': self.get_elo(), 'low': low, 'high': high, 'decision': self._decision}
+
+
+def play_match_game(players, pair, leg, seed, max_moves):
+    """
+    Plays one game of a match between the pair of named policies and returns a list with its result as a
+    dictionary. Both legs of a game pair are played with the same random numbers, and the first player of
+    the match moves first in leg 0 and second in leg 1, since the first player passed to FocusGame moves
+    first. This is the unit of work sent to a worker process.
+    """
+
+    policy_names = players if leg == 0 else players[::-1]
+    summary = play_game(pair, policy_names, seed, max_moves, PLAYER_TUPLES)
+    winner = summary.get_winner()
+    if winner is None:
+        score = 0.5
+    else:
+        score = 1 if (winner == 0) == (leg == 0) else 0
+    return [{'players': list(players), 'pair': pair, 'leg': leg, 'score': score, 'moves': summary.get_moves()}]
+
+
+def load_checkpoint(path, settings):
+    """
+    Returns the list of game results in the checkpoint file at the path, or an empty list if there is no file.
+    Raises a ValueError if the first line of the file is not the settings line of a checkpoint, or holds
+    other settings. A result line cut off by an interrupted run is left out.
+    """
+
+    if not os.path.exists(path):
+        return []
+    results = []
+    with open(path) as source:
+        try:
+            header = json.loads(source.readline())
+        except ValueError:
+            header = None
+        if not isinstance(header, dict) or 'settings' not in header:
+            raise ValueError('%s does not start with the settings of a tournament' % path)
+        if header['settings'] != settings:
+            raise ValueError('%s is a checkpoint of another tournament' % path)
+        for line in source:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict):
+                results.append(entry)
+    return results
+
+
+def end_line(path):
+    """
+    Adds a newline to the end of the file at the path if it does not end with one, so that a line cut off by
+    an interrupted run does not run into the next line added to the file.
+    """
+
+    with open(path, 'rb+') as output:
+        output.seek(0, os.SEEK_END)
+        if output.tell():
+            output.seek(-1, os.SEEK_END)
+            if output.read(1) != b'\n':
+                output.write(b'\n')
+
+
+def run_tournament(entrants, pairs=50, seed=0, workers=None, max_moves=500, checkpoint=None,
+                   sprt=(0, 10, 0.05, 0.05), report=None):
+    """
+    Plays a round-robin tournament between the named policies and returns a dictionary of the MatchStats of
+    every match, keyed by its pair of names. Every match is up to the number of game pairs, with each policy
+    moving first in one game of a pair. The games run across a pool of worker processes, one per core unless
+    the number of workers is given, and the matches take turns so that they progress together.
+
+    If a checkpoint path is given, every result is added to the file as it comes in, and the games already in
+    the file are not played again, so an interrupted tournament carries on where it stopped. A match stops
+    early when its SPRT, given as an (elo0, elo1, alpha, beta) tuple or None for no early stops, decides.
+    Games already running when a match stops still count. The report function, if given, is called with
+    every new result.
+    """
+
+    for name in entrants:
+        if name not in POLICIES:
+            raise ValueError('unknown policy: ' + name)
+    if len(set(entrants)) != len(entrants):
+        raise ValueError('every policy may only enter once')
+    if workers is None:
+        workers = os.cpu_count() or 1
+    matches = {players: MatchStats(players) for players in itertools.combinations(entrants, 2)}
+    settings = {'entrants': list(entrants), 'pairs': pairs, 'seed': seed, 'max_moves': max_moves,
+                'sprt': list(sprt) if sprt else None}
+
+    # Counts the games of the checkpoint and carries on the file.
+    done = set()
+    output = None
+    if checkpoint:
+        for entry in load_checkpoint(checkpoint, settings):
+            players = tuple(entry['players'])
+            if players in matches and (players, entry['pair'], entry['leg']) not in done:
+                done.add((players, entry['pair'], entry['leg']))
+                matches[players].add(entry['score'])
+                matches[players].update_decision(sprt)
+        fresh = not os.path.exists(checkpoint)
+        if not fresh:
+            end_line(checkpoint)
+        output = open(checkpoint, 'a')
+        if fresh:
+            output.write(json.dumps({'settings': settings}) + '\n')
+            output.flush()
+
+    # The games are made as the pool takes them, so the games of a match that has stopped are never sent.
+    def jobs():
+        for pair in range(pairs):
+            for players, stats in matches.items():
+                for leg in (0, 1):
+                    if (players, pair, leg) not in done and stats.get_decision() is None:
+                        yield players, pair, leg, seed, max_moves
+
+    try:
+        for result in run_batches(play_match_game, jobs(), workers):
+            stats = matches[tuple(result['players'])]
+            stats.add(result['score'])
+            stats.update_decision(sprt)
+            if output:
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+            if report:
+                report(result)
+    finally:
+        if output:
+            output.close()
+    return matches
+
+
+def fit_ratings(matches, iterations=100):
+    """
+    Returns a dictionary of (rating, low, high) tuples keyed by player name, with the Elo rating of every
+    player of the matches that best fits all of their results together, centred on an average of 0, and its
+    95% confidence interval. The interval is found from the variance of the player's scores, as if their
+    opponents' ratings were known.
+    """
+
+    names = sorted({name for players in matches for name in players})
+    ratings = dict.fromkeys(names, 0.0)
+    for iteration in range(iterations):
+        for name in names:
+            actual = expected = slope = 0.0
+            for (first, second), stats in matches.items():
+                if name not in (first, second) or not stats.get_games():
+                    continue
+                games = stats.get_games()
+                score = stats.get_score() if name == first else 1 - stats.get_score()
+                other = ratings[second if name == first else first]
+                chance = score_from_elo(ratings[name] - other)
+                actual += score * games
+                expected += chance * games
+                slope += chance * (1 - chance) * games * math.log(10) / 400
+            if slope:
+                step = (actual - expected) / slope
+                ratings[name] = min(max(ratings[name] + min(max(step, -100), 100), -MAX_ELO), MAX_ELO)
+        average = sum(ratings.values()) / len(names) if names else 0.0
+        ratings = {name: rating - average for name, rating in ratings.items()}
+
+    fitted = {}
+    for name in names:
+        total = MatchStats((name, None))
+        for (first, second), stats in matches.items():
+            if name in (first, second):
+                wins, draws, losses = stats.get_counts()
+                total.add_counts(*((wins, draws, losses) if name == first else (losses, draws, wins)))
+        low, high = total.get_interval()
+        elo = total.get_elo()
+        fitted[name] = (ratings[name], ratings[name] + low - elo, ratings[name] + high - elo)
+    return fitted
+
+
+def main(argv=None):
+    """
+    Runs a tournament from the command line and prints the result of every match and the rating of every
+    player.
+    """
+
+    parser = argparse.ArgumentParser(description='Plays a round-robin tournament between Focus computer players.')
+    parser.add_argument('entrants', nargs='+', choices=sorted(POLICIES))
+    parser.add_argument('--pairs', type=int, default=50, help='most game pairs per match')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-moves', type=int, default=500)
+    parser.add_argument('--checkpoint', help='file to record results to and resume from')
+    parser.add_argument('--elo0', type=float, default=0.0, help='Elo difference of the SPRT null hypothesis')
+    parser.add_argument('--elo1', type=float, default=10.0, help='Elo difference of the SPRT alternative')
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    parser.add_argument('--no-sprt', action='store_true', help='play every game of every match')
+    parser.add_argument('--output', help='file to write the results to as JSON')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    sprt = None if args.no_sprt else (args.elo0, args.elo1, args.alpha, args.beta)
+    matches = run_tournament(args.entrants, args.pairs, args.seed, args.workers, args.max_moves, args.checkpoint,
+                             sprt)
+    for stats in matches.values():
+        low, high = stats.get_interval()
+        print('%-10s vs %-10s  +%d =%d -%d  elo %+7.1f  [%+7.1f, %+7.1f]  %s' % (
+            stats.get_players() + stats.get_counts() + (stats.get_elo(), low, high, stats.get_decision() or '')))
+    ratings = fit_ratings(matches)
+    for name, (rating, low, high) in sorted(ratings.items(), key=lambda item: -item[1][0]):
+        print('%-10s %+7.1f  [%+7.1f, %+7.1f]' % (name, rating, low, high))
+    print('games: %d  %.1f sec' % (sum(stats.get_games() for stats in matches.values()),
+                                   time.perf_counter() - started))
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'matches': [stats.to_dict() for stats in matches.values()],
+                       'ratings': {name: list(rating) for name, rating in ratings.items()}}, output, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
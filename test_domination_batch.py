@@ -0,0 +1,89 @@
+# Author: Ellie Davila
+# Date: 10.16.26
+# Description: This program tests the batched Focus engine against FocusGame.
+
+import numpy as np
+import pytest
+
+from domination_batch import PLAYER_TUPLES, FocusBatch, check_parity, from_games
+from domination_game import DEFAULT_RULES, FocusGame, Rules
+
+# The rules the batch is checked with: the default rules, boards of other sizes, the largest stack limit,
+# whose squares take two bytes, a layout with empty squares, and capture targets low enough for most games
+# to be won within the steps.
+PARITY_RULES = [
+    DEFAULT_RULES,
+    Rules(board_size=8, max_stack=7, capture_target=3),
+    Rules(board_size=5, max_stack=4, capture_target=2, layout=(0, 1, None)),
+    Rules(board_size=4, max_stack=3, capture_target=2, layout=(1, 0)),
+    Rules(board_size=7, max_stack=2, capture_target=6),
+]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('rules', PARITY_RULES, ids=lambda rules: '%dx%d-stack%d-target%d' % (
+    rules.get_board_size(), rules.get_board_size(), rules.get_max_stack(), rules.get_capture_target()))
+def test_parity(rules, seed):
+    """
+    Plays random games on a batch and on FocusGame instances side by side. check_parity raises an
+    AssertionError at the first difference.
+    """
+
+    assert check_parity(games=16, steps=150, seed=seed, rules=rules) > 0
+
+
+@pytest.mark.parametrize('rules', PARITY_RULES[1:4])
+def test_parity_wins(rules):
+    """
+    Checks that the low capture targets are reached within the steps of test_parity, so the winners of the
+    batch are compared too.
+    """
+
+    batch = FocusBatch(16, rules)
+    rng = np.random.default_rng(0)
+    for step in range(150):
+        batch.step(batch.random_actions(rng))
+    assert (batch.get_winner() >= 0).any()
+
+
+@pytest.mark.parametrize('rules', PARITY_RULES)
+def test_start_position(rules):
+    """
+    Checks that a new batch holds the starting position of the rules.
+    """
+
+    game = FocusGame(*PLAYER_TUPLES, rules=rules)
+    batch = FocusBatch(3, rules)
+    for row in range(3):
+        assert batch.get_codes(row) == game.get_board().get_codes()
+    assert batch.get_stacks().shape == (3, rules.get_board_size(), rules.get_board_size(), rules.get_max_stack())
+
+
+@pytest.mark.parametrize('rules', PARITY_RULES)
+def test_round_trip(rules):
+    """
+    Checks that a batch made from games in the middle of play gives back the same positions.
+    """
+
+    rng = np.random.default_rng(7)
+    batch = FocusBatch(4, rules)
+    for step in range(40):
+        batch.step(batch.random_actions(rng))
+    games = [batch.to_game(row) for row in range(4)]
+    copy = from_games(games)
+    assert copy.get_rules() == rules
+    for row, game in enumerate(games):
+        assert copy.get_codes(row) == batch.get_codes(row) == game.get_board().get_codes()
+        assert copy.get_turn()[row] == batch.get_turn()[row]
+    assert np.array_equal(copy.get_reserves(), batch.get_reserves())
+    assert np.array_equal(copy.get_captures(), batch.get_captures())
+
+
+def test_from_games_mixed_rules():
+    """
+    Checks that games with different rules cannot share a batch.
+    """
+
+    games = [FocusGame(*PLAYER_TUPLES), FocusGame(*PLAYER_TUPLES, rules=PARITY_RULES[1])]
+    with pytest.raises(ValueError):
+        from_games(games)